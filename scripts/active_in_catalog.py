@@ -1,15 +1,21 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
 
+sys.path.append(str(Path(__file__).resolve().parent / "formatting"))
+from pipeline_io import read_stage
+
 # Input files
 ACTIVE_CSV = "output/active_items.csv"
-CATALOG_CSV = "output/asin_results.csv"
+CATALOG_STAGE = "asin_results"  # output/asin_results.parquet (see pipeline_io)
 
 # Output file for missing ASINs
 MISSING_CSV = "output/missing_in_catalog.csv"
 
 # Read files
 active_df = pd.read_csv(ACTIVE_CSV, dtype=str)
-catalog_df = pd.read_csv(CATALOG_CSV, dtype=str)
+catalog_df = read_stage(CATALOG_STAGE, columns=["ASIN"])
 
 # Melt ASIN columns in active items to one row per ASIN
 asin_cols = ["asin1", "asin2", "asin3"]
@@ -2,18 +2,33 @@ import re
 import pandas as pd
 import json
 import os
+import signal
+import sys
+import time
 from dotenv import load_dotenv
 from mistralai import Mistral
-from openpyxl import load_workbook
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent / "formatting"))
+sys.path.append(str(Path(__file__).resolve().parent / "converting"))
+from xlsx_patch import fill_sheet, read_rows
+from mapping_engine import compile_spec, sheet_rows
+from mapping_specs import KONUS_AMAZON
+
 # ---------------- CONFIG ----------------
 excel_path = "templates/konus.xlsm"
 sheet_name = "Plantilla"
 csv_path = "input/konus_catalog.csv"
 output_path = "output/amazon_konus.xlsm"
+journal_path = "output/amazon_konus.journal.jsonl"  # one row per line, for resume; removed when a run completes
 start_row = 6
 
+# Every save rebuilds the Plantilla sheet from the template plus the
+# journal, so rows are buffered and saved every FLUSH_EVERY_ROWS rows or
+# FLUSH_EVERY_SECONDS, whichever comes first, plus once on Ctrl+C / exit
+FLUSH_EVERY_ROWS = 250
+FLUSH_EVERY_SECONDS = 300
+
 # ---------------- ENV ----------------
 load_dotenv()
 
@@ -23,8 +38,6 @@ if not MISTRAL_API_TOKEN:
 
 # ---------------- LOAD FILES ----------------
 Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-wb = load_workbook(excel_path, keep_vba=True)
-ws = wb[sheet_name]
 
 df = pd.read_csv(
     csv_path,
@@ -34,20 +47,11 @@ df = pd.read_csv(
 )
 
 # ---------------- AMAZON HEADERS ----------------
-amazon_headers = [cell.value for cell in ws[4]]
-
-# ---------------- CLEAN TEMPLATE ----------------
-max_row = ws.max_row
-if max_row >= start_row:
-    ws.delete_rows(start_row, max_row - start_row + 1)
+# Column → header; only the sheet XML is read, not the whole workbook.
+# Template rows from start_row on are replaced on every save.
+amazon_headers = read_rows(excel_path, sheet_name, 4).get(4, {})
 
 # ---------------- HELPERS ----------------
-def clean_price(price_str):
-    if not price_str:
-        return None
-    return re.sub(r"[^\d.]", "", str(price_str))
-
-
 def clean_json(text):
     match = re.search(r"\{.*\}", text, re.S)
     if not match:
@@ -84,178 +88,24 @@ def complete_dim(dims, key):
 def is_empty_or_zero(value):
     return value in (None, "", 0, 0.0, "0")
 
-# ---------------- DIRECT MAP ----------------
-def direct_map(csv_row, enrichment):
-    weight = csv_row.get("PesoNeto")
-    if isinstance(weight, str) and weight.strip():
-        weight = weight.lower()
-        is_kg = "kg" in weight
-
-        weight = (
-            weight
-            .replace("kg.", "")
-            .replace("kg", "")
-            .replace("gr.", "")
-            .replace("gr", "")
-            .replace("r", "")
-            .replace(",", ".")
-            .strip()
-        )
+# ---------------- MAPPING ----------------
+# Catalog columns + enrichment → Plantilla headers, per product type
+# (converting/mapping_specs.py)
+mapping = compile_spec(KONUS_AMAZON)
 
-        weight = float(weight)
-
-        if is_kg:
-            weight *= 1000
-
-    medidas_raw = csv_row.get("Medidas")
-    medidas = None
-    if isinstance(medidas_raw, str):
-        medidas_clean = medidas_raw.lower().replace("cm", "").replace(" ", "")
-        medidas = "; ".join(medidas_clean.split("x"))
-
-    dims = enrichment.get("dimensions", {})
-
-    browse_node = None
-    size = None
-    product_type = enrichment.get("product_type")
-    match product_type:
-        case "RANGEFINDER":
-            browse_node = "Telémetros láser (3053092031)"
-        case "CAMERA_TRIPOD":
-            browse_node = "Trípodes y monopies (930892031)"
-        case "MICROSCOPES":
-            browse_node = "Microscopios monoculares (1443222031)"
-        case "AIMING_SCOPE_SIGHT":
-            browse_node = "Dispositivos de visión nocturna   (930881031)"
-        case "MAGNIFIER":
-            browse_node = "Lupas para lectura (4352920031)"
-        case "TELESCOPE":
-            browse_node = "Monoculares (930884031)"
-        case "BINOCULAR":
-            browse_node = "Prismáticos (930885031)"
-        case "FLASHLIGHT":
-            browse_node = "Linternas (3053011031)"
-            size = "pequeño"
-        case "NAVIGATION_COMPASS":
-            browse_node = "Brújulas (2928776031)"
 
+def enrichment_columns(enrichment):
+    """Flatten the LLM enrichment into the columns the mapping spec reads."""
+    dims = enrichment.get("dimensions") or {}
     min_fd_v, min_fd_u = complete_dim(dims, "min_focal_distance")
-
-    formatted_entry = {
-        "SKU": csv_row.get("EAN"),
-        "SKU principal": csv_row.get("EAN"),
-        "ID del producto": csv_row.get("EAN"),
-        "Marca": "Konus Italia Group S.R.L",
-        "Fabricante": "Konus Italia Group S.R.L",
-        "Nombre Modelo": csv_row.get("Modelo"),
-        "Numero de modelo": enrichment.get("model_number"),
-        "Nombre del producto": csv_row.get("Título_producto"),
-        "Palabra clave genérica": csv_row.get("Descripción_corta"),
-        "Descripción del producto": csv_row.get("Descripción_larga"),
-        "Viñeta": enrichment.get("bullet"),
-        "Nodos recomendados de búsqueda": browse_node,
-        "Tamaño": size,
-        "Tipo de producto": product_type,
-        "Precio de venta recomendado (PVPR)": clean_price(csv_row.get("PVP FINAL")),
-        "Tu precio EUR (Vender en Amazon, ES)": clean_price(csv_row.get("PVP FINAL")),
-        "Precio de venta. EUR (Vender en Amazon, ES)": clean_price(csv_row.get("PVP FINAL")),
-        "Estado del producto": "Nuevo",
-        "Tipo de identificador del producto": "EAN",
-        "Grupo de la marina mercante (ES)": "Nueva plantilla Envios",
-        "Cumplimiento de código de canal (ES)": "DEFAULT",
-        "Cantidad (ES)": "1",
-        "Número de Artículos": "1",
-        "Número de cajas": "1",
-        "Componentes Incluidos": "1 artículo",
-        "Numero de pieza": enrichment.get("part_number"),
-        "Longitud Paquete": "1",
-        "Ancho Paquete": "1",
-        "Altura Paquete": "1",
-        "Unidad de anchura del paquete": "Centímetros",
-        "Unidad de longitud del paquete": "Centímetros",
-        "Peso Artículo": weight or "1",
-        "Unidad de peso del artículo": "Gramos",
-        "Tamaño del anillo": medidas,
-        "Aumento máximo": dims.get("max_magnification"),
-        "Distancia focal mínima": min_fd_v,
-        "Unidad de altura del paquete": "Centímetros",
-        "Peso del paquete": "1",
-        "Unidad del peso del paquete": "Kilogramos",
-        "Garantía de Producto": "2",
-        "¿Se necesitan baterías?": "No",
-        "Normativas sobre mercancías peligrosas": "No aplicable",
-        "Riesgo del GDPR": "No hay información electrónica almacenada.",
-        "URL de la imagen principal": csv_row.get("Imagen_grande"),
-        "País de origen": "Italia",
-        "Color": "negro",
-        "Mapa de color": "negro",
-        "Grosor del artículo desde la parte delantera hasta la trasera": "0",
-        "Altura del artículo desde la base hasta la parte superior": "0",
-        "Ancho del artículo de lado a lado": "0",
-        "Fecha de comienzo de la venta. (Vender en Amazon, ES)": "2026-01-20",
-        "Fecha de finalización de la venta. (Vender en Amazon, ES)": "2027-01-01"
+    return {
+        "product_type": enrichment.get("product_type"),
+        "bullet": enrichment.get("bullet"),
+        "model_number": enrichment.get("model_number"),
+        "part_number": enrichment.get("part_number"),
+        "max_magnification": dims.get("max_magnification"),
+        "min_focal_distance": min_fd_v,
     }
-    match product_type:
-        case "FLASHLIGHT":
-            formatted_entry["Fuente Alimentación"] = "Batería"
-            formatted_entry["Etiquetado Eficiencia Energética UE"] = "A to G"
-            formatted_entry["Eficiencia"] = "A"
-            formatted_entry["Conteo de unidades"] = "1"
-            formatted_entry["Tipo de conteo de unidades"] = "unidad"
-            formatted_entry["¿Es frágil?"] = "No"
-            formatted_entry["Unidad de la altura"] = "Centímetros"
-            formatted_entry["Unidad de la longitud"] = "Centímetros"
-            formatted_entry["Unidad del ancho"] = "Centímetros"
-            formatted_entry["Unidad de altura del artículo"] = "Centímetros"
-            formatted_entry["Unidad de grosor del artículo"] = "Centímetros"
-            formatted_entry["Unidad del ancho del artículo"] = "Centímetros"
-            formatted_entry["Altura desde la base hasta la parte superior"] = "1"
-            formatted_entry["Longitud del borde horizontal más largo"] = "1"
-            formatted_entry["Ancho del borde horizontal más corto"] = "1"
-        case "MAGNIFIER":
-            formatted_entry["¿Es frágil?"] = "No"
-            formatted_entry["Tamaño"] = "pequeño"
-        case "CAMERA_TRIPOD":
-            formatted_entry["Material"] = "Plástico"
-            formatted_entry["Unidad de grosor del artículo"] = "Centímetros"
-            formatted_entry["Unidad de altura del artículo"] = "Centímetros"
-            formatted_entry["Unidad del ancho del artículo"] = "Centímetros"
-        case "NAVIGATION_COMPASS":
-            formatted_entry["Material"] = "Plástico"
-            formatted_entry["Seguridad Juguetes Edad EU Advertencia"] = "Ninguna advertencia aplicable"
-            formatted_entry["Advertencia No Requisito Edad EU DSJ"] = "Ninguna advertencia aplicable"
-        case "RANGEFINDER":
-            formatted_entry["Material"] = "Plástico"
-            formatted_entry["Tamaño"] = "pequeño"
-            formatted_entry["Seguridad Juguetes Edad EU Advertencia"] = "Ninguna advertencia aplicable"
-            formatted_entry["Advertencia No Requisito Edad EU DSJ"] = "Ninguna advertencia aplicable"
-        case "AIMING_SCOPE_SIGHT":
-            formatted_entry["Material"] = "Plástico"
-            formatted_entry["Tamaño"] = "pequeño"
-            if formatted_entry.get("Peso Artículo"):
-                formatted_entry["Peso Artículo"] = round(
-                    formatted_entry["Peso Artículo"] / 453.6, 2
-                )
-                formatted_entry["Unidad de peso del artículo"] = "Libras"
-            formatted_entry["Peso Artículo Unidad"] = "Libras"
-            formatted_entry["Seguridad Juguetes Edad EU Advertencia"] = "Ninguna advertencia aplicable"
-            formatted_entry["Nombre del departamento"] = "Adultos unisex"
-            formatted_entry["Advertencia No Requisito Edad EU DSJ"] = "Ninguna advertencia aplicable"
-        case "TELESCOPE":
-            formatted_entry["Unidad de grosor del artículo"] = "Centímetros"
-            formatted_entry["Unidad de altura del artículo"] = "Centímetros"
-            formatted_entry["Unidad del ancho del artículo"] = "Centímetros"
-            formatted_entry["Aumento máximo"] = "0" if not formatted_entry["Aumento máximo"] else formatted_entry["Aumento máximo"]
-            formatted_entry["Distancia focal mínima"] = "0" if not formatted_entry["Distancia focal mínima"] else formatted_entry["Distancia focal mínima"]
-        case "BINOCULAR":
-            formatted_entry["Unidad de longitud del artículo"] = "Centímetros"
-            formatted_entry["Unidad del ancho del artículo"] = "Centímetros"
-            formatted_entry["Longitud del artículo desde el borde más largo"] = "1"
-            formatted_entry["Ancho del artículo desde el borde más corto"] = "1"
-        case "MICROSCOPES":
-            formatted_entry["Unidad de longitud del artículo"] = "Centímetros"
-
-    return formatted_entry
 
 # ---------------- LLM ----------------
 mistral = Mistral(api_key=MISTRAL_API_TOKEN)
@@ -322,31 +172,183 @@ Return format:
     return data
 
 
-# ---------------- PROCESS ----------------
-current_row = start_row
-
-for idx, csv_row in df.iterrows():
-    csv_dict = csv_row.to_dict()
-    sku = csv_dict.get("EAN")
+# ---------------- WRITER ----------------
+def _json_default(value):
+    # numpy scalars from pandas rows
+    return value.item() if hasattr(value, "item") else str(value)
 
-    try:
-        enrichment = classify_product_enrichment(csv_dict, mistral)
-    except Exception as e:
-        enrichment = {
-            "product_type": None,
-            "bullet": None,
-            "warranty": None,
-            "dimensions": {}
-        }
 
-    mapped = direct_map(csv_dict, enrichment)
+class BufferedSheetWriter:
+    """
+    Records rows in an append-only JSONL journal and writes the XLSM only
+    on flush, by patching the template's Plantilla sheet with every
+    journaled row (VBA and the other sheets are copied as-is). An
+    interrupted run resumes without calling the LLM again.
+
+    The journal's first line records the input file's signature: a journal
+    written for another version of the catalog is discarded, and a run
+    that completes removes it, so the next run re-reads the catalog.
+    """
 
-    for col_idx, header in enumerate(amazon_headers, start=1):
-        value = mapped.get(header)
-        if value is not None:
-            ws.cell(row=current_row, column=col_idx, value=value)
+    def __init__(self, headers, path, input_signature):
+        self.headers = headers
+        self.path = path
+        self.input_signature = input_signature
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.done_skus = set()
+        self.rows = []  # sheet rows of every entry mapped so far
+        self.unmapped = []  # catalog row + enrichment of entries since the last flush
+
+    def _journal_signature(self):
+        with open(self.path, encoding="utf-8") as f:
+            try:
+                return json.loads(f.readline()).get("input")
+            except json.JSONDecodeError:
+                return None
+
+    def _journal_entries(self):
+        if not os.path.exists(self.path):
+            return
+        seen = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                if "sku" not in entry or entry["sku"] in seen:
+                    continue
+                seen.add(entry["sku"])
+                yield entry
+
+    def _map_new_entries(self):
+        # Only entries journaled since the last flush are mapped, in one pass
+        if self.unmapped:
+            mapped = mapping.apply(pd.DataFrame(self.unmapped))
+            self.rows.extend(sheet_rows(mapped, self.headers))
+            self.unmapped = []
+
+    def replay_journal(self):
+        if os.path.exists(self.path) and self._journal_signature() != self.input_signature:
+            print(f"🗑️ {self.path} was written for another version of the input; starting over")
+            os.remove(self.path)
+
+        for entry in self._journal_entries():
+            self.done_skus.add(entry["sku"])
+            self.unmapped.append({**entry["source"], **entry["enrichment"]})
+            self.pending += 1
+        if self.done_skus:
+            print(f"Resumed {len(self.done_skus)} rows from {self.path}")
+
+    def open_journal(self):
+        new = not os.path.exists(self.path)
+        journal = open(self.path, "a", encoding="utf-8")
+        if new:
+            journal.write(json.dumps({"input": self.input_signature}) + "\n")
+            journal.flush()
+        return journal
+
+    def finish(self):
+        """The run completed: the journal is spent, the XLSM is the result."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, sku, source, enrichment, journal):
+        line = json.dumps(
+            {"sku": sku, "source": source, "enrichment": enrichment},
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        journal.write(line + "\n")
+        journal.flush()
+        self.done_skus.add(sku)
+        # Mapped from the journaled form, exactly like a resumed entry
+        entry = json.loads(line)
+        self.unmapped.append({**entry["source"], **entry["enrichment"]})
+        self.pending += 1
+
+        if (
+            self.pending >= FLUSH_EVERY_ROWS
+            or time.monotonic() - self.last_flush >= FLUSH_EVERY_SECONDS
+        ):
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # fill_sheet writes a temp file and swaps it in, so a kill mid-save
+        # never corrupts the output
+        self._map_new_entries()
+        written = fill_sheet(excel_path, output_path, sheet_name, self.rows, start_row)
+        print(f"💾 Saved {written} rows to {output_path}")
+        self.pending = 0
+        self.last_flush = time.monotonic()
 
-    wb.save(output_path)
-    current_row += 1
 
-print(f"Amazon XLSM generated: {output_path}")
+# ---------------- PROCESS ----------------
+def input_signature(path):
+    st = os.stat(path)
+    return [path, st.st_mtime_ns, st.st_size]
+
+
+writer = BufferedSheetWriter(amazon_headers, journal_path, input_signature(csv_path))
+writer.replay_journal()
+
+stop_requested = False
+
+
+def request_stop(signum, frame):
+    global stop_requested
+    if stop_requested:
+        raise KeyboardInterrupt
+    stop_requested = True
+    print("\n🛑 Ctrl+C detected. Finishing current product and saving...")
+
+
+signal.signal(signal.SIGINT, request_stop)
+
+seen_skus = set()
+duplicates = 0
+
+journal = writer.open_journal()
+try:
+    for idx, csv_row in df.iterrows():
+        if stop_requested:
+            break
+
+        csv_dict = csv_row.to_dict()
+        sku = csv_dict.get("EAN")
+        key = sku if pd.notna(sku) else f"row:{idx}"
+        if key in seen_skus:
+            print(f"⚠️ Duplicate EAN {key} in row {idx} skipped (the first row is kept)")
+            duplicates += 1
+            continue
+        seen_skus.add(key)
+
+        if key in writer.done_skus:
+            continue
+
+        try:
+            enrichment = classify_product_enrichment(csv_dict, mistral)
+        except Exception as e:
+            enrichment = {
+                "product_type": None,
+                "bullet": None,
+                "warranty": None,
+                "dimensions": {}
+            }
+
+        writer.append(key, csv_dict, enrichment_columns(enrichment), journal)
+finally:
+    journal.close()
+    writer.flush()
+
+if duplicates:
+    print(f"⚠️ {duplicates} duplicate EANs skipped")
+
+if stop_requested:
+    print(f"Progress saved to {output_path}; run again to resume")
+else:
+    writer.finish()
+    print(f"Amazon XLSM generated: {output_path}")
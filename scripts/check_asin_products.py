@@ -3,17 +3,28 @@ import requests
 import time
 import random
 import os
+import sys
+from collections import deque
 from itertools import cycle
+from pathlib import Path
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+sys.path.append(str(Path(__file__).resolve().parent / "scraping"))
+sys.path.append(str(Path(__file__).resolve().parent / "formatting"))
+from page_outcome import CircuitBreaker, Outcome, classify_amazon
+from pipeline_io import read_stage, stage_path, write_stage
 
-INPUT_FILE = "output/translated_catalog.csv"
-OUTPUT_FILE = "output/translated_catalog_valid.csv"
+
+# Pipeline stages (output/<stage>.parquet, see pipeline_io); the result is
+# also exported as CSV
+INPUT_STAGE = "translated_catalog"
+OUTPUT_STAGE = "translated_catalog_valid"
 CHECKPOINT_FILE = "input/asin_checkpoint.csv"
 
 ASIN_COLUMN = "ASIN"
 BASE_URL = "https://www.amazon.com/dp/{}"
+MAX_REQUEUES = 3
 
 # ====== OXYLABS PROXIES ======
 PROXY_USERNAME = "USERNAME"  # fill if needed
@@ -67,33 +78,24 @@ def create_session():
     return session
 
 # ====== AMAZON PAGE VALIDATION ======
-def is_valid_amazon_product(response):
-    if response.status_code == 404:
-        return False
-
-    text = response.text.lower()
+def check_amazon_product(session, url, proxy) -> Outcome:
+    try:
+        response = session.get(url, proxies=proxy, timeout=12)
+    except requests.RequestException:
+        return Outcome.NETWORK_ERROR
 
-    soft_404_signals = [
-        "sorry! we couldn't find that page",
-        "page not found",
-        "looking for something?",
-        "dogs of amazon",
-        "error occurred",
-        "enter the characters you see below"
-    ]
-
-    return not any(signal in text for signal in soft_404_signals)
+    return classify_amazon(response.status_code, response.text)
 
 # ====== MAIN ======
 def main():
-    df = pd.read_csv(INPUT_FILE)
+    df = read_stage(INPUT_STAGE)
 
     if ASIN_COLUMN not in df.columns:
         raise ValueError(f"Missing '{ASIN_COLUMN}' column")
 
     # Load checkpoint if exists
     if os.path.exists(CHECKPOINT_FILE):
-        checkpoint_df = pd.read_csv(CHECKPOINT_FILE)
+        checkpoint_df = pd.read_csv(CHECKPOINT_FILE, dtype=str)
         processed_asins = set(checkpoint_df[ASIN_COLUMN])
         results = checkpoint_df.to_dict("records")
         print(f"🔁 Resuming from checkpoint ({len(processed_asins)} processed)")
@@ -102,31 +104,44 @@ def main():
         results = []
 
     session = create_session()
+    breaker = CircuitBreaker()
+
+    pending = deque(
+        (row, 0)
+        for _, row in df.iterrows()
+        if str(row[ASIN_COLUMN]).strip() not in processed_asins
+    )
 
-    for idx, row in df.iterrows():
+    while pending:
+        row, attempts = pending.popleft()
         asin = str(row[ASIN_COLUMN]).strip()
 
         if asin in processed_asins:
             continue
 
         url = BASE_URL.format(asin)
-        proxy = next(proxy_pool)
-
-        try:
-            response = session.get(
-                url,
-                proxies=proxy,
-                timeout=12
-            )
-
-            valid = is_valid_amazon_product(response)
+        breaker.wait_sync(url)
+
+        outcome = check_amazon_product(session, url, next(proxy_pool))
+        breaker.record(url, outcome)
+
+        # Blocked / unreachable: requeue instead of marking the ASIN removed
+        if not outcome.is_final:
+            if attempts + 1 < MAX_REQUEUES:
+                pending.append((row, attempts + 1))
+                print(f"[{len(results)}] {asin} → {outcome.value.upper()}, requeued")
+            else:
+                print(f"[{len(results)}] {asin} → {outcome.value.upper()}, left for the next run")
+            time.sleep(random.uniform(2.0, 5.0))
+            continue
 
-        except requests.RequestException:
-            valid = False
+        # Out of stock still means the listing exists
+        valid = outcome in (Outcome.OK, Outcome.OUT_OF_STOCK)
 
         row_data = row.to_dict()
         row_data["__valid"] = valid
         results.append(row_data)
+        processed_asins.add(asin)
 
         # Write checkpoint immediately
         pd.DataFrame(results).to_csv(CHECKPOINT_FILE, index=False)
@@ -137,14 +152,15 @@ def main():
         # Human-like delay
         time.sleep(random.uniform(2.0, 5.0))
 
-    # Save final filtered file
-    final_df = pd.DataFrame(results)
-    final_df = final_df[final_df["__valid"] == True]
-    final_df.drop(columns="__valid", inplace=True)
+    # Save final filtered file: the input rows (and types) of the valid ASINs
+    valid_asins = {
+        str(r[ASIN_COLUMN]).strip() for r in results if str(r["__valid"]) == "True"
+    }
+    final_df = df[df[ASIN_COLUMN].astype(str).str.strip().isin(valid_asins)]
 
-    final_df.to_csv(OUTPUT_FILE, index=False)
+    write_stage(final_df, OUTPUT_STAGE, export_csv=True)
 
-    print(f"\n✅ Done. Valid ASINs saved to {OUTPUT_FILE}")
+    print(f"\n✅ Done. Valid ASINs saved to {stage_path(OUTPUT_STAGE)}")
 
 if __name__ == "__main__":
     main()
@@ -3,12 +3,21 @@ import glob
 import os
 import json
 import re
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 from mistralai import Mistral
-from openpyxl import load_workbook
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "scraping"))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from image_store import ImageStore
+from xlsx_patch import fill_sheet, next_free_row, sheet_headers, sheet_names
+from mapping_engine import compile_spec, sheet_rows
+from mapping_specs import WORTEN, WORTEN_MAX_IMAGES
+from pipeline_io import read_stage
+
 # =========================
 # LLM CONFIG
 # =========================
@@ -16,6 +25,8 @@ load_dotenv()
 
 LLM_MODEL = "mistral-small-latest"
 LLM_BATCH_SIZE = 10
+LLM_INTERVAL = 1.0  # seconds between calls (one call stream for the whole run)
+LLM_RETRIES = 3  # extra attempts per product, with exponential backoff
 CATEGORIES_JSON = "templates/worten/product_categories.json"
 
 def clean_text(text: str) -> str:
@@ -71,9 +82,10 @@ Output example:
 # =========================
 # PATHS
 # =========================
-CSV_FILE = "output/all_listings_ready.csv"
+LISTINGS_STAGE = "all_listings_ready"  # output/<stage>.parquet (see pipeline_io)
 XLSX_DIR = "templates/worten"
 OUTPUT_DIR = "output/worten"
+IMAGE_STORE_DIR = "image_store"
 
 Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 with open(CATEGORIES_JSON, "r", encoding="utf-8") as f:
@@ -203,159 +215,275 @@ WORTEN_CATEGORY_MAPPING = {
 }
 
 # =========================
-# LOAD CSV
+# WORKBOOK COLUMNS
 # =========================
-df = pd.read_csv(CSV_FILE, dtype=str)
+# CSV → XLSX columns mapping (mapping_specs.WORTEN)
+MAPPING = compile_spec(WORTEN)
+IMAGE_COLUMNS = [f"image{i}" for i in range(1, WORTEN_MAX_IMAGES + 1)]
+REQUIRED_COLUMNS = [c for c in MAPPING.targets if c not in IMAGE_COLUMNS]
+ANCHOR_COLUMN = "product_id"
 
-required_cols = {"seller-sku"}
-missing = required_cols - set(df.columns)
-if missing:
-    raise ValueError(f"Missing required CSV columns: {missing}")
+# Max number of images to write
+MAX_IMAGES = WORTEN_MAX_IMAGES
+
+# Only what is used below: the workbook selector, the ASIN for the image
+# store and the mapping sources (image1..image12 included)
+LISTING_COLUMNS = list(dict.fromkeys(
+    ["seller-sku", "amazon_product_type", "asin1"]
+    + [field["source"] for field in WORTEN["fields"] if "source" in field]
+))
+
+# Amazon product type → workbook, so the listings are partitioned in one pass
+TYPE_TO_WORKBOOK = {}
+for filename, amazon_types in WORTEN_MAPPING.items():
+    for amazon_type in amazon_types:
+        if amazon_type in TYPE_TO_WORKBOOK:
+            raise ValueError(
+                f"{amazon_type} is mapped to both {TYPE_TO_WORKBOOK[amazon_type]} and {filename}"
+            )
+        TYPE_TO_WORKBOOK[amazon_type] = filename
+
+# Workbooks are independent: each one is prepared and filled by its own
+# process. The LLM enrichment runs in between, in the main process only.
+WORKERS = os.cpu_count() or 1
 
-# Keep track of unmatched SKUs
-all_skus = set(df["seller-sku"].dropna())
-matched_skus_total = set()
 
 # =========================
-# PROCESS EACH XLSX
+# WRITE ONE WORKBOOK (worker)
 # =========================
-xlsx_files = glob.glob(os.path.join(XLSX_DIR, "*.xlsx"))
+image_store = None
 
-total_skus_written = 0
-# =========================
-# WRITE SKUS + ADDITIONAL COLUMNS
-# =========================
 
-# Columns mapping: CSV column → XLSX columns
-COLUMN_MAPPING = {
-    "item-name": ["product_name_pt_PT", "product_name_es_ES", "product_description_pt_PT",
-                  "product_description_es_ES"],
-    "seller-sku": ["ean", "product_id"],
-    "amazon_product_type_es": ["type_pt_PT", "type_es_ES"],
-    "manufacturer": ["product-brand"],
-    "mp_category": ["mp_category"]
-}
-ANCHOR_COLUMN = "product_id"
+def init_worker():
+    """Each worker opens its own connection to the image store."""
+    global image_store
+    # Images come from the image store manifest (ASIN → image IDs) when there
+    # is one; the image1..image12 columns are only a fallback for older runs.
+    if ImageStore.exists(IMAGE_STORE_DIR):
+        image_store = ImageStore(IMAGE_STORE_DIR)
 
-# Max number of images to write
-MAX_IMAGES = 12
-
-for xlsx_path in xlsx_files:
-    filename = os.path.splitext(os.path.basename(xlsx_path))[0]
 
-    if filename not in WORTEN_MAPPING:
-        print(f"⏭️ Skipping {filename}.xlsx (no mapping)")
-        continue
+def listing_images(row_data) -> list[str]:
+    asin = row_data.get("asin1")
+    if image_store is not None and isinstance(asin, str):
+        urls = image_store.asin_urls(asin)
+        if urls:
+            return urls[:MAX_IMAGES]
 
-    amazon_types = WORTEN_MAPPING[filename]
+    return [
+        row_data[f"image{i}"]
+        for i in range(1, MAX_IMAGES + 1)
+        if pd.notna(row_data.get(f"image{i}"))
+    ]
 
-    matched_df = df[df["amazon_product_type"].isin(amazon_types)].copy()
-    if matched_df.empty:
-        print(f"⚠️ No matches for {filename}.xlsx")
-        continue
 
-    matched_skus_total.update(matched_df["seller-sku"].dropna().tolist())
-    total_skus_written += len(matched_df)
-    print(f"📦 Writing {len(matched_df)} SKUs → {filename}.xlsx")
+def prepare_workbook(xlsx_path: str, matched_df: pd.DataFrame) -> dict | None:
+    """
+    Rows ({column: value}) for one template's Data sheet, plus where they
+    go. None if the template has no Data sheet.
+    """
+    filename = os.path.splitext(os.path.basename(xlsx_path))[0]
+    print(f"📦 Preparing {len(matched_df)} SKUs → {filename}.xlsx")
 
-    wb = load_workbook(xlsx_path)
-    if "Data" not in wb.sheetnames:
+    # Only the Data sheet XML is read and patched; the category lookup
+    # sheets and validations are copied over untouched
+    if "Data" not in sheet_names(xlsx_path):
         print(f"❌ Sheet 'Data' not found in {filename}.xlsx")
-        continue
-
-    ws = wb["Data"]
+        return None
 
     # Build column index mapping from header row 2
-    col_index = {}
-    for col in range(1, ws.max_column + 1):
-        header = ws.cell(row=2, column=col).value
-        if header:
-            col_index[header] = col
+    col_index = sheet_headers(xlsx_path, "Data", header_row=2)
 
     # Ensure required XLSX columns exist
-    for csv_col, xlsx_cols in COLUMN_MAPPING.items():
-        for xlsx_col in xlsx_cols:
-            if xlsx_col not in col_index:
-                raise ValueError(f"'{xlsx_col}' column not found in {filename}.xlsx")
-
-    # Find first empty row (starting from row 3)
-    row = 3
-    while ws.cell(row=row, column=col_index[ANCHOR_COLUMN]).value:
-        row += 1
-    row_start = row
-
-    # Write data row by row
-    for _, row_data in matched_df.iterrows():
-        # CSV → XLSX columns mapping
-        for csv_col, xlsx_cols in COLUMN_MAPPING.items():
-            # Skip mp_category here since we'll handle it separately
-            if csv_col == "mp_category":
-                continue
-            for xlsx_col in xlsx_cols:
-                ws.cell(row=row, column=col_index[xlsx_col], value=row_data.get(csv_col, ""))
-
-        # Images (image1..image12)
-        for i in range(1, MAX_IMAGES + 1):
-            csv_image_col = f"image{i}"
-            xlsx_image_col = f"image{i}"
-            if csv_image_col in row_data and xlsx_image_col in col_index:
-                ws.cell(row=row, column=col_index[xlsx_image_col], value=row_data[csv_image_col])
-
-        # mp_category value based on XLSX file
-        category_value = WORTEN_CATEGORY_MAPPING.get(filename, "")
-        ws.cell(row=row, column=col_index["mp_category"], value=category_value)
-
-        row += 1
+    for xlsx_col in REQUIRED_COLUMNS:
+        if xlsx_col not in col_index:
+            raise ValueError(f"'{xlsx_col}' column not found in {filename}.xlsx")
+
+    # New rows go after the last product already in the sheet (from row 3)
+    row_start = next_free_row(xlsx_path, "Data", col_index[ANCHOR_COLUMN], min_row=3)
+
+    # Images (image1..image12) resolved per listing, then one column each
+    images = [listing_images(row_data) for row_data in matched_df.to_dict("records")]
+    for i, image_col in enumerate(IMAGE_COLUMNS):
+        matched_df[image_col] = [urls[i] if i < len(urls) else None for urls in images]
+
+    # mp_category value based on XLSX file
+    mapped = MAPPING.apply(matched_df, params={"mp_category": WORTEN_CATEGORY_MAPPING.get(filename, "")})
+
+    # Rows in template order; the sheet is written once, after the LLM
+    # enrichment (see enrich_rows)
+    headers = {col: header for header, col in col_index.items() if header in MAPPING.targets}
+
+    return {
+        "xlsx_path": xlsx_path,
+        "filename": filename,
+        "col_index": col_index,
+        "row_start": row_start,
+        "rows": list(sheet_rows(mapped, headers)),
+        "skus": matched_df["seller-sku"].dropna().tolist(),
+    }
 
-    # =========================
-    # LLM SUBCATEGORY ENRICHMENT (row-by-row)
-    # =========================
-    if filename in PRODUCT_CATEGORIES:
-        category_tree = PRODUCT_CATEGORIES[filename]
 
-        with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
-            for r in range(row_start, row):
-                product_id = ws.cell(r, col_index[ANCHOR_COLUMN]).value
-                if not product_id:
-                    continue
-
-                name = ws.cell(r, col_index["product_name_es_ES"]).value or ""
-                desc = ws.cell(r, col_index["product_description_es_ES"]).value or ""
-
-                item = {"product_id": product_id, "name": name, "description": desc}
-
-                try:
-                    subpath = classify_subcategory(item, category_tree, mistral)
-                except Exception as e:
-                    print(f"❌ LLM failure for product_id {product_id} in {filename}: {e}")
-                    continue
-
-                if subpath:
-                    subpath = clean_subcategory(subpath)
-                    base_cat = ws.cell(r, col_index["mp_category"]).value or ""
-                    ws.cell(
-                        r,
-                        col_index["mp_category"],
-                        value=f"{base_cat}/{subpath}" if base_cat else subpath
-                    )
-
-                    print(f"🤖 Classified subcategory for product_id {product_id}: {subpath}")
-                    time.sleep(1)
-    else:
+def fill_workbook(xlsx_path: str, rows: list[dict], row_start: int) -> str:
+    """Write the (enriched) rows into a copy of the template in OUTPUT_DIR."""
+    output_path = os.path.join(OUTPUT_DIR, os.path.basename(xlsx_path))
+    fill_sheet(xlsx_path, output_path, "Data", rows, start_row=row_start)
+    print(f"✅ {os.path.basename(xlsx_path)} done")
+    return output_path
+
+
+# =========================
+# LLM SUBCATEGORY ENRICHMENT (main process, throttled)
+# =========================
+def classify_with_retry(item, category_tree, mistral) -> str:
+    """classify_subcategory, retried with backoff (rate limits, timeouts)."""
+    for attempt in range(LLM_RETRIES + 1):
+        try:
+            return classify_subcategory(item, category_tree, mistral)
+        except Exception:
+            if attempt == LLM_RETRIES:
+                raise
+            time.sleep(LLM_INTERVAL * 2 ** (attempt + 1))
+
+
+def enrich_rows(workbook: dict, mistral) -> list[str]:
+    """
+    Append the LLM subcategory to mp_category of each row, one call at a
+    time. Returns the product_ids that could not be classified.
+    """
+    filename, col_index = workbook["filename"], workbook["col_index"]
+    if filename not in PRODUCT_CATEGORIES:
         print(f"⚠️ No category tree for {filename}, skipping LLM enrichment")
+        return []
+    category_tree = PRODUCT_CATEGORIES[filename]
+
+    failed = []
+    for values in workbook["rows"]:
+        product_id = values.get(col_index[ANCHOR_COLUMN])
+        if pd.isna(product_id) or not product_id:
+            continue
+
+        name = values.get(col_index["product_name_es_ES"])
+        desc = values.get(col_index["product_description_es_ES"])
+        name = "" if pd.isna(name) else name
+        desc = "" if pd.isna(desc) else desc
+
+        item = {"product_id": product_id, "name": name, "description": desc}
+
+        try:
+            subpath = classify_with_retry(item, category_tree, mistral)
+        except Exception as e:
+            print(f"❌ LLM failure for product_id {product_id} in {filename}: {e}")
+            failed.append(product_id)
+            continue
+        finally:
+            time.sleep(LLM_INTERVAL)
+
+        subpath = clean_subcategory(subpath)
+        if not subpath:
+            failed.append(product_id)
+            continue
+
+        base_cat = values.get(col_index["mp_category"]) or ""
+        values[col_index["mp_category"]] = f"{base_cat}/{subpath}" if base_cat else subpath
+        print(f"🤖 Classified subcategory for product_id {product_id}: {subpath}")
+
+    return failed
+
+
+# =========================
+# PLAN: LISTINGS → WORKBOOKS
+# =========================
+def plan_exports(df: pd.DataFrame) -> list[tuple[str, pd.DataFrame]]:
+    """(template path, its listings) per workbook, largest first."""
+    workbook = df["amazon_product_type"].map(TYPE_TO_WORKBOOK)
+    partitions = {filename: group for filename, group in df.groupby(workbook, sort=False)}
+
+    tasks = []
+    for xlsx_path in sorted(glob.glob(os.path.join(XLSX_DIR, "*.xlsx"))):
+        filename = os.path.splitext(os.path.basename(xlsx_path))[0]
+
+        if filename not in WORTEN_MAPPING:
+            print(f"⏭️ Skipping {filename}.xlsx (no mapping)")
+            continue
+
+        matched_df = partitions.get(filename)
+        if matched_df is None:
+            print(f"⚠️ No matches for {filename}.xlsx")
+            continue
+
+        tasks.append((xlsx_path, matched_df.copy()))
+
+    # The biggest workbook bounds the run, so it starts first
+    tasks.sort(key=lambda task: len(task[1]), reverse=True)
+    return tasks
 
-    # Save to output directory
-    output_path = os.path.join(OUTPUT_DIR, os.path.basename(xlsx_path))
-    wb.save(output_path)
 
 # =========================
-# REPORT UNMATCHED SKUS
+# MAIN
 # =========================
-unmatched_skus = all_skus - matched_skus_total
-if unmatched_skus:
-    print(f"⚠️ {len(unmatched_skus)} SKUs were not processed:")
-    for sku in sorted(unmatched_skus):
-        print(f" - {sku}")
-
-print(f"✅ All applicable Worten sheets updated successfully in {OUTPUT_DIR}.")
-print(f"Total SKUs written: {total_skus_written}")
+def main():
+    df = read_stage(LISTINGS_STAGE, columns=LISTING_COLUMNS)
+
+    required_cols = {"seller-sku"}
+    missing = required_cols - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required listing columns: {missing}")
+
+    # Keep track of unmatched SKUs
+    all_skus = set(df["seller-sku"].dropna())
+    matched_skus_total = set()
+    total_skus_written = 0
+
+    tasks = plan_exports(df)
+    workers = max(1, min(WORKERS, len(tasks)))
+    print(f"🧮 {len(tasks)} workbooks to write with {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        # 1) Rows of every workbook, in parallel
+        futures = [pool.submit(prepare_workbook, xlsx_path, matched_df) for xlsx_path, matched_df in tasks]
+        workbooks = [w for w in (future.result() for future in futures) if w is not None]
+
+        # 2) Subcategories, one throttled call stream for all workbooks
+        llm_failures = {}
+        with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
+            for workbook in workbooks:
+                failed = enrich_rows(workbook, mistral)
+                if failed:
+                    llm_failures[workbook["filename"]] = failed
+
+        # 3) Sheets, in parallel
+        futures = {
+            pool.submit(fill_workbook, w["xlsx_path"], w["rows"], w["row_start"]): w
+            for w in workbooks
+        }
+        for future in as_completed(futures):
+            future.result()
+            skus = futures[future]["skus"]
+            matched_skus_total.update(skus)
+            total_skus_written += len(skus)
+
+    # =========================
+    # REPORT LLM FAILURES
+    # =========================
+    if llm_failures:
+        print(f"⚠️ {sum(map(len, llm_failures.values()))} products written without mp_category subcategory:")
+        for filename, product_ids in llm_failures.items():
+            for product_id in product_ids:
+                print(f" - {filename}: {product_id}")
+
+    # =========================
+    # REPORT UNMATCHED SKUS
+    # =========================
+    unmatched_skus = all_skus - matched_skus_total
+    if unmatched_skus:
+        print(f"⚠️ {len(unmatched_skus)} SKUs were not processed:")
+        for sku in sorted(unmatched_skus):
+            print(f" - {sku}")
+
+    print(f"✅ All applicable Worten sheets updated successfully in {OUTPUT_DIR}.")
+    print(f"Total SKUs written: {total_skus_written}")
+
+
+if __name__ == "__main__":
+    main()
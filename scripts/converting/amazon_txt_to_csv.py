@@ -1,14 +1,15 @@
-import pandas as pd
-import csv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from convert import convert
 
 # Input and output files
 INPUT_TXT = "input/active_listings.txt"
 OUTPUT_CSV = "output/active_listings.csv"
 
-# Read the TXT file (tab-separated)
-df = pd.read_csv(INPUT_TXT, sep="\t", dtype=str)
-
-# Save as CSV with quoting to handle commas properly
-df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL)
+# Amazon report (tab-separated) → CSV, every field quoted so commas in
+# titles survive
+rows = convert(INPUT_TXT, OUTPUT_CSV, src_format="txt", quoting="all")
 
-print(f"Saved CSV with {len(df)} rows to {OUTPUT_CSV}")
+print(f"Saved CSV with {rows} rows to {OUTPUT_CSV}")
@@ -0,0 +1,225 @@
+"""
+mapping_engine.py
+-----------------
+Declarative marketplace field mapping, compiled to vectorized pandas column
+operations.
+
+A spec lists the target columns of a marketplace file and where each one
+comes from:
+
+    SPEC = {
+        "type_column": "product_type",        # optional, selects overrides
+        "fields": [
+            {"target": "SKU", "source": "EAN"},
+            {"target": "Marca", "value": "Konus"},
+            {"target": "Precio", "source": "PVP FINAL", "transforms": ["decimal"]},
+            {"target": "Peso", "source": "PesoNeto", "transforms": ["grams"], "default": "1"},
+            {"target": "Categoría", "param": "category"},
+        ],
+        "overrides": {
+            "FLASHLIGHT": [{"target": "Tamaño", "value": "pequeño"}],
+        },
+    }
+
+Field keys:
+    target      output column (template header)
+    source      input column; `value` is a constant, `param` a value passed
+                to apply() at run time
+    transforms  names from TRANSFORMS, or (name, *args) tuples, applied in order
+    default     fills nulls (and stands in for a missing source column); with the
+                falsy_to_null transform it replaces 0 and "" too, like
+                `value or default`
+
+Overrides replace or add fields for rows whose type_column equals the key.
+
+    mapping = compile_spec(SPEC)
+    mapped = mapping.apply(df, params={"category": "Hogar"})   # one column per target
+    for row in sheet_rows(mapped, headers):                    # {column: value}, template order
+        ...
+
+Every field is a whole-column operation, so the cost grows with the number
+of fields rather than the number of rows.
+"""
+
+import re
+from typing import Any, Iterator
+
+import pandas as pd
+
+
+# =========================
+# TRANSFORMS
+# =========================
+def _text(s: pd.Series) -> pd.Series:
+    return s.astype("string")
+
+
+def _grams(s: pd.Series) -> pd.Series:
+    """'1,2 kg' / '350gr.' / '350' → grams as a number."""
+    text = _text(s).str.lower()
+    is_kg = text.str.contains("kg", regex=False).fillna(False)
+    number = pd.to_numeric(
+        text.str.replace(r"kg\.?|gr\.?|r", "", regex=True).str.replace(",", ".", regex=False).str.strip(),
+        errors="coerce",
+    )
+    return number.where(~is_kg, number * 1000)
+
+
+def _first_match(s: pd.Series, candidates, fallback=None) -> pd.Series:
+    """First candidate found (case-insensitive) inside the text."""
+    candidates = [c for c in candidates if c]
+    if not candidates:
+        return pd.Series(fallback, index=s.index, dtype=object)
+    pattern = "(" + "|".join(re.escape(c) for c in candidates) + ")"
+    found = _text(s).str.extract(pattern, flags=re.IGNORECASE, expand=False)
+    canonical = {c.lower(): c for c in candidates}
+    result = found.str.lower().map(canonical)
+    return result.astype(object).where(result.notna(), fallback)
+
+
+def _falsy_to_null(s: pd.Series) -> pd.Series:
+    """0 and '' → null, so `default` replaces them as well."""
+    falsy = s.map(lambda v: not pd.isna(v) and not v).astype(bool)
+    return s.astype(object).where(~falsy, None)
+
+
+TRANSFORMS = {
+    "str": _text,
+    "strip": lambda s: _text(s).str.strip(),
+    "lower": lambda s: _text(s).str.lower(),
+    "upper": lambda s: _text(s).str.upper(),
+    "replace": lambda s, old, new: _text(s).str.replace(old, new, regex=False),
+    "regex_replace": lambda s, pattern, repl: _text(s).str.replace(pattern, repl, regex=True),
+    # Keep digits and dots only (so '1.299,00 €' → '1.29900')
+    "digits": lambda s: _text(s).str.replace(r"[^\d.]", "", regex=True),
+    # Euro price with decimal comma → '12.50'
+    "decimal": lambda s: _text(s).str.replace(r"[^\d,.\-]", "", regex=True).str.replace(",", ".", regex=False),
+    "number": lambda s: pd.to_numeric(s, errors="coerce"),
+    "scale": lambda s, factor: pd.to_numeric(s, errors="coerce") * factor,
+    "round": lambda s, digits: pd.to_numeric(s, errors="coerce").round(digits),
+    "grams": _grams,
+    "map": lambda s, mapping: s.map(mapping),
+    "first_match": _first_match,
+    "falsy_to_null": _falsy_to_null,
+}
+
+
+# =========================
+# COMPILER
+# =========================
+def _transform(s: pd.Series, steps: list) -> pd.Series:
+    if not steps:
+        return s
+    # Catalog columns repeat a lot (prices, weights, types), so the
+    # transforms run once per distinct value and are broadcast back
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    values = pd.Series(uniques, dtype=s.dtype if len(uniques) else object)
+    for fn, args in steps:
+        values = fn(values, *args)
+    values = values.astype(object).where(values.notna(), None).to_numpy(dtype=object)
+    if not len(values):
+        return pd.Series(None, index=s.index, dtype=object)
+    result = pd.Series(values.take(codes), index=s.index, dtype=object)
+    result[codes == -1] = None
+    return result
+
+
+def _compile_field(field: dict):
+    target = field.get("target")
+    if not target:
+        raise ValueError(f"Mapping field without target: {field}")
+    kinds = [k for k in ("source", "value", "param") if k in field]
+    if len(kinds) != 1:
+        raise ValueError(f"'{target}': exactly one of source/value/param is required")
+
+    steps = []
+    for t in field.get("transforms", []):
+        name, *args = (t,) if isinstance(t, str) else t
+        if name not in TRANSFORMS:
+            raise ValueError(f"'{target}': unknown transform '{name}'")
+        steps.append((TRANSFORMS[name], args))
+
+    kind = kinds[0]
+    default = field.get("default")
+    # Fields reading the same source through the same transforms share one
+    # computation per apply()
+    cache_key = (field.get("source"), repr(field.get("transforms", [])))
+
+    def evaluate(df: pd.DataFrame, params: dict, cache: dict):
+        if kind == "value":
+            return field["value"]
+        if kind == "param":
+            return params[field["param"]]
+
+        source = field["source"]
+        if source not in df.columns:
+            if "default" in field:
+                return default
+            raise KeyError(f"'{target}': source column '{source}' not in input")
+
+        s = cache.get(cache_key)
+        if s is None:
+            s = cache[cache_key] = _transform(df[source], steps)
+        if default is not None:
+            s = s.astype(object).where(s.notna(), default)
+        return s
+
+    return target, evaluate
+
+
+class CompiledMapping:
+    def __init__(self, spec: dict):
+        self.type_column = spec.get("type_column")
+        self.fields = [_compile_field(f) for f in spec["fields"]]
+        self.overrides = {
+            product_type: [_compile_field(f) for f in fields]
+            for product_type, fields in spec.get("overrides", {}).items()
+        }
+        if self.overrides and not self.type_column:
+            raise ValueError("Spec has overrides but no type_column")
+
+        self.targets = list(dict.fromkeys(
+            [t for t, _ in self.fields]
+            + [t for fields in self.overrides.values() for t, _ in fields]
+        ))
+
+    def apply(self, df: pd.DataFrame, params: dict | None = None) -> pd.DataFrame:
+        """One column per target, in spec order; unmapped cells are null."""
+        params = params or {}
+        cache = {}
+        columns = {target: evaluate(df, params, cache) for target, evaluate in self.fields}
+        out = pd.DataFrame(columns, index=df.index, columns=self.targets)
+
+        if self.overrides:
+            types = df[self.type_column] if self.type_column in df.columns else pd.Series(index=df.index)
+            for product_type, fields in self.overrides.items():
+                mask = (types == product_type).fillna(False).to_numpy(bool)
+                if not mask.any():
+                    continue
+                subset = df[mask]
+                subset_cache = {}
+                for target, evaluate in fields:
+                    value = evaluate(subset, params, subset_cache)
+                    out[target] = out[target].astype(object)
+                    out.loc[mask, target] = value
+        return out
+
+
+def compile_spec(spec: dict) -> CompiledMapping:
+    return CompiledMapping(spec)
+
+
+# =========================
+# OUTPUT
+# =========================
+def row_matrix(mapped: pd.DataFrame, headers: list[str]):
+    """Values as an object array in template header order (None for gaps)."""
+    matrix = mapped.reindex(columns=headers).astype(object)
+    return matrix.where(matrix.notna(), None).to_numpy()
+
+
+def sheet_rows(mapped: pd.DataFrame, headers: dict[int, str]) -> Iterator[dict[int, Any]]:
+    """{column: value} rows for xlsx_patch.fill_sheet, nulls dropped."""
+    columns = list(headers)
+    for values in row_matrix(mapped, list(headers.values())):
+        yield {col: v for col, v in zip(columns, values) if v is not None}
@@ -0,0 +1,232 @@
+"""
+mapping_specs.py
+----------------
+Marketplace mapping specs for mapping_engine. Adding a marketplace or a
+column is a change here, not in the scripts that fill the templates.
+"""
+
+# =========================
+# KONUS → AMAZON (Plantilla, amazon_konus.py)
+# =========================
+# Input: Konus catalog columns plus the flattened LLM enrichment
+# (product_type, bullet, model_number, part_number, max_magnification,
+# min_focal_distance).
+KONUS_BROWSE_NODES = {
+    "RANGEFINDER": "Telémetros láser (3053092031)",
+    "CAMERA_TRIPOD": "Trípodes y monopies (930892031)",
+    "MICROSCOPES": "Microscopios monoculares (1443222031)",
+    "AIMING_SCOPE_SIGHT": "Dispositivos de visión nocturna   (930881031)",
+    "MAGNIFIER": "Lupas para lectura (4352920031)",
+    "TELESCOPE": "Monoculares (930884031)",
+    "BINOCULAR": "Prismáticos (930885031)",
+    "FLASHLIGHT": "Linternas (3053011031)",
+    "NAVIGATION_COMPASS": "Brújulas (2928776031)",
+}
+
+_CM = "Centímetros"
+_NO_TOY_WARNING = "Ninguna advertencia aplicable"
+
+KONUS_AMAZON = {
+    "type_column": "product_type",
+    "fields": [
+        {"target": "SKU", "source": "EAN"},
+        {"target": "SKU principal", "source": "EAN"},
+        {"target": "ID del producto", "source": "EAN"},
+        {"target": "Marca", "value": "Konus Italia Group S.R.L"},
+        {"target": "Fabricante", "value": "Konus Italia Group S.R.L"},
+        {"target": "Nombre Modelo", "source": "Modelo"},
+        {"target": "Numero de modelo", "source": "model_number"},
+        {"target": "Nombre del producto", "source": "Título_producto"},
+        {"target": "Palabra clave genérica", "source": "Descripción_corta"},
+        {"target": "Descripción del producto", "source": "Descripción_larga"},
+        {"target": "Viñeta", "source": "bullet"},
+        {"target": "Nodos recomendados de búsqueda", "source": "product_type",
+         "transforms": [("map", KONUS_BROWSE_NODES)]},
+        {"target": "Tamaño", "value": None},
+        {"target": "Tipo de producto", "source": "product_type"},
+        {"target": "Precio de venta recomendado (PVPR)", "source": "PVP FINAL", "transforms": ["digits"]},
+        {"target": "Tu precio EUR (Vender en Amazon, ES)", "source": "PVP FINAL", "transforms": ["digits"]},
+        {"target": "Precio de venta. EUR (Vender en Amazon, ES)", "source": "PVP FINAL", "transforms": ["digits"]},
+        {"target": "Estado del producto", "value": "Nuevo"},
+        {"target": "Tipo de identificador del producto", "value": "EAN"},
+        {"target": "Grupo de la marina mercante (ES)", "value": "Nueva plantilla Envios"},
+        {"target": "Cumplimiento de código de canal (ES)", "value": "DEFAULT"},
+        {"target": "Cantidad (ES)", "value": "1"},
+        {"target": "Número de Artículos", "value": "1"},
+        {"target": "Número de cajas", "value": "1"},
+        {"target": "Componentes Incluidos", "value": "1 artículo"},
+        {"target": "Numero de pieza", "source": "part_number"},
+        {"target": "Longitud Paquete", "value": "1"},
+        {"target": "Ancho Paquete", "value": "1"},
+        {"target": "Altura Paquete", "value": "1"},
+        {"target": "Unidad de anchura del paquete", "value": _CM},
+        {"target": "Unidad de longitud del paquete", "value": _CM},
+        {"target": "Peso Artículo", "source": "PesoNeto", "transforms": ["grams", "falsy_to_null"], "default": "1"},
+        {"target": "Unidad de peso del artículo", "value": "Gramos"},
+        {"target": "Tamaño del anillo", "source": "Medidas",
+         "transforms": ["lower", ("replace", "cm", ""), ("replace", " ", ""), ("replace", "x", "; ")]},
+        {"target": "Aumento máximo", "source": "max_magnification"},
+        {"target": "Distancia focal mínima", "source": "min_focal_distance"},
+        {"target": "Unidad de altura del paquete", "value": _CM},
+        {"target": "Peso del paquete", "value": "1"},
+        {"target": "Unidad del peso del paquete", "value": "Kilogramos"},
+        {"target": "Garantía de Producto", "value": "2"},
+        {"target": "¿Se necesitan baterías?", "value": "No"},
+        {"target": "Normativas sobre mercancías peligrosas", "value": "No aplicable"},
+        {"target": "Riesgo del GDPR", "value": "No hay información electrónica almacenada."},
+        {"target": "URL de la imagen principal", "source": "Imagen_grande"},
+        {"target": "País de origen", "value": "Italia"},
+        {"target": "Color", "value": "negro"},
+        {"target": "Mapa de color", "value": "negro"},
+        {"target": "Grosor del artículo desde la parte delantera hasta la trasera", "value": "0"},
+        {"target": "Altura del artículo desde la base hasta la parte superior", "value": "0"},
+        {"target": "Ancho del artículo de lado a lado", "value": "0"},
+        {"target": "Fecha de comienzo de la venta. (Vender en Amazon, ES)", "value": "2026-01-20"},
+        {"target": "Fecha de finalización de la venta. (Vender en Amazon, ES)", "value": "2027-01-01"},
+    ],
+    "overrides": {
+        "FLASHLIGHT": [
+            {"target": "Tamaño", "value": "pequeño"},
+            {"target": "Fuente Alimentación", "value": "Batería"},
+            {"target": "Etiquetado Eficiencia Energética UE", "value": "A to G"},
+            {"target": "Eficiencia", "value": "A"},
+            {"target": "Conteo de unidades", "value": "1"},
+            {"target": "Tipo de conteo de unidades", "value": "unidad"},
+            {"target": "¿Es frágil?", "value": "No"},
+            {"target": "Unidad de la altura", "value": _CM},
+            {"target": "Unidad de la longitud", "value": _CM},
+            {"target": "Unidad del ancho", "value": _CM},
+            {"target": "Unidad de altura del artículo", "value": _CM},
+            {"target": "Unidad de grosor del artículo", "value": _CM},
+            {"target": "Unidad del ancho del artículo", "value": _CM},
+            {"target": "Altura desde la base hasta la parte superior", "value": "1"},
+            {"target": "Longitud del borde horizontal más largo", "value": "1"},
+            {"target": "Ancho del borde horizontal más corto", "value": "1"},
+        ],
+        "MAGNIFIER": [
+            {"target": "¿Es frágil?", "value": "No"},
+            {"target": "Tamaño", "value": "pequeño"},
+        ],
+        "CAMERA_TRIPOD": [
+            {"target": "Material", "value": "Plástico"},
+            {"target": "Unidad de grosor del artículo", "value": _CM},
+            {"target": "Unidad de altura del artículo", "value": _CM},
+            {"target": "Unidad del ancho del artículo", "value": _CM},
+        ],
+        "NAVIGATION_COMPASS": [
+            {"target": "Material", "value": "Plástico"},
+            {"target": "Seguridad Juguetes Edad EU Advertencia", "value": _NO_TOY_WARNING},
+            {"target": "Advertencia No Requisito Edad EU DSJ", "value": _NO_TOY_WARNING},
+        ],
+        "RANGEFINDER": [
+            {"target": "Material", "value": "Plástico"},
+            {"target": "Tamaño", "value": "pequeño"},
+            {"target": "Seguridad Juguetes Edad EU Advertencia", "value": _NO_TOY_WARNING},
+            {"target": "Advertencia No Requisito Edad EU DSJ", "value": _NO_TOY_WARNING},
+        ],
+        "AIMING_SCOPE_SIGHT": [
+            {"target": "Material", "value": "Plástico"},
+            {"target": "Tamaño", "value": "pequeño"},
+            # Grams → pounds
+            {"target": "Peso Artículo", "source": "PesoNeto",
+             "transforms": ["grams", "falsy_to_null", ("scale", 1 / 453.6), ("round", 2)], "default": "1"},
+            {"target": "Unidad de peso del artículo", "value": "Libras"},
+            {"target": "Peso Artículo Unidad", "value": "Libras"},
+            {"target": "Seguridad Juguetes Edad EU Advertencia", "value": _NO_TOY_WARNING},
+            {"target": "Nombre del departamento", "value": "Adultos unisex"},
+            {"target": "Advertencia No Requisito Edad EU DSJ", "value": _NO_TOY_WARNING},
+        ],
+        "TELESCOPE": [
+            {"target": "Unidad de grosor del artículo", "value": _CM},
+            {"target": "Unidad de altura del artículo", "value": _CM},
+            {"target": "Unidad del ancho del artículo", "value": _CM},
+            {"target": "Aumento máximo", "source": "max_magnification",
+             "transforms": ["falsy_to_null"], "default": "0"},
+            {"target": "Distancia focal mínima", "source": "min_focal_distance",
+             "transforms": ["falsy_to_null"], "default": "0"},
+        ],
+        "BINOCULAR": [
+            {"target": "Unidad de longitud del artículo", "value": _CM},
+            {"target": "Unidad del ancho del artículo", "value": _CM},
+            {"target": "Longitud del artículo desde el borde más largo", "value": "1"},
+            {"target": "Ancho del artículo desde el borde más corto", "value": "1"},
+        ],
+        "MICROSCOPES": [
+            {"target": "Unidad de longitud del artículo", "value": _CM},
+        ],
+    },
+}
+
+# =========================
+# AMAZON → WORTEN (Data sheet, amazon_to_worten.py)
+# =========================
+# Input: all_listings_ready stage rows plus image1..image12 resolved from the
+# image store. mp_category is the Worten category of the workbook.
+WORTEN_MAX_IMAGES = 12
+
+WORTEN = {
+    "fields": [
+        *(
+            {"target": target, "source": "item-name", "default": ""}
+            for target in ("product_name_pt_PT", "product_name_es_ES",
+                           "product_description_pt_PT", "product_description_es_ES")
+        ),
+        {"target": "ean", "source": "seller-sku", "default": ""},
+        {"target": "product_id", "source": "seller-sku", "default": ""},
+        {"target": "type_pt_PT", "source": "amazon_product_type_es", "default": ""},
+        {"target": "type_es_ES", "source": "amazon_product_type_es", "default": ""},
+        {"target": "product-brand", "source": "manufacturer", "default": ""},
+        *(
+            {"target": f"image{i}", "source": f"image{i}"}
+            for i in range(1, WORTEN_MAX_IMAGES + 1)
+        ),
+        {"target": "mp_category", "param": "mp_category"},
+    ],
+}
+
+# =========================
+# KONUS → AMAZON FLAT FILE (to_amazon.py)
+# =========================
+KONUS_FLAT_FILE = {
+    "fields": [
+        {"target": "SKU", "source": "Código"},
+        {"target": "Product Type", "source": "Tipo"},
+        {"target": "Brand Name", "source": "Marca"},
+        {"target": "Item Name", "source": "Título_producto"},
+        {"target": "Product Description", "source": "Descripción_larga"},
+        {"target": "Bullet Point1", "source": "Descripción_corta"},
+        {"target": "MSRP", "source": "PVP FINAL", "transforms": ["decimal"]},
+        {"target": "Main Image URL", "source": "Imagen_grande"},
+        {"target": "Quantity", "value": 1},
+        {"target": "Condition Type", "value": "New"},
+        {"target": "Fulfillment Latency", "value": 1},
+        {"target": "Standard Price", "source": "PVP FINAL", "transforms": ["decimal"]},
+        {"target": "Product ID Type", "value": "EAN"},
+        {"target": "Product ID", "source": "EAN"},
+    ],
+}
+
+# =========================
+# SHOPIFY INVENTORY → AMAZON CATALOG (shopify_to_amazon.py)
+# =========================
+# Params: proveedores (known PROVEEDOR values), now (timestamp string)
+SHOPIFY_CATALOG_BLANK = [
+    "Variable %", "Variable €", "Precio €", "Beneficio €", "Beneficio %",
+    "PVP (Con Tax)", "Comision Amazon %", "Comision Amazon €", "Final PVP €",
+]
+
+
+def shopify_catalog_spec(proveedores) -> dict:
+    return {
+        "fields": [
+            {"target": "PROVEEDOR", "source": "Title",
+             "transforms": [("first_match", sorted(proveedores), "Shopify")], "default": "Shopify"},
+            {"target": "EAN", "source": "SKU"},  # Shopify SKU is the EAN
+            {"target": "NOMBRE", "source": "Title"},
+            {"target": "COSTOS", "source": "Cost"},
+            {"target": "FECHA", "param": "now"},
+            {"target": "Fijo €", "value": 1.5},
+            {"target": "ASIN", "source": "ASIN"},
+            *({"target": col, "value": ""} for col in SHOPIFY_CATALOG_BLANK),
+        ],
+    }
@@ -0,0 +1,311 @@
+"""
+convert.py
+----------
+One streaming converter between CSV, TSV, XLSX/XLSM, Parquet and Amazon
+flat-file .txt reports.
+
+    python scripts/formatting/convert.py input/active_listings.txt output/active_listings.csv --quoting all
+    python scripts/formatting/convert.py input/konus_catalog.csv output/konus.xlsx --columns EAN Modelo
+    python scripts/formatting/convert.py output/prices.csv output/prices.parquet
+
+Formats come from the file extensions (--from / --to override). For text
+inputs the encoding is detected from a sample (BOM, then UTF-8, then
+cp1252, then latin-1) and so is the delimiter of .csv files (Konus exports
+are ';'); .tsv and .txt are tab-separated. Text is parsed with pandas' C
+parser in chunks, so memory does not grow with file size. Values are kept
+as strings by default, so nothing is re-inferred (EANs keep their leading
+zeros); --infer-types keeps numbers numeric, e.g. for XLSX output.
+
+From Python:
+
+    from convert import convert
+    convert("input/active_listings.txt", "output/active_listings.csv", quoting="all")
+"""
+
+import argparse
+import codecs
+import csv
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pandas as pd
+
+from xlsx_read import iter_rows
+from xlsx_stream import StreamingXlsxWriter
+
+CHUNK_SIZE = 100_000
+SAMPLE_BYTES = 64 * 1024
+
+FORMATS = ("csv", "tsv", "txt", "xlsx", "parquet")
+EXTENSIONS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".txt": "txt",    # Amazon flat-file reports: tab-separated
+    ".xlsx": "xlsx",
+    ".xlsm": "xlsx",
+    ".parquet": "parquet",
+}
+DEFAULT_SEP = {"csv": ",", "tsv": "\t", "txt": "\t"}
+
+QUOTING = {
+    "minimal": csv.QUOTE_MINIMAL,
+    "all": csv.QUOTE_ALL,
+    "nonnumeric": csv.QUOTE_NONNUMERIC,
+    "none": csv.QUOTE_NONE,
+}
+
+
+# =========================
+# DETECTION
+# =========================
+def detect_format(path: str) -> str:
+    fmt = EXTENSIONS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Can't tell the format of {path}; pass it explicitly")
+    return fmt
+
+
+def _sample(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(SAMPLE_BYTES)
+
+
+def detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            # Incremental decode: a character cut at the end of the sample is fine
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def detect_delimiter(sample: bytes, encoding: str, default: str = ",") -> str:
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    lines = text.splitlines()[:50]
+    if len(lines) > 1:
+        lines = lines[:-1]  # last line may be cut
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=",;\t|").delimiter
+    except csv.Error:
+        return default
+
+
+# =========================
+# READERS (chunks of string columns)
+# =========================
+def _read_text(path, fmt, sep, encoding, usecols, chunksize, engine, dtype) -> Iterator[pd.DataFrame]:
+    sample = _sample(path)
+    encoding = encoding or detect_encoding(sample)
+    if sep is None:
+        sep = detect_delimiter(sample, encoding, DEFAULT_SEP[fmt]) if fmt == "csv" else DEFAULT_SEP[fmt]
+    print(f"📄 {path}: encoding {encoding}, delimiter {sep!r}")
+
+    yield from pd.read_csv(
+        path,
+        sep=sep,
+        encoding=encoding,
+        dtype=dtype,
+        keep_default_na=dtype is not str,  # as strings, "NA" stays text and empty stays empty
+        usecols=usecols,
+        chunksize=chunksize,
+        engine=engine,
+    )
+
+
+def _read_xlsx(path, sheet, header, usecols, chunksize, dtype) -> Iterator[pd.DataFrame]:
+    names, rows = iter_rows(path, sheet, header=header, usecols=usecols, dtype=dtype)
+    batch, emitted = [], False
+    for values in rows:
+        batch.append(values)
+        if len(batch) >= chunksize:
+            yield pd.DataFrame(batch, columns=names)
+            batch, emitted = [], True
+    if batch or not emitted:
+        yield pd.DataFrame(batch, columns=names)
+
+
+def _read_parquet(path, usecols, chunksize) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    emitted = False
+    for batch in pf.iter_batches(batch_size=chunksize, columns=usecols):
+        yield batch.to_pandas()
+        emitted = True
+    if not emitted:
+        yield pf.schema_arrow.empty_table().select(usecols or pf.schema_arrow.names).to_pandas()
+
+
+# =========================
+# WRITERS
+# =========================
+class _TextWriter:
+    def __init__(self, path, sep, encoding, quoting):
+        self.f = open(path, "w", newline="", encoding=encoding)
+        self.sep = sep
+        self.quoting = quoting
+        self.header = True
+
+    def write(self, chunk: pd.DataFrame):
+        chunk.to_csv(self.f, sep=self.sep, index=False, header=self.header, quoting=self.quoting)
+        self.header = False
+
+    def close(self):
+        self.f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path, split):
+        self.writer = StreamingXlsxWriter(path, split=split)
+
+    def write(self, chunk: pd.DataFrame):
+        self.writer.write_frame(chunk)
+
+    def close(self):
+        self.writer.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet needs the `pyarrow` package") from e
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# =========================
+# CONVERT
+# =========================
+def read_chunks(
+    src: str,
+    src_format: str | None = None,
+    sep: str | None = None,
+    encoding: str | None = None,
+    usecols: list[str] | None = None,
+    sheet: str | None = None,
+    header: int = 0,
+    chunksize: int = CHUNK_SIZE,
+    engine: str = "c",
+    dtype: type | None = str,
+) -> Iterator[pd.DataFrame]:
+    """DataFrame chunks of any supported input. Parquet keeps its own types."""
+    fmt = src_format or detect_format(src)
+    if fmt in DEFAULT_SEP:
+        chunks = _read_text(src, fmt, sep, encoding, usecols, chunksize, engine, dtype)
+    elif fmt == "xlsx":
+        chunks = _read_xlsx(src, sheet, header, usecols, chunksize, dtype)
+    elif fmt == "parquet":
+        chunks = _read_parquet(src, usecols, chunksize)
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+    if usecols is None:
+        return chunks
+    # Readers return projected columns in file order; use the requested one
+    return (chunk[list(usecols)] for chunk in chunks)
+
+
+def convert(
+    src: str,
+    dst: str,
+    src_format: str | None = None,
+    dst_format: str | None = None,
+    sep: str | None = None,
+    encoding: str | None = None,
+    out_sep: str | None = None,
+    out_encoding: str = "utf-8",
+    quoting: str = "minimal",
+    usecols: list[str] | None = None,
+    sheet: str | None = None,
+    header: int = 0,
+    chunksize: int = CHUNK_SIZE,
+    engine: str = "c",
+    dtype: type | None = str,
+    split: str = "sheet",
+    transform: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+) -> int:
+    """
+    Stream src into dst chunk by chunk. Returns the number of data rows.
+    `transform` is applied to each chunk; `split` is what a full XLSX sheet
+    rolls over to ("sheet" or "file", see StreamingXlsxWriter).
+    """
+    out_fmt = dst_format or detect_format(dst)
+    if out_fmt in DEFAULT_SEP:
+        writer = _TextWriter(dst, out_sep or DEFAULT_SEP[out_fmt], out_encoding, QUOTING[quoting])
+    elif out_fmt == "xlsx":
+        writer = _XlsxWriter(dst, split)
+    elif out_fmt == "parquet":
+        writer = _ParquetWriter(dst)
+    else:
+        raise ValueError(f"Unsupported output format: {out_fmt}")
+
+    rows = 0
+    try:
+        for chunk in read_chunks(src, src_format, sep, encoding, usecols, sheet, header, chunksize, engine, dtype):
+            if transform is not None:
+                chunk = transform(chunk)
+            writer.write(chunk)
+            rows += len(chunk)
+            print(f"Wrote {rows} rows")
+    finally:
+        writer.close()
+    return rows
+
+
+# =========================
+# CLI
+# =========================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--from", dest="src_format", choices=FORMATS)
+    parser.add_argument("--to", dest="dst_format", choices=FORMATS)
+    parser.add_argument("--sep", help="input delimiter (detected for .csv)")
+    parser.add_argument("--encoding", help="input encoding (detected)")
+    parser.add_argument("--out-sep", help="output delimiter")
+    parser.add_argument("--out-encoding", default="utf-8")
+    parser.add_argument("--quoting", choices=list(QUOTING), default="minimal")
+    parser.add_argument("--columns", nargs="+", help="only these columns, in this order")
+    parser.add_argument("--sheet", help="XLSX sheet (default: first)")
+    parser.add_argument("--header", type=int, default=0, help="XLSX header row, 0-based")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--engine", choices=["c", "pyarrow", "python"], default="c",
+                        help="text parser (python only for malformed files)")
+    parser.add_argument("--split", choices=["sheet", "file"], default="sheet",
+                        help="XLSX output past 1,048,576 rows: new sheet or new file")
+    parser.add_argument("--infer-types", action="store_true", help="let pandas type the columns")
+    args = parser.parse_args()
+
+    n = convert(
+        args.src, args.dst,
+        src_format=args.src_format, dst_format=args.dst_format,
+        sep=args.sep, encoding=args.encoding,
+        out_sep=args.out_sep, out_encoding=args.out_encoding,
+        quoting=args.quoting, usecols=args.columns,
+        sheet=args.sheet, header=args.header,
+        chunksize=args.chunksize, engine=args.engine,
+        dtype=None if args.infer_types else str, split=args.split,
+    )
+    print(f"\nDONE: {args.src} → {args.dst} ({n} rows)")
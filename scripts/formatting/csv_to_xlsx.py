@@ -1,35 +1,23 @@
-import pandas as pd
+from convert import convert
+from xlsx_stream import clean_price_columns
 
 INPUT_CSV = "output/amazon_updated_prices.csv"
 OUTPUT_XLSX = "output/amazon_updated_prices.xlsx"
 
 CHUNK_SIZE = 100_000
 
+# Rows are streamed to disk as they are read; past Excel's 1,048,576-row
+# limit the writer continues on a new sheet ("file" starts a new workbook)
+SPLIT = "sheet"
+
 
 def main():
-    writer = pd.ExcelWriter(
-        OUTPUT_XLSX,
-        engine="openpyxl"
+    # Clean MSRP / Standard Price if present; other numbers stay numeric
+    rows = convert(
+        INPUT_CSV, OUTPUT_XLSX,
+        chunksize=CHUNK_SIZE, dtype=None, split=SPLIT, transform=clean_price_columns,
     )
-
-    start_row = 0
-    header_written = False
-
-    for chunk in pd.read_csv(INPUT_CSV, chunksize=CHUNK_SIZE):
-        chunk.to_excel(
-            writer,
-            index=False,
-            startrow=start_row,
-            header=not header_written
-        )
-
-        start_row += len(chunk)
-        header_written = True
-
-        print(f"Wrote {start_row} rows")
-
-    writer.close()
-    print(f"\nDONE: {OUTPUT_XLSX}")
+    print(f"\nDONE: {OUTPUT_XLSX} ({rows} rows)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+"""
+pipeline_io.py
+--------------
+Typed Parquet files between pipeline stages.
+
+The multi-step pipelines hand their data from script to script:
+
+    asin_results → translated_catalog → translated_catalog_valid
+    all_listings_with_images → ..._and_category → ..._and_category_translated
+        → all_listings_ready → amazon_to_worten
+
+Each stage is a file in output/ with a declared schema (STAGES). Stages are
+written as Parquet, so the next one reads only the columns it asks for and
+gets them back with the right types. Identifiers (EAN, ASIN, SKUs) are
+always strings and keep their leading zeros. Columns not in the schema are
+kept as strings.
+
+    df = read_stage("all_listings_ready", columns=["seller-sku", "manufacturer"])
+    write_stage(df, "all_listings_ready", export_csv=True)
+
+CSV is an export format: write_stage(export_csv=True) also writes
+output/<stage>.csv, and `python scripts/formatting/pipeline_io.py <stage>`
+exports an existing stage. When a stage has a Parquet file, that is what
+read_stage reads; output/<stage>.csv is only read when there is none (runs
+from before this module, or files prepared by hand; delete the Parquet
+file to use an edited CSV). Without pyarrow, stages are read and written
+as CSV.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+PIPELINE_DIR = "output"
+
+STRING, FLOAT, INT = "string", "float64", "Int64"
+
+# =========================
+# SCHEMAS
+# =========================
+CATALOG = {"EAN": STRING, "ASIN": STRING, "NOMBRE": STRING, "PROVEEDOR": STRING, "FECHA": STRING}
+TRANSLATED_CATALOG = {**CATALOG, "NOMBRE_EN": STRING, "NOMBRE_ES": STRING}
+
+# Amazon "All listings" report columns used downstream
+LISTINGS = {
+    "seller-sku": STRING,
+    "asin1": STRING,
+    "asin2": STRING,
+    "asin3": STRING,
+    "item-name": STRING,
+    "item-description": STRING,
+    "brand-name": STRING,
+    "bullet-point1": STRING,
+    "bullet-point2": STRING,
+    "bullet-point3": STRING,
+    "price": FLOAT,
+    "quantity": INT,
+}
+LISTINGS_WITH_IMAGES = {**LISTINGS, **{f"image{i}": STRING for i in range(1, 13)}}
+LISTINGS_WITH_CATEGORY = {
+    **LISTINGS_WITH_IMAGES,
+    "amazon_tipo_de_producto": STRING,
+    "amazon_product_type": STRING,
+}
+LISTINGS_TRANSLATED = {**LISTINGS_WITH_CATEGORY, "amazon_product_type_es": STRING}
+LISTINGS_READY = {**LISTINGS_TRANSLATED, "manufacturer": STRING}
+
+STAGES = {
+    "asin_results": CATALOG,
+    "translated_catalog": TRANSLATED_CATALOG,
+    "translated_catalog_valid": TRANSLATED_CATALOG,
+    "all_listings_with_images": LISTINGS_WITH_IMAGES,
+    "all_listings_with_images_and_category": LISTINGS_WITH_CATEGORY,
+    "all_listings_with_images_and_category_translated": LISTINGS_TRANSLATED,
+    "all_listings_ready": LISTINGS_READY,
+}
+
+_ARROW_TYPES = {STRING: "string", FLOAT: "float64", INT: "int64"}
+
+
+# =========================
+# PATHS
+# =========================
+def stage_path(stage: str, suffix: str = ".parquet") -> Path:
+    return Path(PIPELINE_DIR) / f"{stage}{suffix}"
+
+
+def _source(stage: str) -> Path:
+    """
+    The stage file to read: Parquet when it exists, else the CSV. The CSV
+    is never preferred over an existing Parquet file, whatever its mtime:
+    it may be an export, or a partial file from an interrupted run.
+    """
+    parquet, csv = stage_path(stage), stage_path(stage, ".csv")
+    if pq is not None and parquet.exists():
+        return parquet
+    if csv.exists():
+        return csv
+    raise FileNotFoundError(f"Stage '{stage}' not found ({parquet} / {csv})")
+
+
+def stage_exists(stage: str) -> bool:
+    try:
+        _source(stage)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+# =========================
+# TYPES
+# =========================
+def _types(stage: str) -> dict:
+    if stage not in STAGES:
+        raise KeyError(f"Unknown pipeline stage: {stage}")
+    return STAGES[stage]
+
+
+def _as_text(s: pd.Series) -> pd.Series:
+    # A column that went through float inference (EAN 8.4e12) back to digits
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        s = s.astype("Int64")
+    return s.astype("string")
+
+
+def _as_number(s: pd.Series, kind: str) -> pd.Series:
+    """FLOAT / INT column; INT values are rounded (quantity 2.5 → 2)."""
+    number = pd.to_numeric(s, errors="coerce")
+    if kind == INT:
+        number = number.round()
+    return number.astype(kind)
+
+
+def _as_declared(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """Columns cast to their declared type; undeclared ones to strings."""
+    out = {}
+    for col in df.columns:
+        kind = types.get(col, STRING)
+        s = df[col]
+        out[col] = _as_text(s) if kind == STRING else _as_number(s, kind)
+    return pd.DataFrame(out, index=df.index)
+
+
+def _numeric_after_read(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    for col in df.columns:
+        kind = types.get(col, STRING)
+        if kind != STRING:
+            df[col] = _as_number(df[col], kind)
+    return df
+
+
+def arrow_schema(stage: str, columns) -> "pa.Schema":
+    types = _types(stage)
+    return pa.schema([(c, getattr(pa, _ARROW_TYPES[types.get(c, STRING)])()) for c in columns])
+
+
+# =========================
+# READ / WRITE
+# =========================
+def stage_columns(stage: str) -> list[str]:
+    """Column names of a stage file without reading its rows."""
+    source = _source(stage)
+    if source.suffix == ".parquet":
+        return pq.read_schema(source).names
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def read_stage(stage: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    A stage as a DataFrame, typed by its schema. With `columns`, only those
+    are read; requested columns the file doesn't have are left out.
+    """
+    types = _types(stage)
+    source = _source(stage)
+
+    if source.suffix == ".parquet":
+        if columns is not None:
+            available = set(pq.read_schema(source).names)
+            columns = [c for c in columns if c in available]
+        # Without the pandas metadata strings come back as with
+        # read_csv(dtype=str) (NaN for missing), not as the nullable dtype
+        df = pq.read_table(source, columns=columns).to_pandas(ignore_metadata=True)
+    else:
+        wanted = None if columns is None else set(columns)
+        df = pd.read_csv(
+            source,
+            dtype=str,
+            usecols=None if wanted is None else (lambda c: c in wanted),
+        )
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+
+    return _numeric_after_read(df, types)
+
+
+def write_stage(df: pd.DataFrame, stage: str, export_csv: bool = False) -> Path:
+    """
+    Atomically replace a stage file with `df`. export_csv also writes
+    output/<stage>.csv.
+    """
+    typed = _as_declared(df, _types(stage))
+    Path(PIPELINE_DIR).mkdir(parents=True, exist_ok=True)
+
+    if export_csv or pq is None:
+        _replace(stage_path(stage, ".csv"), lambda tmp: typed.to_csv(tmp, index=False))
+    if pq is None:
+        return stage_path(stage, ".csv")
+
+    path = stage_path(stage)
+    table = pa.Table.from_pandas(typed, schema=arrow_schema(stage, typed.columns), preserve_index=False)
+    _replace(path, lambda tmp: pq.write_table(table, tmp))
+    return path
+
+
+def _replace(path: Path, write):
+    tmp = path.with_name(f".{path.name}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def export_stage_csv(stage: str, output: str | None = None) -> Path:
+    """Write a stage out as CSV (output/<stage>.csv by default)."""
+    output = Path(output) if output else stage_path(stage, ".csv")
+    _replace(output, lambda tmp: read_stage(stage).to_csv(tmp, index=False))
+    return output
+
+
+# =========================
+# CLI: export stages as CSV
+# =========================
+if __name__ == "__main__":
+    stages = sys.argv[1:]
+    if not stages:
+        print("Usage: python scripts/formatting/pipeline_io.py <stage> [<stage> ...]")
+        print("Stages: " + ", ".join(STAGES))
+        sys.exit(1)
+
+    for stage in stages:
+        print(f"✅ {stage} → {export_stage_csv(stage)}")
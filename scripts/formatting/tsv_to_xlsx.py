@@ -1,40 +1,21 @@
-import pandas as pd
+from convert import convert
+from xlsx_stream import clean_price_columns
 
 INPUT_CSV = "output/konus_amazon_ready.tsv"
 OUTPUT_XLSX = "output/konus_amazon_ready.xlsx"
 CHUNK_SIZE = 100_000
 
+# Rows are streamed to disk as they are read; past Excel's 1,048,576-row
+# limit the writer continues on a new sheet ("file" starts a new workbook)
+SPLIT = "sheet"
+
 def main():
-    writer = pd.ExcelWriter(
-        OUTPUT_XLSX,
-        engine="openpyxl"
+    # Tab-separated, UTF-8; clean MSRP / Standard Price if present
+    rows = convert(
+        INPUT_CSV, OUTPUT_XLSX, sep="\t", encoding="utf-8",
+        chunksize=CHUNK_SIZE, dtype=None, split=SPLIT, transform=clean_price_columns,
     )
-
-    start_row = 0
-    header_written = False
-
-    # Specify the tab separator and encoding
-    for chunk in pd.read_csv(INPUT_CSV, sep='\t', chunksize=CHUNK_SIZE, encoding='utf-8'):
-        # Optional: clean MSRP column
-        if 'MSRP' in chunk.columns:
-            chunk['MSRP'] = chunk['MSRP'].str.replace('€', '').str.replace(' ', '').str.replace(',', '.')
-        if 'Standard Price' in chunk.columns:
-            chunk['Standard Price'] = chunk['Standard Price'].str.replace('€', '').str.replace(' ', '').str.replace(',', '.')
-
-        chunk.to_excel(
-            writer,
-            index=False,
-            startrow=start_row,
-            header=not header_written
-        )
-
-        start_row += len(chunk)
-        header_written = True
-
-        print(f"Wrote {start_row} rows")
-
-    writer.close()
-    print(f"\nDONE: {OUTPUT_XLSX}")
+    print(f"\nDONE: {OUTPUT_XLSX} ({rows} rows)")
 
 
 if __name__ == "__main__":
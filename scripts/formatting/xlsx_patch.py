@@ -0,0 +1,769 @@
+"""
+xlsx_patch.py
+-------------
+Zip-level XLSX/XLSM sheet patcher for filling marketplace templates.
+
+openpyxl.load_workbook parses every sheet, style and validation list of a
+template into Python objects and writes all of them back on save. The
+Amazon and Worten templates are mostly hidden lookup sheets, so a fill of
+a few thousand rows spends nearly all of its time and memory on parts it
+never touches.
+
+This module treats the workbook as the zip package it is:
+
+    headers = sheet_headers("templates/konus.xlsm", "Plantilla", header_row=4)
+    fill_sheet(
+        "templates/konus.xlsm", "output/amazon_konus.xlsm", "Plantilla",
+        ({headers["SKU"]: sku, ...} for sku in skus),
+        start_row=6,
+    )
+
+Only the target worksheet XML is streamed and rewritten: template rows
+above start_row are kept verbatim, template rows from start_row on are
+replaced by the new rows, and <dimension> is updated. New strings are
+appended to sharedStrings.xml (inline strings when the package has none).
+Every other entry (VBA project, styles, hidden sheets, the sheet's own
+data validations) is copied unchanged, so memory stays flat regardless of
+the number of rows.
+
+Corrections to rows already in a sheet go through rows_by_key and
+patch_cells, which only decode and rewrite the rows being changed:
+
+    found = rows_by_key(path, "Data", headers["product_id"], fixes, min_row=3)
+    patch_cells(path, path, "Data", {row: {...} for row, current in found.values()})
+"""
+
+import math
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from html import unescape
+from typing import Any, Iterable
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+CHUNK = 1 << 16
+
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+SHARED_STRINGS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+
+# Characters Excel refuses inside cell text (same set openpyxl rejects)
+ILLEGAL_CHARS = re.compile(r"[\000-\010\013\014\016-\037]")
+
+SHEETDATA_OPEN = re.compile(rb"<(?:\w+:)?sheetData\b[^>]*?(/?)>")
+SHEETDATA_CLOSE = re.compile(rb"</(?:\w+:)?sheetData>")
+ROW_OPEN = re.compile(rb"<(\w+:)?row\b[^>]*?(/?)>")
+ROW_NUMBER = re.compile(rb'\br="(\d+)"')
+DIMENSION = re.compile(rb'(<(?:\w+:)?dimension\s+ref=")([^"]*)(")')
+SST_OPEN = re.compile(rb"<(\w+:)?sst\b[^>]*?(/?)>")
+COUNT_ATTR = re.compile(rb'\b(count|uniqueCount)="(\d+)"')
+CELL = re.compile(rb"<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)", re.S)
+CELL_REF = re.compile(rb'\br="\$?([A-Za-z]+)\$?\d+"')
+CELL_TYPE = re.compile(rb'\bt="(\w+)"')
+CELL_STYLE = re.compile(rb'\bs="\d+"')
+CELL_VALUE = re.compile(rb"<(?:\w+:)?v>(.*?)</(?:\w+:)?v>", re.S)
+CELL_TEXT = re.compile(rb"<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>", re.S)
+SPANS = re.compile(rb'\s+spans="[^"]*"')
+TAG = re.compile(rb"<(/?)(c|v|is|t)\b")
+
+
+# =========================
+# CELL REFERENCES
+# =========================
+def column_letter(idx: int) -> str:
+    letters = ""
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    idx = 0
+    for ch in letters.upper():
+        idx = idx * 26 + ord(ch) - 64
+    return idx
+
+
+def _split_ref(ref: str) -> tuple[int, int]:
+    m = re.match(r"\$?([A-Za-z]+)\$?(\d+)", ref)
+    return column_index(m.group(1)), int(m.group(2))
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+# =========================
+# PACKAGE PARTS
+# =========================
+def _resolve(target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def _workbook_parts(zf: zipfile.ZipFile) -> tuple[dict[str, str], str | None]:
+    """Sheet name → worksheet part, and the shared strings part if any."""
+    rels = {}
+    shared_strings = None
+    for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")):
+        rels[rel.get("Id")] = _resolve(rel.get("Target"))
+        if rel.get("Type") == SHARED_STRINGS_REL:
+            shared_strings = rels[rel.get("Id")]
+
+    sheets = {}
+    for el in ET.fromstring(zf.read("xl/workbook.xml")).iter():
+        if _local(el.tag) == "sheet":
+            sheets[el.get("name")] = rels[el.get(f"{REL_NS}id")]
+    return sheets, shared_strings
+
+
+def sheet_names(path: str) -> list[str]:
+    with zipfile.ZipFile(path) as zf:
+        return list(_workbook_parts(zf)[0])
+
+
+def _sheet_part(zf: zipfile.ZipFile, sheet: str) -> tuple[str, str | None]:
+    sheets, shared_strings = _workbook_parts(zf)
+    if sheet not in sheets:
+        raise KeyError(f"Sheet '{sheet}' not found (sheets: {', '.join(sheets)})")
+    return sheets[sheet], shared_strings
+
+
+# =========================
+# READING
+# =========================
+def _iter_rows(zf: zipfile.ZipFile, part: str, max_row: int | None = None):
+    """
+    Yield (row_number, {column: (type, raw)}) from a worksheet, stopping
+    after max_row. Values are left unresolved (shared string indexes).
+    """
+    implicit = 0
+    with zf.open(part) as f:
+        for _, el in ET.iterparse(f):
+            if _local(el.tag) != "row":
+                continue
+            implicit = int(el.get("r") or implicit + 1)
+            if max_row is not None and implicit > max_row:
+                return
+
+            cells = {}
+            col = 0
+            for c in el:
+                if _local(c.tag) != "c":
+                    continue
+                col = _split_ref(c.get("r"))[0] if c.get("r") else col + 1
+                kind = c.get("t", "n")
+                if kind == "inlineStr":
+                    raw = "".join(t.text or "" for t in c.iter() if _local(t.tag) == "t")
+                else:
+                    v = next((x for x in c if _local(x.tag) == "v"), None)
+                    raw = v.text if v is not None else None
+                if raw not in (None, ""):
+                    cells[col] = (kind, raw)
+            el.clear()
+            yield implicit, cells
+
+
+def _cell_raw(m: re.Match) -> tuple[str, str | None]:
+    """(type, raw) of a CELL match, like _iter_rows."""
+    attrs, body = m.group(1), m.group(2) or b""
+    kind = CELL_TYPE.search(attrs)
+    kind = kind.group(1).decode() if kind else "n"
+    if kind == "inlineStr":
+        return kind, "".join(unescape(t.decode("utf-8")) for t in CELL_TEXT.findall(body))
+    v = CELL_VALUE.search(body)
+    return kind, unescape(v.group(1).decode("utf-8")) if v else None
+
+
+def _row_cells(xml: bytes) -> dict[int, tuple[str, str]]:
+    """_iter_rows' {column: (type, raw)} for one <row> fragment."""
+    cells = {}
+    col = 0
+    for m in CELL.finditer(xml):
+        ref = CELL_REF.search(m.group(1))
+        col = column_index(ref.group(1).decode()) if ref else col + 1
+        kind, raw = _cell_raw(m)
+        if raw not in (None, ""):
+            cells[col] = (kind, raw)
+    return cells
+
+
+def _si_text(el) -> str:
+    # Plain text, or rich text runs concatenated; phonetic hints (<rPh>)
+    # are skipped
+    parts = []
+    for child in el:
+        if _local(child.tag) == "t":
+            parts.append(child.text or "")
+        elif _local(child.tag) == "r":
+            parts.extend(t.text or "" for t in child if _local(t.tag) == "t")
+    return "".join(parts)
+
+
+def _shared_strings(zf: zipfile.ZipFile, part: str | None, wanted: set[int]) -> dict[int, str]:
+    found = {}
+    if part is None or not wanted:
+        return found
+    with zf.open(part) as f:
+        idx = 0
+        for _, el in ET.iterparse(f):
+            if _local(el.tag) != "si":
+                continue
+            if idx in wanted:
+                found[idx] = _si_text(el)
+            idx += 1
+            el.clear()
+            if len(found) == len(wanted):
+                break
+    return found
+
+
+def _shared_string_indexes(zf: zipfile.ZipFile, part: str | None, texts: set[str]) -> dict[int, str]:
+    """Shared string index → text for the entries whose text is in `texts`."""
+    found = {}
+    if part is None or not texts:
+        return found
+    with zf.open(part) as f:
+        idx = 0
+        for _, el in ET.iterparse(f):
+            if _local(el.tag) != "si":
+                continue
+            text = _si_text(el)
+            if text in texts:
+                found[idx] = text
+            idx += 1
+            el.clear()
+    return found
+
+
+def _cell_value(kind: str, raw: str, strings: dict[int, str]) -> Any:
+    if kind == "s":
+        return strings.get(int(raw))
+    if kind == "n":
+        number = float(raw)
+        return int(number) if number.is_integer() else number
+    if kind == "b":
+        return raw == "1"
+    return raw
+
+
+def read_rows(path: str, sheet: str, max_row: int) -> dict[int, dict[int, Any]]:
+    """Values of the first max_row rows: {row: {column: value}}."""
+    with zipfile.ZipFile(path) as zf:
+        part, sst_part = _sheet_part(zf, sheet)
+        rows = dict(_iter_rows(zf, part, max_row))
+        wanted = {int(raw) for cells in rows.values() for kind, raw in cells.values() if kind == "s"}
+        strings = _shared_strings(zf, sst_part, wanted)
+
+    return {
+        r: {col: _cell_value(kind, raw, strings) for col, (kind, raw) in cells.items()}
+        for r, cells in rows.items()
+    }
+
+
+def sheet_headers(path: str, sheet: str, header_row: int) -> dict[str, int]:
+    """Header text → 1-based column index for the given header row."""
+    row = read_rows(path, sheet, header_row).get(header_row, {})
+    headers = {}
+    for col, value in sorted(row.items()):
+        if value is not None and value != "":
+            headers.setdefault(str(value), col)
+    return headers
+
+
+def next_free_row(path: str, sheet: str, column: int, min_row: int = 1) -> int:
+    """
+    Row after the last one with a value in `column`, and at least min_row:
+    where appended rows go. Unlike the first empty cell, a gap in the column
+    can't send fill_sheet's start_row above rows that still hold data.
+    """
+    last = 0
+    with zipfile.ZipFile(path) as zf:
+        part, _ = _sheet_part(zf, sheet)
+        for r, cells in _iter_rows(zf, part):
+            if column in cells:
+                last = r
+    return max(last + 1, min_row)
+
+
+def rows_by_key(
+    path: str,
+    sheet: str,
+    column: int,
+    keys: Iterable[Any],
+    min_row: int = 1,
+) -> dict[str, tuple[int, dict[int, Any]]]:
+    """
+    Find rows by the text of their cell in `column` (e.g. product_id):
+    {key: (row, {column: value})} for the keys present, first match wins.
+
+    One pass over the sheet. Shared strings are looked up for the keys and
+    for the cells of the matched rows only, so the work beyond the scan
+    grows with the number of keys.
+    """
+    keys = {str(k) for k in keys}
+    letter = column_letter(column).encode()
+    with zipfile.ZipFile(path) as zf:
+        part, sst_part = _sheet_part(zf, sheet)
+        key_strings = _shared_string_indexes(zf, sst_part, keys)
+
+        matched = {}
+        with zf.open(part) as src:
+            rows = ((t[2], t[1]) for t in _scan_sheet(src) if t[0] == "row")
+            for r, xml in rows:
+                if r < min_row:
+                    continue
+                # Only the anchor cell is decoded, found by its reference
+                at = xml.find(b'r="%s%d"' % (letter, r))
+                if at >= 0:
+                    cell = CELL.match(xml, xml.rfind(b"<", 0, at))
+                    kind, raw = _cell_raw(cell) if cell else (None, None)
+                else:
+                    # Cells without references
+                    kind, raw = _row_cells(xml).get(column, (None, None))
+                if raw in (None, ""):
+                    continue
+                if kind == "s":
+                    key = key_strings.get(int(raw))
+                elif kind == "n":
+                    key = str(_cell_value(kind, raw, {}))
+                else:
+                    key = raw
+                if key in keys and key not in matched:
+                    matched[key] = (r, _row_cells(xml))
+                    if len(matched) == len(keys):
+                        break
+
+        wanted = {
+            int(raw) for _, cells in matched.values() for kind, raw in cells.values() if kind == "s"
+        }
+        strings = _shared_strings(zf, sst_part, wanted)
+
+    return {
+        key: (r, {col: _cell_value(kind, raw, strings) for col, (kind, raw) in cells.items()})
+        for key, (r, cells) in matched.items()
+    }
+
+
+# =========================
+# WRITING
+# =========================
+class _Strings:
+    """New shared strings, numbered after the ones already in the package."""
+
+    def __init__(self, base: int):
+        self.base = base
+        self.index: dict[str, int] = {}
+        self.refs = 0
+
+    def get(self, text: str) -> int:
+        self.refs += 1
+        idx = self.index.get(text)
+        if idx is None:
+            idx = self.index[text] = self.base + len(self.index)
+        return idx
+
+
+def _count_shared_strings(zf: zipfile.ZipFile, part: str) -> int:
+    count = 0
+    with zf.open(part) as f:
+        for _, el in ET.iterparse(f):
+            if _local(el.tag) == "si":
+                count += 1
+                el.clear()
+    return count
+
+
+def cell_xml(ref: str, value: Any, strings: _Strings | None = None) -> str:
+    """One <c> element; strings go to `strings` or inline. "" for NaN/inf."""
+    if hasattr(value, "item"):
+        value = value.item()  # numpy scalars from pandas rows
+
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return ""
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+
+    text = ILLEGAL_CHARS.sub("", str(value))
+    if strings is not None:
+        return f'<c r="{ref}" t="s"><v>{strings.get(text)}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def row_xml(r: int, row: dict[int, Any], strings: _Strings | None = None) -> tuple[str, int]:
+    """A <row> element for {column: value} and its last written column."""
+    cells = []
+    max_col = 0
+    for col in sorted(row):
+        value = row[col]
+        if value is None or value == "":
+            continue
+        cell = cell_xml(f"{column_letter(col)}{r}", value, strings)
+        if cell:
+            cells.append(cell)
+            max_col = col
+    if not cells:
+        return "", 0
+    return f'<row r="{r}">{"".join(cells)}</row>', max_col
+
+
+def _scan_sheet(src):
+    """
+    Split a worksheet stream into ("head", bytes), ("row", bytes, number)
+    for every <row> in sheetData, and ("tail", bytes) chunks after it. A
+    self-closing <sheetData/> is yielded as an open tag with no rows.
+    """
+    buf = b""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        chunk = src.read(CHUNK)
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
+        return bool(chunk)
+
+    while True:
+        m = SHEETDATA_OPEN.search(buf, pos)
+        if m:
+            break
+        if not more():
+            raise ValueError("worksheet has no <sheetData>")
+
+    if m.group(1) == b"/":
+        yield "head", buf[:m.start()] + m.group(0)[:-2] + b">"
+        yield "tail", b"</" + m.group(0)[1:-2].split()[0] + b">"
+        pos = m.end()
+    else:
+        yield "head", buf[:m.end()]
+        pos = m.end()
+        implicit = 0
+        while True:
+            row = ROW_OPEN.search(buf, pos)
+            # Only look for </sheetData> up to the next row, not the whole buffer
+            close = SHEETDATA_CLOSE.search(buf, pos, row.start() if row else len(buf))
+            if close and (not row or close.start() < row.start()):
+                yield "tail", buf[close.start():close.end()]
+                pos = close.end()
+                break
+            if not row:
+                if not more():
+                    raise ValueError("truncated <sheetData>")
+                continue
+
+            if row.group(2) == b"/":
+                end = row.end()
+            else:
+                close_tag = b"</" + (row.group(1) or b"") + b"row>"
+                end = buf.find(close_tag, row.end())
+                if end < 0:
+                    if not more():
+                        raise ValueError("truncated <row>")
+                    continue
+                end += len(close_tag)
+
+            number = ROW_NUMBER.search(row.group(0))
+            implicit = int(number.group(1)) if number else implicit + 1
+            yield "row", buf[row.start():end], implicit
+            pos = end
+
+    yield "tail", buf[pos:]
+    while not eof:
+        chunk = src.read(CHUNK)
+        eof = not chunk
+        if chunk:
+            yield "tail", chunk
+
+
+def _patch_dimension(head: bytes, last_col: int, last_row: int) -> bytes:
+    m = DIMENSION.search(head)
+    if not m:
+        return head
+    ref = m.group(2).decode()
+    first, _, last = ref.partition(":")
+    first_col, first_row = _split_ref(first)
+    if last:
+        old_col, old_row = _split_ref(last)
+        last_col, last_row = max(last_col, old_col), max(last_row, old_row)
+    new_ref = f"{column_letter(first_col)}{first_row}:{column_letter(max(last_col, first_col))}{max(last_row, first_row)}"
+    return head[:m.start(2)] + new_ref.encode() + head[m.end(2):]
+
+
+def _write_shared_strings(src, dst, strings: _Strings):
+    head = b""
+    while True:
+        chunk = src.read(CHUNK)
+        head += chunk
+        m = SST_OPEN.search(head)
+        if m or not chunk:
+            break
+    if not m:
+        raise ValueError("sharedStrings.xml has no <sst>")
+
+    prefix = m.group(1) or b""
+    unique = strings.base + len(strings.index)
+
+    def counts(attr):
+        name, old = attr.group(1), int(attr.group(2))
+        return b'%s="%d"' % (name, unique if name == b"uniqueCount" else old + strings.refs)
+
+    open_tag = COUNT_ATTR.sub(counts, m.group(0))
+    if b"uniqueCount=" not in open_tag:
+        open_tag = open_tag.replace(b"sst", b'sst uniqueCount="%d"' % unique, 1)
+    if b" count=" not in open_tag:
+        open_tag = open_tag.replace(b"sst", b'sst count="%d"' % (strings.base + strings.refs), 1)
+
+    entries = "".join(
+        f'<{prefix.decode()}si><{prefix.decode()}t xml:space="preserve">{escape(text)}</{prefix.decode()}t></{prefix.decode()}si>'
+        for text in strings.index
+    ).encode("utf-8")
+    close_tag = b"</" + prefix + b"sst>"
+
+    if m.group(2) == b"/":
+        dst.write(head[:m.start()] + open_tag[:-2] + b">" + entries + close_tag + head[m.end():])
+        return
+
+    # Stream the existing entries, holding back enough bytes to find </sst>
+    dst.write(head[:m.start()] + open_tag)
+    buf = head[m.end():]
+    while True:
+        chunk = src.read(CHUNK)
+        buf += chunk
+        end = buf.rfind(close_tag)
+        if end >= 0 and not chunk:
+            dst.write(buf[:end] + entries + buf[end:])
+            return
+        if not chunk:
+            raise ValueError("truncated sharedStrings.xml")
+        keep = len(close_tag) + 16
+        if len(buf) > keep:
+            dst.write(buf[:-keep])
+            buf = buf[-keep:]
+
+
+def fill_sheet(
+    template: str,
+    output: str,
+    sheet: str,
+    rows: Iterable[dict[int, Any]],
+    start_row: int,
+) -> int:
+    """
+    Write `rows` ({column: value}, 1-based columns) into `sheet` from
+    start_row down, replacing any template rows at or below start_row, and
+    save the package to `output` (atomically; output may equal template).
+    Returns the number of rows written.
+    """
+    with zipfile.ZipFile(template) as zin:
+        part, sst_part = _sheet_part(zin, sheet)
+        strings = _Strings(_count_shared_strings(zin, sst_part)) if sst_part else None
+
+        # Rows are spooled so <dimension>, which precedes them, can be set
+        # once the last row is known
+        body = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+        head = b""
+        tail = []
+        last_row = 0
+        last_col = 0
+        written = 0
+
+        with zin.open(part) as src:
+            scan = _scan_sheet(src)
+            for token in scan:
+                kind = token[0]
+                if kind == "head":
+                    head = token[1]
+                elif kind == "row":
+                    if token[2] < start_row:
+                        body.write(token[1])
+                        last_row = token[2]
+                else:
+                    tail.append(token[1])
+                    break
+
+            r = start_row
+            for row in rows:
+                xml, max_col = row_xml(r, row, strings)
+                if xml:
+                    body.write(xml.encode("utf-8"))
+                    last_row, last_col = r, max(last_col, max_col)
+                r += 1
+                written += 1
+
+            head = _patch_dimension(head, last_col, last_row)
+
+            temp_path = output + ".tmp"
+            with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                    out_info.compress_type = info.compress_type
+                    out_info.external_attr = info.external_attr
+
+                    with zout.open(out_info, "w") as dst:
+                        if info.filename == part:
+                            dst.write(head)
+                            body.seek(0)
+                            shutil.copyfileobj(body, dst)
+                            for chunk in tail:
+                                dst.write(chunk)
+                            for token in scan:
+                                dst.write(token[1])
+                        elif info.filename == sst_part and strings.index:
+                            with zin.open(info) as src_sst:
+                                _write_shared_strings(src_sst, dst, strings)
+                        else:
+                            with zin.open(info) as src_entry:
+                                shutil.copyfileobj(src_entry, dst)
+        body.close()
+
+    os.replace(temp_path, output)
+    return written
+
+
+# =========================
+# CELL PATCHES
+# =========================
+def _patch_row(xml: bytes, r: int, updates: dict[int, Any], strings: _Strings | None) -> bytes:
+    """A <row> with `updates` ({column: value}) merged in; None clears a cell."""
+    open_tag = ROW_OPEN.match(xml)
+    prefix = open_tag.group(1) or b""
+    if open_tag.group(2) == b"/":
+        head, body, close = open_tag.group(0)[:-2] + b">", b"", b"</" + prefix + b"row>"
+    else:
+        close = b"</" + prefix + b"row>"
+        head, body = open_tag.group(0), xml[open_tag.end():-len(close)]
+
+    cells = {}
+    col = 0
+    for m in CELL.finditer(body):
+        ref = CELL_REF.search(m.group(1))
+        col = column_index(ref.group(1).decode()) if ref else col + 1
+        cells[col] = m.group(0)
+
+    for col, value in updates.items():
+        ref = f"{column_letter(col)}{r}"
+        # Keep the cell's style (number format, fill, validation look)
+        style = b""
+        if col in cells:
+            old = CELL_STYLE.search(CELL.match(cells[col]).group(1))
+            style = b" " + old.group(0) if old else b""
+
+        empty = value is None or (isinstance(value, float) and not math.isfinite(value)) or value == ""
+        cell = b"" if empty else cell_xml(ref, value, strings).encode("utf-8")
+        if not cell:
+            cell = f'<c r="{ref}"'.encode() + style + b"/>" if style else b""
+        elif style:
+            cell = cell.replace(f'<c r="{ref}"'.encode(), f'<c r="{ref}"'.encode() + style, 1)
+        if prefix:
+            cell = TAG.sub(rb"<\1" + prefix + rb"\2", cell)
+
+        if cell:
+            cells[col] = cell
+        else:
+            cells.pop(col, None)
+
+    # spans is only a loading hint and may no longer cover the cells
+    head = SPANS.sub(b"", head)
+    return head + b"".join(cells[c] for c in sorted(cells)) + close
+
+
+def patch_cells(
+    template: str,
+    output: str,
+    sheet: str,
+    updates: dict[int, dict[int, Any]],
+) -> int:
+    """
+    Set cells of `sheet` ({row: {column: value}}, 1-based; None clears a
+    cell's value) and save the package to `output` (atomically; output may
+    equal template). Rows without updates are copied byte for byte, so the
+    cost beyond streaming the sheet grows with the number of patched rows.
+    Returns the number of cells set.
+    """
+    updates = {r: cells for r, cells in updates.items() if cells}
+    with zipfile.ZipFile(template) as zin:
+        part, sst_part = _sheet_part(zin, sheet)
+        strings = _Strings(_count_shared_strings(zin, sst_part)) if sst_part else None
+
+        pending = sorted(updates)
+        last_row = pending[-1] if pending else 0
+        last_col = max((max(cells) for cells in updates.values()), default=0)
+
+        temp_path = output + ".tmp"
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            # The sheet goes first so the new shared strings are known when
+            # sharedStrings.xml is copied
+            entries = sorted(zin.infolist(), key=lambda info: info.filename != part)
+            for info in entries:
+                out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                out_info.compress_type = info.compress_type
+                out_info.external_attr = info.external_attr
+
+                with zout.open(out_info, "w") as dst:
+                    if info.filename == part:
+                        with zin.open(part) as src:
+                            _stream_patched(src, dst, updates, pending, last_col, last_row, strings)
+                    elif info.filename == sst_part and strings.index:
+                        with zin.open(info) as src_sst:
+                            _write_shared_strings(src_sst, dst, strings)
+                    else:
+                        with zin.open(info) as src_entry:
+                            shutil.copyfileobj(src_entry, dst)
+
+    os.replace(temp_path, output)
+    return sum(len(cells) for cells in updates.values())
+
+
+def _stream_patched(src, dst, updates, pending, last_col, last_row, strings):
+    i = 0
+    out = []
+    size = 0
+
+    def write(data: bytes):
+        # Untouched rows are batched: one zip write per row costs more
+        # than copying them
+        nonlocal size
+        out.append(data)
+        size += len(data)
+        if size >= CHUNK:
+            dst.write(b"".join(out))
+            out.clear()
+            size = 0
+
+    def new_rows_before(limit):
+        # Updates for rows the sheet doesn't have yet, in row order
+        nonlocal i
+        while i < len(pending) and (limit is None or pending[i] < limit):
+            r = pending[i]
+            write(_patch_row(f'<row r="{r}"/>'.encode(), r, updates[r], strings))
+            i += 1
+
+    in_rows = False
+    for token in _scan_sheet(src):
+        kind = token[0]
+        if kind == "head":
+            write(_patch_dimension(token[1], last_col, last_row))
+            in_rows = True
+        elif kind == "row":
+            r = token[2]
+            new_rows_before(r)
+            if i < len(pending) and pending[i] == r:
+                write(_patch_row(token[1], r, updates[r], strings))
+                i += 1
+            else:
+                write(token[1])
+        else:
+            if in_rows:
+                new_rows_before(None)
+                in_rows = False
+            write(token[1])
+    dst.write(b"".join(out))
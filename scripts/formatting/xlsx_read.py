@@ -0,0 +1,210 @@
+"""
+xlsx_read.py
+------------
+Read-only XLSX/XLSM ingestion for large spreadsheets.
+
+pd.read_excel builds openpyxl's full object model (every cell, style and
+sheet) before handing back a DataFrame. Here rows are streamed instead,
+through python-calamine when it is installed (Rust reader, several times
+faster; it holds one sheet's cell values in compact native memory) or
+openpyxl's read-only mode otherwise, and only the requested columns are
+kept:
+
+    df = read_frame("input/konus.xlsm", sheet="Plantilla", header=3, skiprows=3,
+                    usecols=["SKU", "Tipo de producto"], dtype=str)
+
+    xlsx_to_csv("input/catalog.xlsx", "output/catalog.csv")         # no DataFrame
+    xlsx_to_parquet("input/catalog.xlsx", "output/catalog.parquet")  # needs pyarrow
+
+`header` is the 0-based row holding the column names and `skiprows` the
+number of rows dropped after it, as in pd.read_excel(header=...) followed by
+.iloc[skiprows:]. Fully empty rows are skipped. Whole-number floats come back
+as ints, like pd.read_excel.
+"""
+
+import csv
+from typing import Any, Iterator
+
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+PARQUET_BATCH_ROWS = 100_000
+
+
+# =========================
+# ENGINES
+# =========================
+def _calamine_rows(path: str, sheet: str | None) -> Iterator[list]:
+    wb = CalamineWorkbook.from_path(path)
+    ws = wb.get_sheet_by_name(sheet if sheet is not None else wb.sheet_names[0])
+    # Rows start at row 1 but columns at the first used one; pad so column
+    # positions (and 'Unnamed: i' names) match the sheet
+    pad = [None] * ws.start[1] if ws.start else []
+    for row in ws.iter_rows():
+        yield pad + row if pad else row
+
+
+def _used_width(row: tuple) -> int:
+    n = len(row)
+    while n and row[n - 1] in (None, ""):
+        n -= 1
+    return n
+
+
+def _openpyxl_rows(path: str, sheet: str | None) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        # Template dimensions are often stale; read the cells actually there
+        ws.reset_dimensions()
+        # Rows then end at their last cell. Pad them to the widest one, as
+        # pd.read_excel does, so a short header row can't drop columns; this
+        # costs a second pass over the sheet XML
+        width = max((_used_width(row) for row in ws.iter_rows(values_only=True)), default=0)
+        for row in ws.iter_rows(values_only=True):
+            yield row[:width] + (None,) * (width - len(row))
+    finally:
+        wb.close()
+
+
+def _raw_rows(path: str, sheet: str | None, engine: str) -> Iterator:
+    if engine == "auto":
+        engine = "calamine" if CalamineWorkbook is not None else "openpyxl"
+    if engine == "calamine":
+        if CalamineWorkbook is None:
+            raise ImportError("engine='calamine' needs the `python-calamine` package")
+        return _calamine_rows(path, sheet)
+    if engine == "openpyxl":
+        return _openpyxl_rows(path, sheet)
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+# =========================
+# ROWS
+# =========================
+def _value(v: Any) -> Any:
+    if v is None or v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _column_names(header_row) -> list[str]:
+    """Header cells as pandas names them: 'Unnamed: i', duplicates as 'X.1'."""
+    names, seen = [], {}
+    for i, v in enumerate(header_row):
+        v = _value(v)
+        name = f"Unnamed: {i}" if v is None else str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_rows(
+    path: str,
+    sheet: str | None = None,
+    header: int = 0,
+    skiprows: int = 0,
+    usecols: list[str] | None = None,
+    dtype=None,
+    engine: str = "auto",
+) -> tuple[list[str], Iterator[list]]:
+    """
+    Column names and a row iterator (lists, in `usecols` order when given).
+    Raises KeyError if a requested column is missing.
+    """
+    rows = iter(_raw_rows(path, sheet, engine))
+    for _ in range(header):
+        next(rows, None)
+    columns = _column_names(next(rows, ()))
+
+    if usecols is None:
+        positions = list(range(len(columns)))
+    else:
+        missing = [c for c in usecols if c not in columns]
+        if missing:
+            raise KeyError(f"Columns not found in {path}: {missing}")
+        positions = [columns.index(c) for c in usecols]
+    names = [columns[p] for p in positions]
+    as_str = dtype is str
+
+    def generate():
+        skipped = 0
+        for raw in rows:
+            if skipped < skiprows:
+                skipped += 1
+                continue
+            if all(_value(v) is None for v in raw):
+                continue
+            n = len(raw)
+            values = [_value(raw[p]) if p < n else None for p in positions]
+            if as_str:
+                values = [None if v is None else str(v) for v in values]
+            yield values
+
+    return names, generate()
+
+
+def read_frame(path: str, sheet: str | None = None, **kwargs) -> pd.DataFrame:
+    """DataFrame of the projected columns; see iter_rows for the options."""
+    names, rows = iter_rows(path, sheet, **kwargs)
+    df = pd.DataFrame(list(rows), columns=names)
+    return df if kwargs.get("dtype") is str else df.infer_objects()
+
+
+# =========================
+# STREAMING EXPORT
+# =========================
+def xlsx_to_csv(path: str, output: str, sheet: str | None = None, sep: str = ",", **kwargs) -> int:
+    """Stream rows to CSV/TSV without building a DataFrame. Returns the row count."""
+    names, rows = iter_rows(path, sheet, **kwargs)
+    count = 0
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=sep)
+        writer.writerow(names)
+        for values in rows:
+            writer.writerow(["" if v is None else v for v in values])
+            count += 1
+    return count
+
+
+def xlsx_to_parquet(path: str, output: str, sheet: str | None = None, **kwargs) -> int:
+    """Stream rows to Parquet (string columns) in batches. Needs `pyarrow`."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output needs the `pyarrow` package") from e
+
+    kwargs["dtype"] = str
+    names, rows = iter_rows(path, sheet, **kwargs)
+    schema = pa.schema([(name, pa.string()) for name in names])
+
+    def table(batch):
+        columns = list(zip(*batch)) if batch else [()] * len(names)
+        return pa.Table.from_arrays([pa.array(c, pa.string()) for c in columns], schema=schema)
+
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        batch = []
+        for values in rows:
+            batch.append(values)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(table(batch))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(table(batch))
+            count += len(batch)
+    return count
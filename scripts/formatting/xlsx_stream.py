@@ -0,0 +1,235 @@
+"""
+xlsx_stream.py
+--------------
+Write-only streaming XLSX writer for large CSV/TSV exports.
+
+pd.ExcelWriter keeps every cell of the workbook in memory until close(),
+and a sheet cannot hold more than 1,048,576 rows. This writer emits the
+worksheet XML straight into the zip as rows arrive (inline strings, no
+shared string table), so memory stays flat however long the file is, and
+rolls over to a new sheet (or a new file) when a sheet is full. The
+header is repeated at the top of every sheet.
+
+    with StreamingXlsxWriter("output/prices.xlsx") as writer:
+        for chunk in pd.read_csv("output/prices.csv", chunksize=100_000):
+            writer.write_frame(clean_price_columns(chunk))
+"""
+
+import zipfile
+from pathlib import Path
+from typing import Any, Iterable
+from xml.sax.saxutils import quoteattr
+
+import pandas as pd
+
+from xlsx_patch import cell_xml, column_letter
+
+EXCEL_MAX_ROWS = 1_048_576
+PRICE_COLUMNS = ("MSRP", "Standard Price")
+WRITE_BATCH = 2000  # rows per write into the zip stream
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_REL_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_PKG_REL_NS = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+_DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+_STYLES = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet {_NS}>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+
+# =========================
+# CLEANING
+# =========================
+def clean_price_columns(chunk: pd.DataFrame, columns=PRICE_COLUMNS) -> pd.DataFrame:
+    """
+    '12,50 €' → 12.5 for the price columns present in the chunk, so they
+    are written as number cells. Text that still isn't a number after the
+    cleanup is kept as it was; numeric columns are left alone.
+    """
+    for col in columns:
+        if col not in chunk.columns:
+            continue
+        s = chunk[col]
+        if not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+            continue
+        text = (
+            s.astype("string")
+            .str.replace(r"[€\s]", "", regex=True)
+            .str.replace(",", ".", regex=False)
+        )
+        numbers = pd.to_numeric(text, errors="coerce")
+        chunk[col] = numbers.astype(object).where(numbers.notna(), s.astype(object))
+    return chunk
+
+
+# =========================
+# WRITER
+# =========================
+class StreamingXlsxWriter:
+    def __init__(
+        self,
+        path: str,
+        sheet_prefix: str = "Sheet",
+        max_rows: int = EXCEL_MAX_ROWS,
+        split: str = "sheet",
+    ):
+        if split not in ("sheet", "file"):
+            raise ValueError("split must be 'sheet' or 'file'")
+        self.path = Path(path)
+        self.sheet_prefix = sheet_prefix
+        self.max_rows = max_rows
+        self.split = split
+
+        self.header: list[str] | None = None
+        self.letters: list[str] = []
+        self.files: list[Path] = []
+        self.rows_written = 0
+
+        self._zip = None
+        self._sheets: list[str] = []
+        self._sheet = None
+        self._row = 0
+
+    # ---------- package ----------
+    def _open_file(self):
+        n = len(self.files) + 1
+        path = self.path if n == 1 else self.path.with_name(f"{self.path.stem}_{n}{self.path.suffix}")
+        self.files.append(path)
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+        self._sheets = []
+
+    def _close_file(self):
+        self._close_sheet()
+        sheets = self._sheets
+        z = self._zip
+
+        z.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(sheets) + 1)
+            )
+            + "</Types>"
+        ))
+        z.writestr("_rels/.rels", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships {_PKG_REL_NS}>'
+            f'<Relationship Id="rId1" Type="{_DOC_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ))
+        z.writestr("xl/workbook.xml", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<workbook {_NS} {_REL_NS}><sheets>'
+            + "".join(
+                f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"/>'
+                for i, name in enumerate(sheets, start=1)
+            )
+            + "</sheets></workbook>"
+        ))
+        z.writestr("xl/_rels/workbook.xml.rels", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships {_PKG_REL_NS}>'
+            + "".join(
+                f'<Relationship Id="rId{i}" Type="{_DOC_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(sheets) + 1)
+            )
+            + f'<Relationship Id="rId{len(sheets) + 1}" Type="{_DOC_REL}/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ))
+        z.writestr("xl/styles.xml", _STYLES)
+        z.close()
+        self._zip = None
+
+    # ---------- sheets ----------
+    def _open_sheet(self):
+        if self._zip is None:
+            self._open_file()
+        elif self.split == "file":
+            self._close_file()
+            self._open_file()
+        else:
+            self._close_sheet()
+
+        sheet_no = len(self._sheets) + 1
+        self._sheets.append(f"{self.sheet_prefix}{sheet_no}")
+        self._sheet = self._zip.open(f"xl/worksheets/sheet{sheet_no}.xml", "w", force_zip64=True)
+        self._sheet.write(
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet {_NS}><sheetData>'.encode()
+        )
+        self._row = 0
+        if self.header:
+            self._flush([self._row_xml(self.header)])
+
+    def _close_sheet(self):
+        if self._sheet is not None:
+            self._sheet.write(b"</sheetData></worksheet>")
+            self._sheet.close()
+            self._sheet = None
+
+    def _row_xml(self, values: Iterable[Any]) -> str:
+        self._row += 1
+        r = self._row
+        cells = []
+        for letter, value in zip(self.letters, values):
+            if value is None or value == "":
+                continue
+            cells.append(cell_xml(f"{letter}{r}", value))
+        return f'<row r="{r}">{"".join(cells)}</row>'
+
+    def _flush(self, buf: list[str]):
+        # One zip write per batch; per-row writes cost more than the XML
+        if buf:
+            self._sheet.write("".join(buf).encode("utf-8"))
+            buf.clear()
+
+    # ---------- public ----------
+    def set_header(self, header: list[str]):
+        self.header = [str(h) for h in header]
+        self.letters = [column_letter(i) for i in range(1, len(self.header) + 1)]
+
+    def write_rows(self, rows: Iterable[Iterable[Any]]):
+        buf = []
+        for values in rows:
+            if self._sheet is None or self._row >= self.max_rows:
+                if self._sheet is not None:
+                    self._flush(buf)
+                self._open_sheet()
+            buf.append(self._row_xml(values))
+            self.rows_written += 1
+            if len(buf) >= WRITE_BATCH:
+                self._flush(buf)
+        if self._sheet is not None:
+            self._flush(buf)
+
+    def write_frame(self, chunk: pd.DataFrame):
+        if self.header is None:
+            self.set_header(list(chunk.columns))
+        # Nulls of every dtype (NaN, NaT, pd.NA) become empty cells
+        values = chunk.astype(object).where(chunk.notna(), None)
+        self.write_rows(values.itertuples(index=False, name=None))
+
+    def close(self):
+        if self._zip is None and not self.files:
+            self._open_sheet()  # header-only / empty input still yields a valid file
+        if self._zip is not None:
+            self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,12 +1,10 @@
-import pandas as pd
+from convert import convert
 
 # Input and output file paths
 input_file = "input/shopify_catalog_complete.xlsx"
 output_file = "output/shopify_catalog_complete.csv"
 
-# Read the Excel file
-df = pd.read_excel(input_file)
+# Stream the first sheet straight to CSV
+rows = convert(input_file, output_file, out_sep=',')
 
-df.to_csv(output_file, sep=',', index=False)
-
-print(f"Converted '{input_file}' to '{output_file}' successfully!")
+print(f"Converted '{input_file}' to '{output_file}' successfully! ({rows} rows)")
@@ -1,13 +1,10 @@
-import pandas as pd
+from convert import convert
 
 # Input and output file paths
 input_file = "output/Flat.File.PriceInventory.es.xlsx"
 output_file = "output/Flat.File.PriceInventory.es.tsv"
 
-# Read the Excel file
-df = pd.read_excel(input_file)
+# Stream the first sheet as TSV (tab-separated values)
+rows = convert(input_file, output_file, out_sep='\t')
 
-# Save as TSV (tab-separated values)
-df.to_csv(output_file, sep='\t', index=False)
-
-print(f"Converted '{input_file}' to '{output_file}' successfully!")
+print(f"Converted '{input_file}' to '{output_file}' successfully! ({rows} rows)")
@@ -2,9 +2,14 @@ import os
 import json
 import pandas as pd
 import re
+import sys
 from dotenv import load_dotenv
 from mistralai import Mistral
-from openpyxl import load_workbook
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "formatting"))
+from xlsx_patch import patch_cells, rows_by_key, sheet_headers, sheet_names
+from xlsx_read import read_frame
 
 # =========================
 # Config
@@ -17,12 +22,13 @@ client = Mistral(api_key=os.getenv("MISTRAL_API_TOKEN"))
 ERRORS_FILE = "input/worten_errors_bricolaje_y_construccion.xlsx"
 PRODUCTS_FILE = "output/worten/bricolaje_y_construccion.xlsx"
 OUTPUT_FILE = "output/worten/bricolaje_y_construccion_full.xlsx" 
+IN_PLACE = False  # True: patch PRODUCTS_FILE itself instead of writing OUTPUT_FILE
 
 # =========================
 # Load Excel files
 # =========================
-errors_df = pd.read_excel(ERRORS_FILE)
-products_df = pd.read_excel(PRODUCTS_FILE, sheet_name="Data", header=1)
+errors_df = read_frame(ERRORS_FILE, usecols=["product_id", "errors"])
+products_df = read_frame(PRODUCTS_FILE, sheet="Data", header=1)
 
 # =========================
 # Utils
@@ -157,19 +163,13 @@ if not results:
     print("⚠ No results to save.")
     exit(0)
 
-# Load template workbook
-wb = load_workbook(PRODUCTS_FILE)
-if "Data" not in wb.sheetnames:
+# Only the rows of the fixed products are decoded and rewritten; every other
+# row and sheet is copied as is
+if "Data" not in sheet_names(PRODUCTS_FILE):
     raise ValueError("Sheet 'Data' not found in template")
 
-ws = wb["Data"]
-
 # Build column index from header row (row 2, same as your other script)
-col_index = {}
-for col in range(1, ws.max_column + 1):
-    header = ws.cell(row=2, column=col).value
-    if header:
-        col_index[header] = col
+col_index = sheet_headers(PRODUCTS_FILE, "Data", header_row=2)
 
 ANCHOR_COLUMN = "product_id"
 if ANCHOR_COLUMN not in col_index:
@@ -182,38 +182,34 @@ results_by_id = {
     if "product_id" in r
 }
 
-updated = 0
-
-# Iterate existing rows and fill only missing values
-row = 3
-while ws.cell(row=row, column=col_index[ANCHOR_COLUMN]).value:
-    product_id = str(ws.cell(row=row, column=col_index[ANCHOR_COLUMN]).value)
-
-    if product_id not in results_by_id:
-        row += 1
-        continue
+# product_id → (row, current values) for the fixed products, in one pass
+rows_found = rows_by_key(PRODUCTS_FILE, "Data", col_index[ANCHOR_COLUMN], results_by_id, min_row=3)
 
+# {row: {column: value}}: errored fields are rewritten, others only filled
+updates = {}
+for product_id, (row, current) in rows_found.items():
     result = results_by_id[product_id]
+    error_fields = result.get("__error_fields__", set())
 
+    cells = {}
     for field, value in result.items():
         if field not in col_index:
             continue
 
-        cell = ws.cell(row=row, column=col_index[field])
-
-        error_fields = result.get("__error_fields__", set())
-
+        col = col_index[field]
         if field in error_fields:
             # Force rewrite for errored fields
-            cell.value = value
-        elif cell.value in (None, "", "nan"):
+            cells[col] = value
+        elif current.get(col) in (None, "", "nan"):
             # Normal first-pass fill
-            cell.value = value
+            cells[col] = value
+
+    updates[row] = cells
 
-    updated += 1
-    row += 1
+for product_id in results_by_id.keys() - rows_found.keys():
+    print(f"⚠ Product {product_id} not found in {PRODUCTS_FILE}")
 
-# Save as new file
-wb.save(OUTPUT_FILE)
+target = PRODUCTS_FILE if IN_PLACE else OUTPUT_FILE
+patch_cells(PRODUCTS_FILE, target, "Data", updates)
 
-print(f"✅ Completed! {updated} products enriched and saved to {OUTPUT_FILE}")
+print(f"✅ Completed! {len(updates)} products enriched and saved to {target}")
@@ -1,20 +1,24 @@
-import pandas as pd
-import glob
 import os
 import json
 import re
 import signal
+import sys
 from dotenv import load_dotenv
 from mistralai import Mistral
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import read_stage, stage_path, write_stage
+from sku_type_index import load_index
 
 # =========================
 # CONFIG
 # =========================
 load_dotenv()
 
-INPUT_CSV = "output/all_listings_with_images.csv"
-OUTPUT_CSV = "output/all_listings_with_images_and_category.csv"
-TMP_OUTPUT_FILE = "output/.all_listings_with_images_and_category.tmp"
+# Pipeline stages (output/<stage>.parquet, see pipeline_io)
+INPUT_STAGE = "all_listings_with_images"
+OUTPUT_STAGE = "all_listings_with_images_and_category"
 CHECKPOINT_FILE = "checkpoints/category_guess_checkpoint.txt"
 
 XLSM_DIR = "input"
@@ -66,126 +70,96 @@ def handle_sigint(signum, frame):
     stop_requested = True
     print("\n🛑 Ctrl+C detected. Finishing current batch safely...")
 
-signal.signal(signal.SIGINT, handle_sigint)
 
-# =========================
-# LOAD MAIN CSV
-# =========================
-df = pd.read_csv(INPUT_CSV, dtype=str)
-df["amazon_tipo_de_producto"] = df.get("amazon_tipo_de_producto", "")
+def main():
+    signal.signal(signal.SIGINT, handle_sigint)
 
-# =========================
-# BUILD SKU → CATEGORY MAP
-# + COLLECT ALL CATEGORIES
-# =========================
-sku_to_category = {}
-all_categories = set()
+    # =========================
+    # LOAD LISTINGS
+    # =========================
+    df = read_stage(INPUT_STAGE)
+    df["amazon_tipo_de_producto"] = df.get("amazon_tipo_de_producto", "")
 
-xlsm_files = glob.glob(os.path.join(XLSM_DIR, "*.xlsm"))
-print(f"📂 Found {len(xlsm_files)} XLSM files")
+    # =========================
+    # SKU → CATEGORY MAP (cached per XLSM)
+    # + COLLECT ALL CATEGORIES
+    # =========================
+    sku_to_category, all_categories = load_index(XLSM_DIR)
+    print(f"🏷️ Loaded {len(all_categories)} distinct Amazon categories")
 
-for file in xlsm_files:
-    print(f"🔍 Reading {file}")
-    try:
-        sheet = pd.read_excel(
-            file,
-            sheet_name="Plantilla",
-            header=3,
-            dtype=str
-        )
-        sheet = sheet.iloc[3:]
+    # =========================
+    # APPLY DETERMINISTIC MATCH
+    # =========================
+    matched_category = df["seller-sku"].map(sku_to_category)
+    matched = int(matched_category.notna().sum())
+    df["amazon_tipo_de_producto"] = matched_category.where(matched_category.notna(), df["amazon_tipo_de_producto"])
 
-        if not {"SKU", "Tipo de producto"}.issubset(sheet.columns):
-            print(f"⚠️ Missing columns in {file}")
-            continue
+    print(f"🎯 Deterministic matched {matched}/{len(df)}")
 
-        for _, row in sheet.iterrows():
-            sku = row.get("SKU")
-            tipo = row.get("Tipo de producto")
+    # =========================
+    # LLM FALLBACK FOR UNMATCHED
+    # =========================
+    unmatched_indexes = df[
+        df["amazon_tipo_de_producto"].isna() |
+        (df["amazon_tipo_de_producto"] == "")
+    ].index.tolist()
 
-            if pd.notna(tipo):
-                all_categories.add(tipo)
+    print(f"🤖 LLM needed for {len(unmatched_indexes)} rows")
 
-            if pd.notna(sku) and pd.notna(tipo):
-                if sku not in sku_to_category:
-                    sku_to_category[sku] = tipo
+    # Resume support
+    start_pos = 0
+    if os.path.exists(CHECKPOINT_FILE):
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            start_pos = int(f.read().strip())
+        print(f"🔁 Resuming LLM from batch index {start_pos}")
 
-    except Exception as e:
-        print(f"❌ Error reading {file}: {e}")
+    with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
 
-all_categories = sorted(all_categories)
-print(f"🏷️ Loaded {len(all_categories)} distinct Amazon categories")
+        for i in range(start_pos, len(unmatched_indexes), BATCH_SIZE):
+            batch_indexes = unmatched_indexes[i:i + BATCH_SIZE]
 
-# =========================
-# APPLY DETERMINISTIC MATCH
-# =========================
-matched = 0
-for idx, row in df.iterrows():
-    sku = row.get("seller-sku")
-    if sku in sku_to_category:
-        df.at[idx, "amazon_tipo_de_producto"] = sku_to_category[sku]
-        matched += 1
+            items = []
+            for idx in batch_indexes:
+                row = df.loc[idx]
+                items.append({
+                    "seller_sku": row.get("seller-sku", ""),
+                    "title": row.get("item-name", ""),
+                    "brand": row.get("brand-name", ""),
+                    "description": row.get("item-description", ""),
+                    "bullet_points": [
+                        row.get("bullet-point1", ""),
+                        row.get("bullet-point2", ""),
+                        row.get("bullet-point3", "")
+                    ]
+                })
 
-print(f"🎯 Deterministic matched {matched}/{len(df)}")
+            guessed = guess_categories_batch(items, all_categories, mistral)
 
-# =========================
-# LLM FALLBACK FOR UNMATCHED
-# =========================
-unmatched_indexes = df[
-    df["amazon_tipo_de_producto"].isna() |
-    (df["amazon_tipo_de_producto"] == "")
-].index.tolist()
-
-print(f"🤖 LLM needed for {len(unmatched_indexes)} rows")
-
-# Resume support
-start_pos = 0
-if os.path.exists(CHECKPOINT_FILE):
-    with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
-        start_pos = int(f.read().strip())
-    print(f"🔁 Resuming LLM from batch index {start_pos}")
-
-with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
-
-    for i in range(start_pos, len(unmatched_indexes), BATCH_SIZE):
-        batch_indexes = unmatched_indexes[i:i + BATCH_SIZE]
-
-        items = []
-        for idx in batch_indexes:
-            row = df.loc[idx]
-            items.append({
-                "seller_sku": row.get("seller-sku", ""),
-                "title": row.get("item-name", ""),
-                "brand": row.get("brand-name", ""),
-                "description": row.get("item-description", ""),
-                "bullet_points": [
-                    row.get("bullet-point1", ""),
-                    row.get("bullet-point2", ""),
-                    row.get("bullet-point3", "")
-                ]
-            })
-
-        guessed = guess_categories_batch(items, all_categories, mistral)
-
-        for df_idx, category in zip(batch_indexes, guessed):
-            df.at[df_idx, "amazon_tipo_de_producto"] = category
-
-        # Atomic write
-        df.to_csv(TMP_OUTPUT_FILE, index=False)
-        os.replace(TMP_OUTPUT_FILE, OUTPUT_CSV)
-
-        # Save checkpoint
-        with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-            f.write(str(i + BATCH_SIZE))
-
-        print(f"✅ LLM classified rows {i + 1}–{min(i + BATCH_SIZE, len(unmatched_indexes))}")
-
-        if stop_requested:
-            print("💾 Progress safely saved. Exiting.")
-            exit(0)
-
-# Cleanup
-if os.path.exists(CHECKPOINT_FILE):
-    os.remove(CHECKPOINT_FILE)
-
-print(f"🎉 Completed. Final output: {OUTPUT_CSV}")
+            for df_idx, category in zip(batch_indexes, guessed):
+                df.at[df_idx, "amazon_tipo_de_producto"] = category
+
+            # Atomic write
+            write_stage(df, OUTPUT_STAGE)
+
+            # Save checkpoint
+            with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
+                f.write(str(i + BATCH_SIZE))
+
+            print(f"✅ LLM classified rows {i + 1}–{min(i + BATCH_SIZE, len(unmatched_indexes))}")
+
+            if stop_requested:
+                print("💾 Progress safely saved. Exiting.")
+                exit(0)
+
+    # Also written when every row matched deterministically
+    write_stage(df, OUTPUT_STAGE)
+
+    # Cleanup
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+    print(f"🎉 Completed. Final output: {stage_path(OUTPUT_STAGE)}")
+
+
+if __name__ == "__main__":
+    main()
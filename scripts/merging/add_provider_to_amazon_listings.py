@@ -2,18 +2,24 @@ import pandas as pd
 import os
 import json
 import re
+import sys
 from dotenv import load_dotenv
 from mistralai import Mistral
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import read_stage, stage_path, write_stage
 
 # =========================
 # CONFIG
 # =========================
 load_dotenv()
 
-LISTINGS_CSV = "output/all_listings_with_images_and_category_translated.csv"
+# Pipeline stages (output/<stage>.parquet, see pipeline_io); the result is
+# also exported as CSV
+LISTINGS_STAGE = "all_listings_with_images_and_category_translated"
 CATALOG_CSV = "input/catalog_initial.csv"
-OUTPUT_CSV = "output/all_listings_ready.csv"
-TMP_OUTPUT_FILE = "output/.all_listings_ready.tmp"
+OUTPUT_STAGE = "all_listings_ready"
 
 BATCH_SIZE = 15
 LLM_MODEL = "mistral-small-latest"
@@ -51,10 +57,10 @@ Products:
     return clean_json(res.choices[0].message.content)
 
 # =========================
-# LOAD CSV FILES
+# LOAD LISTINGS + CATALOG
 # =========================
-listings_df = pd.read_csv(LISTINGS_CSV, dtype=str)
-catalog_df = pd.read_csv(CATALOG_CSV, dtype=str)
+listings_df = read_stage(LISTINGS_STAGE)
+catalog_df = pd.read_csv(CATALOG_CSV, dtype=str, usecols=["EAN", "PROVEEDOR", "FECHA"])
 
 # Keep only the latest entry per EAN
 catalog_df['FECHA'] = pd.to_datetime(catalog_df['FECHA'], errors='coerce')
@@ -103,8 +109,7 @@ with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
             merged_df.at[df_idx, "PROVEEDOR"] = manufacturer
 
         # Atomic write per batch
-        merged_df.to_csv(TMP_OUTPUT_FILE, index=False)
-        os.replace(TMP_OUTPUT_FILE, OUTPUT_CSV)
+        write_stage(merged_df, OUTPUT_STAGE)
 
         print(f"✅ LLM processed rows {i + 1}–{min(i + BATCH_SIZE, len(unmatched_indexes))}")
 
@@ -117,6 +122,6 @@ merged_df = merged_df.rename(columns={"PROVEEDOR": "manufacturer"})
 merged_df = merged_df.drop_duplicates(subset=['seller-sku', 'manufacturer'])
 
 # Write final output
-merged_df.to_csv(OUTPUT_CSV, index=False)
+write_stage(merged_df, OUTPUT_STAGE, export_csv=True)
 
-print(f"🎉 Completed. Final output: {OUTPUT_CSV}")
+print(f"🎉 Completed. Final output: {stage_path(OUTPUT_STAGE)}")
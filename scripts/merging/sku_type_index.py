@@ -0,0 +1,134 @@
+"""
+sku_type_index.py
+-----------------
+Cached SKU → Amazon product type index built from the XLSM templates.
+
+Every filled Amazon template in input/ (sheet "Plantilla") says which
+"Tipo de producto" each SKU was listed under. Parsing all of them takes
+minutes, but they rarely change between runs, so the result per file is
+kept in cache/sku_type_index.json, keyed by path, mtime and size. A run
+only parses files that are new or changed (in a process pool, reading
+just the SKU and "Tipo de producto" columns) and drops files that are
+gone; with unchanged inputs the index loads in well under a second.
+
+    sku_to_type, all_types = load_index("input")
+
+When a SKU appears more than once, the first row wins, taking files in
+name order. all_types also includes types of rows without a SKU.
+"""
+
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from xlsx_read import read_frame
+
+CACHE_FILE = "cache/sku_type_index.json"
+CACHE_VERSION = 1
+
+WORKERS = os.cpu_count() or 1
+
+SHEET = "Plantilla"
+SKU_COLUMN = "SKU"
+TYPE_COLUMN = "Tipo de producto"
+
+
+def _signature(path: str) -> list[int]:
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def parse_template(path: str) -> dict:
+    """{"skus": {sku: type}, "types": [...]} of one template."""
+    # The 3 rows under the header are Amazon's examples
+    sheet = read_frame(
+        path,
+        sheet=SHEET,
+        header=3,
+        skiprows=3,
+        usecols=[SKU_COLUMN, TYPE_COLUMN],
+        dtype=str,
+    )
+    types = sheet[TYPE_COLUMN].dropna()
+    pairs = sheet.dropna(subset=[SKU_COLUMN, TYPE_COLUMN]).drop_duplicates(SKU_COLUMN)
+    return {
+        "skus": dict(zip(pairs[SKU_COLUMN], pairs[TYPE_COLUMN])),
+        "types": sorted(set(types)),
+    }
+
+
+def _load_cache(cache_file: str) -> dict:
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def _save_cache(cache_file: str, files: dict):
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    tmp = cache_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f, ensure_ascii=False)
+    os.replace(tmp, cache_file)
+
+
+def _parse_stale(paths: list[str], workers: int) -> dict:
+    """{path: parsed} of the templates that could be read."""
+    parsed = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = {pool.submit(parse_template, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                parsed[path] = future.result()
+                print(f"🔍 Parsed {path}")
+            except KeyError:
+                print(f"⚠️ Missing columns in {path}")
+            except Exception as e:
+                print(f"❌ Error reading {path}: {e}")
+    return parsed
+
+
+def load_index(xlsm_dir: str, cache_file: str = CACHE_FILE, workers: int = WORKERS) -> tuple[dict, list]:
+    """
+    (sku → type, sorted list of all types) over xlsm_dir/*.xlsm, parsing
+    only templates whose mtime or size differ from the cached entry.
+    """
+    paths = sorted(glob.glob(os.path.join(xlsm_dir, "*.xlsm")))
+    cached = _load_cache(cache_file)
+
+    files, stale = {}, {}
+    for path in paths:
+        entry = cached.get(path)
+        signature = _signature(path)
+        if entry is not None and entry["signature"] == signature:
+            files[path] = entry
+        else:
+            stale[path] = signature
+
+    print(f"📂 Found {len(paths)} XLSM files ({len(paths) - len(stale)} cached, {len(stale)} to parse)")
+
+    if stale:
+        for path, parsed in _parse_stale(list(stale), workers).items():
+            files[path] = {"signature": stale[path], **parsed}
+    if stale or files.keys() != cached.keys():
+        _save_cache(cache_file, files)
+
+    sku_to_type, all_types = {}, set()
+    for path in paths:
+        entry = files.get(path)
+        if entry is None:
+            continue
+        for sku, tipo in entry["skus"].items():
+            sku_to_type.setdefault(sku, tipo)
+        all_types.update(entry["types"])
+
+    return sku_to_type, sorted(all_types)
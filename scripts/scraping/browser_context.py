@@ -0,0 +1,194 @@
+"""
+browser_context.py
+------------------
+Shared browser-context factory with per-extractor routing rules and a
+disk cache for static JS/CSS.
+
+The scrapers only read DOM attributes and JSON, so most of what a product
+page pulls in (product images, fonts, video, ad and analytics beacons) is
+wasted bandwidth and page-ready time. Each extractor picks a routing
+profile; requests are then either blocked, served from the static cache,
+or passed through.
+
+    router = Router("amazon_dom")
+    context = await router.new_context(browser, locale="es-ES")
+    ...
+    router.print_stats()
+
+Static bundles (script/stylesheet GETs that the server allows caching)
+are stored under STATIC_CACHE_DIR by URL hash and fulfilled from disk on
+later pages and later runs, until STATIC_MAX_AGE passes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+STATIC_CACHE_DIR = "cache/static_assets"
+STATIC_MAX_AGE = 7 * 24 * 3600
+
+# Analytics, ads and client-side metrics; never needed to read a page.
+# Anti-bot scripts (e.g. DataDome) are deliberately not listed: blocking
+# them gets the session flagged.
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "amazon-adsystem.com",
+    "fls-eu.amazon.",
+    "fls-na.amazon.",
+    "unagi.amazon.",
+    "unagi-eu.amazon.",
+    "aax-eu.amazon.",
+    "scorecardresearch.com",
+    "bat.bing.com",
+    "hotjar.com",
+    "criteo.",
+    "taboola.com",
+    "newrelic.com",
+    "nr-data.net",
+    "sentry.io",
+)
+
+PROFILES = {
+    # Amazon product pages read through page.evaluate; image URLs come from
+    # attributes, the downloader fetches the files itself
+    "amazon_dom": {
+        "block_types": {"image", "media", "font"},
+        "block_trackers": True,
+        "cache_static": True,
+    },
+    # Wallapop search: listings come from the search API (fetch/xhr)
+    "wallapop_search": {
+        "block_types": {"image", "media", "font"},
+        "block_trackers": True,
+        "cache_static": True,
+    },
+    # Everything loads; for capturing fixtures or debugging
+    "full": {
+        "block_types": set(),
+        "block_trackers": False,
+        "cache_static": False,
+    },
+}
+
+CACHEABLE_TYPES = {"script", "stylesheet"}
+
+
+def is_tracker(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(marker in host for marker in TRACKER_HOSTS)
+
+
+class StaticCache:
+    def __init__(self, root: str = STATIC_CACHE_DIR, max_age: float = STATIC_MAX_AGE):
+        self.root = Path(root)
+        self.max_age = max_age
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = self.root / digest[:2] / digest
+        return base.with_suffix(".body"), base.with_suffix(".json")
+
+    def get(self, url: str) -> tuple[dict, bytes] | None:
+        body_path, meta_path = self._paths(url)
+        try:
+            if time.time() - meta_path.stat().st_mtime > self.max_age:
+                return None
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            return meta, body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, status: int, headers: dict, body: bytes):
+        body_path, meta_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        # Body first, metadata last: a half-written entry is never served
+        tmp = body_path.with_suffix(".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, body_path)
+        meta_path.write_text(json.dumps({"status": status, "headers": headers}), encoding="utf-8")
+
+
+def _cacheable(headers: dict) -> bool:
+    cache_control = headers.get("cache-control", "").lower()
+    return "no-store" not in cache_control and "private" not in cache_control
+
+
+class Router:
+    def __init__(self, profile: str, cache_dir: str = STATIC_CACHE_DIR):
+        self.profile = profile
+        self.rules = PROFILES[profile]
+        self.cache = StaticCache(cache_dir) if self.rules["cache_static"] else None
+        self.blocked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_from_cache = 0
+
+    async def new_context(self, browser, **context_kwargs):
+        context = await browser.new_context(**context_kwargs)
+        await self.attach(context)
+        return context
+
+    async def attach(self, context):
+        await context.route("**/*", self._handle)
+
+    async def _handle(self, route):
+        request = route.request
+
+        if request.resource_type in self.rules["block_types"] or (
+            self.rules["block_trackers"] and is_tracker(request.url)
+        ):
+            self.blocked += 1
+            await route.abort()
+            return
+
+        if (
+            self.cache is not None
+            and request.method == "GET"
+            and request.resource_type in CACHEABLE_TYPES
+        ):
+            await self._serve_static(route, request.url)
+            return
+
+        await route.continue_()
+
+    async def _serve_static(self, route, url: str):
+        cached = await asyncio.to_thread(self.cache.get, url)
+        if cached is not None:
+            meta, body = cached
+            self.cache_hits += 1
+            self.bytes_from_cache += len(body)
+            await route.fulfill(status=meta["status"], headers=meta["headers"], body=body)
+            return
+
+        self.cache_misses += 1
+        try:
+            response = await route.fetch()
+        except Exception:
+            await route.abort()
+            return
+
+        if response.status == 200 and _cacheable(response.headers):
+            body = await response.body()
+            headers = {
+                k: v for k, v in response.headers.items()
+                if k.lower() in ("content-type", "cache-control", "access-control-allow-origin")
+            }
+            await asyncio.to_thread(self.cache.put, url, response.status, headers, body)
+
+        await route.fulfill(response=response)
+
+    def print_stats(self):
+        print(
+            f"🌐 Routing ({self.profile}): {self.blocked} requests blocked, "
+            f"static cache {self.cache_hits} hits / {self.cache_misses} misses, "
+            f"{self.bytes_from_cache / 1_000_000:.1f} MB served from disk"
+        )
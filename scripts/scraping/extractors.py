@@ -0,0 +1,157 @@
+"""
+extractors.py
+-------------
+Single round-trip Amazon product page extraction.
+
+Everything the scrapers read from a product page (images, price, #ppd
+text, byline, captcha marker) is collected by one in-page JavaScript
+function and returned as a JSON record by a single `page.evaluate`,
+instead of dozens of sequential locator calls per product.
+
+`extract_product_html` builds the same record from raw HTML with
+BeautifulSoup, for the plain-HTTP path (no browser). It sees the page as
+served, before any scripts run.
+
+The helpers below turn that record into the values the scripts store.
+"""
+
+import re
+
+from bs4 import BeautifulSoup
+from playwright.async_api import Page
+
+PRICE_SELECTOR = "span.a-price.aok-align-center.reinventPricePriceToPayMargin.priceToPay"
+LANDING_IMAGE_SELECTOR = 'img[data-a-image-name="landingImage"]'
+THUMBNAIL_SELECTOR = "ul.a-unordered-list li.imageThumbnail, ul.a-unordered-list li.item"
+
+PRODUCT_RECORD_JS = """
+({price, landing, thumbnails}) => {
+    const attr = (el, name) => (el ? el.getAttribute(name) : null);
+    const text = (sel) => {
+        const el = document.querySelector(sel);
+        return el ? el.innerText : null;
+    };
+
+    const landingImg = document.querySelector(landing);
+    const priceEl = document.querySelector(price);
+    const ppd = text("#ppd");
+
+    return {
+        captcha: !!document.querySelector("form[action*='validateCaptcha']"),
+        landing_dynamic: attr(landingImg, "data-a-dynamic-image"),
+        landing_src: attr(landingImg, "src"),
+        thumbnails: [...document.querySelectorAll(thumbnails)].map((li) => {
+            const img = li.querySelector("img");
+            return {
+                class: li.getAttribute("class") || "",
+                hires: attr(img, "data-old-hires"),
+                src: attr(img, "src"),
+            };
+        }),
+        price_whole: priceEl?.querySelector("span.a-price-whole")?.textContent ?? null,
+        price_fraction: priceEl?.querySelector("span.a-price-fraction")?.textContent ?? null,
+        ppd: ppd,
+        // Only needed to classify pages without #ppd (404s, interstitials)
+        body: ppd === null ? (document.body?.innerText ?? "") : null,
+        byline: text("#bylineInfo") ?? text("#brand"),
+    };
+}
+"""
+
+# Small previews and video overlays among the thumbnails
+THUMBNAIL_EXCLUDE = re.compile(
+    r"(_US40_|_SX40_|_SS40_|_SR38,50_|_US100_|dp-play-icon-overlay|_SX38_SY50_CR"
+    r"|play-button-mb-image-grid-small_|mb-play-button-overlay-thumb)"
+)
+
+
+async def extract_product(page: Page) -> dict:
+    return await page.evaluate(
+        PRODUCT_RECORD_JS,
+        {
+            "price": PRICE_SELECTOR,
+            "landing": LANDING_IMAGE_SELECTOR,
+            "thumbnails": THUMBNAIL_SELECTOR,
+        },
+    )
+
+
+def extract_product_html(html: str) -> dict:
+    """Same record as `extract_product`, parsed from the raw page HTML."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    def text(selector):
+        el = soup.select_one(selector)
+        return el.get_text(" ", strip=True) if el else None
+
+    def attr(el, name):
+        return el.get(name) if el else None
+
+    landing = soup.select_one(LANDING_IMAGE_SELECTOR)
+    price_el = soup.select_one(PRICE_SELECTOR)
+    whole = price_el.select_one("span.a-price-whole") if price_el else None
+    fraction = price_el.select_one("span.a-price-fraction") if price_el else None
+    ppd = text("#ppd")
+
+    thumbnails = []
+    for li in soup.select(THUMBNAIL_SELECTOR):
+        img = li.select_one("img")
+        thumbnails.append({
+            "class": " ".join(li.get("class") or []),
+            "hires": attr(img, "data-old-hires"),
+            "src": attr(img, "src"),
+        })
+
+    return {
+        "captcha": soup.select_one("form[action*='validateCaptcha']") is not None,
+        "landing_dynamic": attr(landing, "data-a-dynamic-image"),
+        "landing_src": attr(landing, "src"),
+        "thumbnails": thumbnails,
+        "price_whole": whole.get_text() if whole else None,
+        "price_fraction": fraction.get_text() if fraction else None,
+        "ppd": ppd,
+        "body": (soup.body.get_text(" ", strip=True) if soup.body else "") if ppd is None else None,
+        "byline": text("#bylineInfo") or text("#brand"),
+    }
+
+
+def image_urls(record: dict) -> list[str]:
+    """Main + all available thumbnail images, high-res if possible."""
+    urls = []
+
+    # --- 1. main image ---
+    dynamic = record.get("landing_dynamic")
+    if dynamic:
+        main_urls = re.findall(r'"(https://m\.media-amazon\.com[^"]+)"', dynamic)
+        main_urls = {re.sub(r"\._[^.]+_", ".", u) for u in main_urls}
+        urls.extend(sorted(main_urls))
+    elif record.get("landing_src"):
+        urls.append(record["landing_src"])
+
+    # --- 2. all thumbnails (filter out small previews) ---
+    for thumb in record.get("thumbnails") or []:
+        classes = thumb.get("class") or ""
+        if "a-hidden" in classes or "template" in classes:
+            continue
+
+        src = thumb.get("hires") or thumb.get("src")
+        if src and not THUMBNAIL_EXCLUDE.search(src) and src not in urls:
+            urls.append(src)
+
+    return urls
+
+
+def price(record: dict) -> str | None:
+    """Buy box price formatted as "1234,56", or None if not shown."""
+    whole = record.get("price_whole")
+    if not whole:
+        return None
+
+    whole = whole.replace(".", "").replace(",", "").strip()
+    fraction = (record.get("price_fraction") or "").strip() or "00"
+    return f"{whole},{fraction}"
+
+
+def byline(record: dict) -> str | None:
+    value = record.get("byline")
+    return value.strip() if value else None
@@ -1,19 +1,30 @@
 import pandas as pd
 import asyncio
-import random
 import os
-import re
-import aiohttp
+import shutil
+import sys
 from pathlib import Path
 from playwright.async_api import async_playwright, Page
+from politeness import HostScheduler
+from page_outcome import CircuitBreaker, visit_amazon
+from worker_pool import iter_csv_records, run_pool
+from extractors import LANDING_IMAGE_SELECTOR, extract_product, image_urls
+from image_downloads import ImageDownloader
+from image_store import ImageStore
+from browser_context import Router
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import stage_path, write_stage
 
 # =========================
 # FILES & PATHS
 # =========================
 INPUT_CSV = "output/all_listings.csv"
-OUTPUT_CSV = "output/all_listings_with_images.csv"
+ROWS_CSV = "checkpoints/image_rows.csv"  # rows appended as they finish
+OUTPUT_STAGE = "all_listings_with_images"  # published from ROWS_CSV at the end (pipeline_io)
 CHECKPOINT_CSV = "checkpoints/image_checkpoint.csv"
-IMAGE_DIR = "downloaded_images"
+IMAGE_DIR = "downloaded_images"  # staging area, files move into the store
+IMAGE_STORE_DIR = "image_store"
 
 Path(IMAGE_DIR).mkdir(parents=True, exist_ok=True)
 Path(os.path.dirname(CHECKPOINT_CSV)).mkdir(parents=True, exist_ok=True)
@@ -22,7 +33,11 @@ Path(os.path.dirname(CHECKPOINT_CSV)).mkdir(parents=True, exist_ok=True)
 # SETTINGS
 # =========================
 CONCURRENCY = 3
+IMAGE_CONNECTIONS = 8
+MANIFEST_SAVE_EVERY = 50  # ASINs between manifest saves
 IMAGE_WAIT_TIMEOUT = 15000
+MAX_REQUEUES = 3
+LINK_NEAR_DUPLICATES = False  # link resized/re-encoded copies (image_store.best_copy)
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -37,10 +52,9 @@ LANG_HEADERS = [
 ]
 
 # =========================
-# LOAD INPUT
+# CHECK INPUT
 # =========================
-df = pd.read_csv(INPUT_CSV)
-assert "asin1" in df.columns, "asin1 column missing"
+assert "asin1" in pd.read_csv(INPUT_CSV, nrows=0).columns, "asin1 column missing"
 
 # =========================
 # LOAD CHECKPOINT
@@ -50,66 +64,35 @@ if os.path.exists(CHECKPOINT_CSV):
     processed_asins = set(
         pd.read_csv(CHECKPOINT_CSV)["asin1"].astype(str).tolist()
     )
+    # Runs from before ROWS_CSV appended their rows to the stage CSV itself
+    legacy_rows = stage_path(OUTPUT_STAGE, ".csv")
+    if not os.path.exists(ROWS_CSV) and legacy_rows.exists():
+        shutil.copyfile(legacy_rows, ROWS_CSV)
 
 # =========================
 # IMAGE HELPERS
 # =========================
-async def download_image(session: aiohttp.ClientSession, url: str, path: str):
-    async with session.get(url) as resp:
-        if resp.status == 200:
-            with open(path, "wb") as f:
-                f.write(await resp.read())
-
-async def extract_all_images(page: Page) -> list[str]:
+async def extract_all_images(page: Page, record: dict) -> list[str]:
     """Extract main + all available thumbnail images, high-res if possible."""
-    urls = []
-
-    # --- 1. main image ---
-    try:
-        img = page.locator('img[data-a-image-name="landingImage"]')
-        await img.wait_for(timeout=IMAGE_WAIT_TIMEOUT)
-        dynamic = await img.get_attribute("data-a-dynamic-image")
-        if dynamic:
-            main_urls = re.findall(r'"(https://m\.media-amazon\.com[^"]+)"', dynamic)
-            main_urls = {re.sub(r"\._[^.]+_", ".", u) for u in main_urls}
-            urls.extend(sorted(main_urls))
-        else:
-            src = await img.get_attribute("src")
-            if src:
-                urls.append(src)
-    except:
-        pass
-
-    # --- 2. all thumbnails (filter out small previews) ---
-    try:
-        thumbnail_lis = page.locator('ul.a-unordered-list li.imageThumbnail, ul.a-unordered-list li.item')
-        count = await thumbnail_lis.count()
-        for i in range(count):
-            li = thumbnail_lis.nth(i)
-            classes = (await li.get_attribute("class")) or ""
-            if "a-hidden" in classes or "template" in classes:
-                continue
-
-            thumb_img = li.locator("img")
-            thumb_src = await thumb_img.get_attribute("data-old-hires")  # high-res if exists
-            if not thumb_src:
-                thumb_src = await thumb_img.get_attribute("src")
-
-            # FILTER OUT SMALL THUMBNAILS AND VIDEOS
-            if thumb_src and not re.search(r"(_US40_|_SX40_|_SS40_|_SR38,50_|_US100_|dp-play-icon-overlay|_SX38_SY50_CR|play-button-mb-image-grid-small_|mb-play-button-overlay-thumb)", thumb_src) and thumb_src not in urls:
-                urls.append(thumb_src)
-    except:
-        pass
-
-    return urls
+    # Re-read the page only if the gallery wasn't rendered at navigation time
+    if not (record.get("landing_dynamic") or record.get("landing_src")):
+        try:
+            await page.wait_for_selector(LANDING_IMAGE_SELECTOR, timeout=IMAGE_WAIT_TIMEOUT)
+            record = await extract_product(page)
+        except:
+            pass
+
+    return image_urls(record)
 
 # =========================
 # MAIN
 # =========================
 async def main():
-    async with async_playwright() as p, aiohttp.ClientSession() as session:
+    async with async_playwright() as p, ImageDownloader(IMAGE_DIR, connections=IMAGE_CONNECTIONS) as downloader:
         browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context()
+        # Image URLs are read from attributes; the downloader fetches the files
+        router = Router("amazon_dom")
+        context = await router.new_context(browser)
 
         # PRE-CREATE PAGES (REUSED, NEVER CLOSED)
         pages: list[Page] = []
@@ -121,65 +104,120 @@ async def main():
             })
             pages.append(page)
 
-        semaphore = asyncio.Semaphore(CONCURRENCY)
-
-        async def process_row(idx: int, asin: str):
-            async with semaphore:
-                if asin in processed_asins:
-                    return
-
-                page = pages[idx % CONCURRENCY]
-                print(f"Processing ASIN {asin}")
-
-                row_data = df.loc[idx].to_dict()
-
-                try:
-                    await page.goto(
-                        f"https://www.amazon.es/dp/{asin}",
-                        wait_until="domcontentloaded"
-                    )
-
-                    image_urls = await extract_all_images(page)
-
-                    for i, url in enumerate(image_urls, start=1):
-                        filename = f"{asin}_image{i}.jpg"
-                        filepath = os.path.join(IMAGE_DIR, filename)
-
-                        await download_image(session, url, filepath)
-
-                        row_data[f"image{i}"] = url
-                        row_data[f"image{i}_file"] = filepath
-
-                except Exception as e:
-                    print(f"Error for ASIN {asin}: {e}")
-
-                # WRITE OUTPUT ROW IMMEDIATELY
-                pd.DataFrame([row_data]).to_csv(
-                    OUTPUT_CSV,
-                    mode="a",
-                    header=not os.path.exists(OUTPUT_CSV),
-                    index=False
+        scheduler = HostScheduler(max_concurrency=CONCURRENCY)
+        breaker = CircuitBreaker()
+        store = ImageStore(IMAGE_STORE_DIR, link_near_duplicates=LINK_NEAR_DUPLICATES)
+        recording: set[asyncio.Task] = set()
+        recorded = 0
+
+        ingests: dict[str, asyncio.Task] = {}
+
+        async def ingest(url: str) -> str | None:
+            path = await downloader.result(url)
+            if path is None:
+                return None
+            image_id = await asyncio.to_thread(store.add_file, path, url)
+            if image_id is None:
+                # Not an image (error page, truncated body): fetch again next run
+                print(f"⚠️ {url} did not return a readable image, discarded")
+                os.remove(path)
+            return image_id
+
+        async def record_asin(asin: str, urls: list[str]):
+            """Wait for the ASIN's downloads and file them into the store."""
+            nonlocal recorded
+            image_ids = []
+            for url in urls:
+                image_id = store.id_for_url(url)
+                if image_id is None:
+                    # One ingest per URL, shared by every ASIN using it
+                    if url not in ingests:
+                        ingests[url] = asyncio.create_task(ingest(url))
+                    image_id = await ingests[url]
+                if image_id:
+                    image_ids.append(image_id)
+
+            store.set_asin_images(asin, image_ids)
+            recorded += 1
+            if recorded % MANIFEST_SAVE_EVERY == 0:
+                await asyncio.to_thread(store.save)
+
+        async def process_row(page: Page, row_data: dict) -> bool:
+            asin = str(row_data["asin1"])
+            if asin in processed_asins:
+                return True
+
+            print(f"Processing ASIN {asin}")
+
+            url = f"https://www.amazon.es/dp/{asin}"
+
+            try:
+                outcome, record = await visit_amazon(
+                    page, url, scheduler, breaker, wait_until="domcontentloaded"
                 )
 
-                # WRITE CHECKPOINT
-                pd.DataFrame([{"asin1": asin}]).to_csv(
-                    CHECKPOINT_CSV,
-                    mode="a",
-                    header=not os.path.exists(CHECKPOINT_CSV),
-                    index=False
-                )
-
-                processed_asins.add(asin)
-                await asyncio.sleep(random.uniform(2, 4))
-
-        tasks = [
-            process_row(idx, str(row["asin1"]))
-            for idx, row in df.iterrows()
-            if pd.notna(row["asin1"])
-        ]
-
-        await asyncio.gather(*tasks)
-        print("All images downloaded and urls saved.")
+                # Never commit a blocked page as "no images"
+                if not outcome.is_final:
+                    print(f"ASIN {asin} {outcome.value}, requeued")
+                    return False
+
+                urls = await extract_all_images(page, record)
+
+                # Downloads run in the background; the page moves on.
+                # Images already in the store are never fetched again.
+                for i, url in enumerate(urls, start=1):
+                    if store.id_for_url(url) is None:
+                        downloader.submit(url)
+                    row_data[f"image{i}"] = url
+
+                task = asyncio.create_task(record_asin(asin, urls))
+                recording.add(task)
+                task.add_done_callback(recording.discard)
+
+            except Exception as e:
+                print(f"Error for ASIN {asin}: {e}")
+
+            # WRITE OUTPUT ROW IMMEDIATELY
+            pd.DataFrame([row_data]).to_csv(
+                ROWS_CSV,
+                mode="a",
+                header=not os.path.exists(ROWS_CSV),
+                index=False
+            )
+
+            # WRITE CHECKPOINT
+            pd.DataFrame([{"asin1": asin}]).to_csv(
+                CHECKPOINT_CSV,
+                mode="a",
+                header=not os.path.exists(CHECKPOINT_CSV),
+                index=False
+            )
+
+            processed_asins.add(asin)
+            return True
+
+        rows = (
+            row
+            for row in iter_csv_records(INPUT_CSV, dtype=str)
+            if pd.notna(row["asin1"]) and str(row["asin1"]) not in processed_asins
+        )
+
+        leftover = await run_pool(rows, pages, process_row, max_requeues=MAX_REQUEUES)
+
+        if leftover:
+            print(f"⚠️ {len(leftover)} ASINs not processed, left for the next run")
+        router.print_stats()
+        await browser.close()
+        print("All urls saved, waiting for pending image downloads...")
+
+        await asyncio.gather(*recording)
+        store.save()
+        print(f"Image manifest saved to {store.manifest_path}")
+
+        # The next stages read the typed Parquet file, never the row journal
+        if os.path.exists(ROWS_CSV):
+            write_stage(pd.read_csv(ROWS_CSV, dtype=str), OUTPUT_STAGE)
+            print(f"Listings saved to {stage_path(OUTPUT_STAGE)}")
 
 # =========================
 # RUN
@@ -1,22 +1,30 @@
 import pandas as pd
-import random
 import asyncio
 import os
 from dotenv import load_dotenv
 from mistralai import Mistral
 from playwright.async_api import async_playwright, Page
+from politeness import HostScheduler
+from page_outcome import CircuitBreaker, Outcome, visit_amazon
+from worker_pool import iter_csv_records, run_pool
+from extractors import byline
+from work_queue import open_queue
+from browser_context import Router
 
 load_dotenv()
 
 # Files
 input_catalog = "output/sellerboard_inventory_formatted.csv"
 output_catalog = "output/sellerboard_products_with_providers.csv"
-checkpoint_file = "checkpoints/sellerboard_products_checkpoint.csv"
+checkpoint_file = "checkpoints/sellerboard_products_checkpoint.csv"  # old checkpoint, imported once
 
-# Load CSV
-df = pd.read_csv(input_catalog)
-df = df.drop_duplicates(subset="ASIN", keep="last")  # make sure ASIN matches CSV
-df["PROVEEDOR"] = df["PROVEEDOR"].astype(str)  # <-- ensures strings
+# Shared queue: point several machines at the same file (or Redis) to split
+# the job between them
+WORK_QUEUE_URL = os.getenv("WORK_QUEUE_URL", "sqlite:///checkpoints/work_queue.sqlite")
+WORK_QUEUE_JOB = "provider_names"
+LEASE_SECONDS = 600
+
+MAX_REQUEUES = 3
 
 # User agents / language headers
 USER_AGENTS = [
@@ -59,24 +67,30 @@ Input: "{provider_text}"
 # ──────────────────────────────────────────────────────────────
 # Scraping function: get provider/brand
 # ──────────────────────────────────────────────────────────────
-async def get_provider(page: Page, asin: str, retries: int = 3) -> str | None:
+async def get_provider(
+    page: Page,
+    asin: str,
+    scheduler: HostScheduler,
+    breaker: CircuitBreaker,
+    retries: int = 3,
+) -> tuple[Outcome, str | None]:
+    url = f"https://www.amazon.es/dp/{asin}"
+    outcome = Outcome.NETWORK_ERROR
+
     for attempt in range(retries):
         try:
-            await page.goto(f"https://www.amazon.es/dp/{asin}", timeout=30000)
-            
-            brand_locator = page.locator("#bylineInfo")
-            if await brand_locator.count() > 0:
-                return (await brand_locator.first.inner_text()).strip()
-            
-            brand_alt = page.locator("#brand")
-            if await brand_alt.count() > 0:
-                return (await brand_alt.first.inner_text()).strip()
-            
-            return None
+            outcome, record = await visit_amazon(page, url, scheduler, breaker, timeout=30000)
+            if outcome is Outcome.NETWORK_ERROR:
+                raise RuntimeError("no response")
+            if outcome is Outcome.BLOCKED:
+                return outcome, None
+
+            # #bylineInfo, falling back to #brand
+            return outcome, byline(record)
         except Exception as e:
             print(f"Retry {attempt + 1}/{retries} for ASIN {asin}: {e}")
-            await asyncio.sleep(random.randint(2, 5))
-    return None
+            outcome = Outcome.NETWORK_ERROR
+    return outcome, None
 
 # ──────────────────────────────────────────────────────────────
 # Main async function
@@ -85,7 +99,8 @@ async def main():
     async with Mistral(api_key=os.getenv("MISTRAL_API_KEY", "")) as mistral:
         async with async_playwright() as playwright:
             browser = await playwright.chromium.launch(headless=False)
-            context = await browser.new_context()
+            router = Router("amazon_dom")
+            context = await router.new_context(browser)
 
             pages = []
             for i in range(3):
@@ -96,68 +111,89 @@ async def main():
                 })
                 pages.append(page)
 
-            semaphore = asyncio.Semaphore(3)
-            write_lock = asyncio.Lock()
+            scheduler = HostScheduler(max_concurrency=3)
+            breaker = CircuitBreaker()
+
+            queue = open_queue(WORK_QUEUE_URL, WORK_QUEUE_JOB, lease_seconds=LEASE_SECONDS)
+            if not queue.counts() and os.path.exists(checkpoint_file):
+                import_checkpoint(queue)
+
+            # Every machine enqueues the catalog; keys already queued are ignored.
+            # One row per ASIN (latest wins).
+            added = queue.add(
+                (row["ASIN"], row)
+                for row in iter_csv_records(input_catalog, dedupe_key="ASIN", dtype=str)
+            )
+            print(f"Queued {added} new ASINs, queue status: {queue.counts()}")
+
+            index = 0
+
+            async def process_asin(page: Page, claim: tuple[str, dict]) -> bool:
+                nonlocal index
+                asin, row = claim
+
+                index += 1
+                print(f"Processing ASIN #{index}: {asin}")
+
+                outcome, raw_provider = await get_provider(page, asin, scheduler, breaker)
+
+                # A blocked page is not "no provider": retry it later
+                if not outcome.is_final:
+                    print(f"ASIN {asin} {outcome.value}, requeued")
+                    return False
+
+                if raw_provider:
+                    provider = clean_provider_with_llm(raw_provider, mistral)
+                else:
+                    provider = ""
 
-            processed_asins = set()
-            if os.path.exists(checkpoint_file):
-                processed_asins = set(
-                    pd.read_csv(checkpoint_file)["ASIN"].tolist()
+                print(f"ASIN {asin} provider cleaned: {provider}")
+
+                row["PROVEEDOR"] = provider
+                queue.complete(asin, row)
+                return True
+
+            async with queue.keep_alive():
+                leftover = await run_pool(
+                    queue.iter_claims(), pages, process_asin, max_requeues=MAX_REQUEUES
                 )
 
-            asins = df["ASIN"].tolist()
-
-            async def process_asin(page: Page, asin: str, index: int):
-                async with semaphore:
-                    if asin in processed_asins:
-                        return
-
-                    print(f"Processing ASIN #{index}: {asin}")
-                    await asyncio.sleep(random.randint(3, 7))
-
-                    raw_provider = await get_provider(page, asin)
-                    if raw_provider:
-                        provider = clean_provider_with_llm(raw_provider, mistral)
-                    else:
-                        provider = ""
-
-                    print(f"ASIN {asin} provider cleaned: {provider}")
-
-                    # Save checkpoint
-                    async with write_lock:
-                        pd.DataFrame([{"ASIN": asin}]).to_csv(
-                            checkpoint_file,
-                            mode="a",
-                            header=not os.path.exists(checkpoint_file),
-                            index=False
-                        )
-                    processed_asins.add(asin)
-
-                    # Save full row with cleaned provider
-                    row_df = df.loc[df["ASIN"] == asin].copy()
-                    row_df.at[row_df.index[0], "PROVEEDOR"] = provider
-
-                    async with write_lock:
-                        if os.path.exists(output_catalog):
-                            out_df = pd.read_csv(output_catalog)
-                            if asin in out_df["ASIN"].values:
-                                # safer update
-                                out_df.loc[out_df["ASIN"] == asin, row_df.columns] = row_df.iloc[0]
-                            else:
-                                out_df = pd.concat([out_df, row_df], ignore_index=True)
-                        else:
-                            out_df = row_df
-
-                        out_df.to_csv(output_catalog, index=False)
-
-            tasks = []
-            for i, asin in enumerate(asins):
-                page = pages[i % 3]
-                tasks.append(process_asin(page, asin, i))
-
-            await asyncio.gather(*tasks)
+            # Hand unfinished ASINs back so another worker can take them now
+            for asin, _ in leftover:
+                queue.release(asin)
+            if leftover:
+                print(f"⚠️ {len(leftover)} ASINs not processed, returned to the queue")
+
+            router.print_stats()
             await browser.close()
 
+    export_results(queue)
+
+
+def import_checkpoint(queue):
+    """Mark ASINs finished under the old CSV checkpoint as done in the queue."""
+    done = set(pd.read_csv(checkpoint_file, dtype=str)["ASIN"])
+    rows = {}
+    if os.path.exists(output_catalog):
+        for row in iter_csv_records(output_catalog, dtype=str):
+            if row["ASIN"] in done:
+                rows[row["ASIN"]] = row
+
+    queue.add(rows.items())
+    for asin, row in rows.items():
+        queue.complete(asin, row)
+    print(f"Imported {len(rows)} finished ASINs from {checkpoint_file}")
+
+
+def export_results(queue):
+    """Write every finished row in the shared queue, from all workers."""
+    temp_file = output_catalog + ".tmp"
+    rows = [row for _, row in queue.results()]
+    if rows:
+        pd.DataFrame(rows).to_csv(temp_file, index=False)
+        os.replace(temp_file, output_catalog)
+    print(f"✅ {len(rows)} rows written to {output_catalog}")
+
 
 # Run
 asyncio.run(main())
@@ -0,0 +1,188 @@
+"""
+image_downloads.py
+------------------
+Async image download stage, decoupled from page navigation.
+
+Page workers call `downloader.submit(url)` and immediately get back the
+local path the image will be stored at; the bytes are fetched by a
+separate pool of download workers with their own connection limit.
+
+    async with ImageDownloader("downloaded_images") as downloader:
+        path = downloader.submit(url)   # never waits on the network
+        ...
+        path = await downloader.result(url)  # None if the download failed
+
+- Files are named by the SHA-1 of the URL, so an image shared by several
+  ASINs is downloaded once.
+- Bodies are streamed in chunks and written through a thread pool, never
+  buffered whole or written on the event loop.
+- Files already on disk with the server's Content-Length are skipped.
+  When the HEAD request fails, a plain GET decides instead, and if that
+  fails too the file on disk is kept.
+- Interrupted downloads are kept as `.part` and resumed with a Range
+  request on the next attempt.
+
+Leaving the `async with` block waits for the queue to drain.
+"""
+
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+def url_filename(url: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower() or ".jpg"
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ext
+
+
+class ImageDownloader:
+    def __init__(
+        self,
+        image_dir: str,
+        connections: int = 8,
+        workers: int = 8,
+        io_threads: int = 4,
+        retries: int = 3,
+        chunk_size: int = 256 * 1024,
+        timeout: float = 60.0,
+    ):
+        self.image_dir = Path(image_dir)
+        self.connections = connections
+        self.workers = workers
+        self.io_threads = io_threads
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._seen: dict[str, tuple[str, asyncio.Future]] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def __aenter__(self):
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.io_threads)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self._queue.join()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._session.close()
+            self._executor.shutdown(wait=True)
+
+        print(
+            f"🖼️ Images: {self.downloaded} downloaded, "
+            f"{self.skipped} already on disk, {self.failed} failed"
+        )
+
+    def submit(self, url: str) -> str:
+        """Queue `url` for download and return its local path."""
+        entry = self._seen.get(url)
+        if entry is None:
+            path = str(self.image_dir / url_filename(url))
+            entry = (path, asyncio.get_running_loop().create_future())
+            self._seen[url] = entry
+            self._queue.put_nowait((url, path))
+        return entry[0]
+
+    async def result(self, url: str) -> str | None:
+        """Wait for a submitted URL; returns its path, or None on failure."""
+        self.submit(url)
+        return await asyncio.shield(self._seen[url][1])
+
+    # =========================
+    # WORKERS
+    # =========================
+    async def _worker(self):
+        while True:
+            url, path = await self._queue.get()
+            result = None
+            try:
+                for attempt in range(1, self.retries + 1):
+                    try:
+                        await self._fetch(url, path)
+                        result = path
+                        break
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                        if attempt == self.retries and os.path.exists(path):
+                            # A complete copy from an earlier run beats none
+                            result = path
+                            self.skipped += 1
+                            print(f"⚠️ Could not re-check {url} ({e}), keeping the file on disk")
+                        elif attempt == self.retries:
+                            self.failed += 1
+                            print(f"❌ Image download failed {url}: {e}")
+                        else:
+                            await asyncio.sleep(2 ** attempt)
+            finally:
+                future = self._seen[url][1]
+                if not future.done():
+                    future.set_result(result)
+                self._queue.task_done()
+
+    async def _run_io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _fetch(self, url: str, path: str):
+        if os.path.exists(path):
+            try:
+                async with self._session.head(url, allow_redirects=True) as resp:
+                    resp.raise_for_status()
+                    expected = resp.content_length
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass  # size unknown: the GET below re-checks the file
+            else:
+                if expected is None or expected == os.path.getsize(path):
+                    self.skipped += 1
+                    return
+
+        part = path + ".part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with self._session.get(url, headers=headers) as resp:
+            if resp.status == 416:
+                # .part already holds the whole body
+                await self._run_io(os.replace, part, path)
+                self.downloaded += 1
+                return
+            resp.raise_for_status()
+
+            # Server ignored the Range header: start over
+            if resp.status != 206:
+                offset = 0
+
+            expected = resp.content_length
+            f = await self._run_io(open, part, "ab" if offset else "wb")
+            try:
+                written = 0
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    await self._run_io(f.write, chunk)
+                    written += len(chunk)
+            finally:
+                await self._run_io(f.close)
+
+        if expected is not None and written != expected:
+            raise aiohttp.ClientPayloadError(
+                f"short read: {written} of {expected} bytes"
+            )
+
+        await self._run_io(os.replace, part, path)
+        self.downloaded += 1
@@ -0,0 +1,386 @@
+"""
+image_store.py
+--------------
+Content-addressed image store with a perceptual-hash index.
+
+Images are stored once, keyed by the SHA-256 of their bytes: only exact
+duplicates resolve to an image already in the store, so a URL or ASIN
+always points at the bytes that were downloaded for it.
+
+Near-duplicates (re-encoded or resized copies of the same supplier photo)
+are only linked, and only with link_near_duplicates=True. A 64-bit
+difference hash (dHash) finds candidates; a small color thumbnail has to
+match too, because the grayscale hash can't tell apart color variants
+shot on white. Both copies stay in the store, and the link points from
+the lower- to the higher-resolution one:
+
+    store.best_copy(image_id)   # the highest-resolution linked copy
+
+Per-ASIN images are references into the store. The SQLite manifest maps
+
+    ASIN → ordered image IDs
+    image ID → path, phash, size, dimensions
+    source URL → image ID
+    (image ID, profile) → marketplace variant (see image_variants.py)
+
+so exporters can look up an ASIN's images instead of carrying
+image1..image12 columns through every CSV, and existence checks are index
+lookups instead of filesystem stats.
+
+Layout (objects are sharded by hash prefix so no directory grows past a
+few thousand entries):
+    image_store/
+        objects/ab/cd/abcd....jpg
+        variants/<profile>/ab/abcd....jpg
+        manifest.sqlite
+
+Use migrate_image_dir.py to move an existing flat directory in.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+MANIFEST_NAME = "manifest.sqlite"
+PHASH_BANDS = 8  # 8 bands × 8 bits: any two hashes within 7 bits share a band
+COLOR_SIDE = 4  # color thumbnail: 4×4 RGB
+COLOR_TOLERANCE = 16  # max mean per-channel difference of linked copies
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id    TEXT PRIMARY KEY,
+    path  TEXT NOT NULL,
+    phash  TEXT,
+    color  TEXT,
+    size   INTEGER,
+    width  INTEGER,
+    height INTEGER
+);
+CREATE TABLE IF NOT EXISTS image_urls (
+    url      TEXT PRIMARY KEY,
+    image_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS image_urls_by_image ON image_urls (image_id);
+CREATE TABLE IF NOT EXISTS asin_images (
+    asin     TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    image_id TEXT NOT NULL,
+    PRIMARY KEY (asin, position)
+);
+CREATE INDEX IF NOT EXISTS asin_images_by_image ON asin_images (image_id);
+CREATE TABLE IF NOT EXISTS phash_bands (
+    band     INTEGER NOT NULL,
+    value    INTEGER NOT NULL,
+    image_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phash_bands_lookup ON phash_bands (band, value);
+CREATE TABLE IF NOT EXISTS near_duplicates (
+    image_id TEXT PRIMARY KEY,
+    best_id  TEXT NOT NULL,
+    distance INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS near_duplicates_by_best ON near_duplicates (best_id);
+CREATE TABLE IF NOT EXISTS variants (
+    image_id TEXT NOT NULL,
+    profile  TEXT NOT NULL,
+    status   TEXT NOT NULL,
+    path     TEXT,
+    width    INTEGER,
+    height   INTEGER,
+    size     INTEGER,
+    PRIMARY KEY (image_id, profile)
+);
+"""
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dhash(im: Image.Image) -> int:
+    """64-bit difference hash of an image."""
+    pixels = list(im.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def color_thumbnail(im: Image.Image) -> str:
+    """COLOR_SIDE × COLOR_SIDE RGB thumbnail as hex."""
+    return im.convert("RGB").resize((COLOR_SIDE, COLOR_SIDE), Image.BOX).tobytes().hex()
+
+
+def color_distance(a: str, b: str) -> float:
+    a, b = bytes.fromhex(a), bytes.fromhex(b)
+    return sum(abs(x - y) for x, y in zip(a, b)) / len(a)
+
+
+def image_info(path: str) -> dict | None:
+    """phash, color and dimensions of an image; None if it is not readable."""
+    try:
+        with Image.open(path) as im:
+            return {
+                "phash": dhash(im),
+                "color": color_thumbnail(im),
+                "width": im.width,
+                "height": im.height,
+            }
+    except Exception:
+        return None
+
+
+def _bands(phash: int) -> list[tuple[int, int]]:
+    return [(i, (phash >> (8 * i)) & 0xFF) for i in range(PHASH_BANDS)]
+
+
+def shard_path(digest: str, ext: str) -> str:
+    return os.path.join("objects", digest[:2], digest[2:4], digest + ext)
+
+
+class ImageStore:
+    def __init__(self, root: str = "image_store", link_near_duplicates: bool = False, max_distance: int = 4):
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.link_near_duplicates = link_near_duplicates
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.manifest_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def exists(root: str) -> bool:
+        return os.path.exists(os.path.join(root, MANIFEST_NAME))
+
+    def _query(self, sql: str, params=()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _near_duplicate(self, image_id: str, phash: int, color: str) -> tuple[str, int] | None:
+        """(closest stored image, distance) within max_distance bits and the color tolerance."""
+        where = " OR ".join("(b.band = ? AND b.value = ?)" for _ in range(PHASH_BANDS))
+        params = [v for band in _bands(phash) for v in band]
+        rows = self._db.execute(
+            f"SELECT DISTINCT i.id, i.phash, i.color FROM phash_bands b "
+            f"JOIN images i ON i.id = b.image_id WHERE ({where}) AND i.id != ?",
+            params + [image_id],
+        ).fetchall()
+
+        best, best_distance = None, self.max_distance + 1
+        for other_id, other, other_color in rows:
+            distance = bin(phash ^ int(other, 16)).count("1")
+            if distance >= best_distance or other_color is None:
+                continue
+            if color_distance(color, other_color) > COLOR_TOLERANCE:
+                continue
+            best, best_distance = other_id, distance
+        return (best, best_distance) if best is not None else None
+
+    def _pixels(self, image_id: str) -> int:
+        row = self._db.execute("SELECT width, height FROM images WHERE id = ?", (image_id,)).fetchone()
+        return (row[0] or 0) * (row[1] or 0) if row else 0
+
+    def _link(self, image_id: str, phash: int, color: str):
+        """Link a new image and its closest near-duplicate group to the higher-resolution copy."""
+        match = self._near_duplicate(image_id, phash, color)
+        if match is None:
+            return
+        other_id, distance = match
+        group_best = self._best_copy(other_id)
+
+        if self._pixels(image_id) > self._pixels(group_best):
+            # The new copy is better: the whole group now points at it
+            self._db.execute(
+                "UPDATE near_duplicates SET best_id = ? WHERE best_id = ?", (image_id, group_best)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO near_duplicates (image_id, best_id, distance) VALUES (?, ?, ?)",
+                (group_best, image_id, distance),
+            )
+        else:
+            self._db.execute(
+                "INSERT OR REPLACE INTO near_duplicates (image_id, best_id, distance) VALUES (?, ?, ?)",
+                (image_id, group_best, distance),
+            )
+
+    def _best_copy(self, image_id: str) -> str:
+        row = self._db.execute(
+            "SELECT best_id FROM near_duplicates WHERE image_id = ?", (image_id,)
+        ).fetchone()
+        return row[0] if row else image_id
+
+    # =========================
+    # LOOKUPS
+    # =========================
+    def id_for_url(self, url: str) -> str | None:
+        rows = self._query("SELECT image_id FROM image_urls WHERE url = ?", (url,))
+        return rows[0][0] if rows else None
+
+    def has_image(self, image_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM images WHERE id = ?", (image_id,)))
+
+    def has_asin(self, asin: str) -> bool:
+        return bool(self._query("SELECT 1 FROM asin_images WHERE asin = ? LIMIT 1", (asin,)))
+
+    def best_copy(self, image_id: str) -> str:
+        """The highest-resolution near-duplicate linked to the image (itself if none)."""
+        with self._lock:
+            return self._best_copy(image_id)
+
+    def path(self, image_id: str) -> str:
+        rows = self._query("SELECT path FROM images WHERE id = ?", (image_id,))
+        return str(self.root / rows[0][0])
+
+    def asin_images(self, asin: str) -> list[str]:
+        # Stores from before add_file rejected unreadable files can hold
+        # some (phash NULL); they are never handed out
+        rows = self._query(
+            "SELECT a.image_id FROM asin_images a JOIN images i ON i.id = a.image_id "
+            "WHERE a.asin = ? AND i.phash IS NOT NULL ORDER BY a.position",
+            (asin,),
+        )
+        return [r[0] for r in rows]
+
+    def asin_urls(self, asin: str) -> list[str]:
+        """First known source URL of each of the ASIN's images, in order."""
+        rows = self._query(
+            "SELECT a.image_id, MIN(u.rowid), u.url FROM asin_images a "
+            "JOIN image_urls u ON u.image_id = a.image_id "
+            "JOIN images i ON i.id = a.image_id "
+            "WHERE a.asin = ? AND i.phash IS NOT NULL GROUP BY a.position ORDER BY a.position",
+            (asin,),
+        )
+        return [r[2] for r in rows]
+
+    def variant_path(self, image_id: str, profile: str) -> str | None:
+        """Path of the image's variant for `profile`, None if missing or rejected."""
+        rows = self._query(
+            "SELECT path FROM variants WHERE image_id = ? AND profile = ? AND status = 'ok'",
+            (image_id, profile),
+        )
+        return str(self.root / rows[0][0]) if rows else None
+
+    def images_without_variant(self, profile: str) -> list[tuple[str, str]]:
+        """(image ID, object path) of every image not yet processed for `profile`."""
+        rows = self._query(
+            "SELECT i.id, i.path FROM images i WHERE NOT EXISTS ("
+            "SELECT 1 FROM variants v WHERE v.image_id = i.id AND v.profile = ?)",
+            (profile,),
+        )
+        return [(image_id, str(self.root / path)) for image_id, path in rows]
+
+    # =========================
+    # WRITES
+    # =========================
+    def add_file(self, path: str, url: str | None = None, move: bool = True) -> str | None:
+        """
+        Ingest an image file and return its image ID (the SHA-256 of its
+        bytes). Exact duplicates resolve to the stored image; the input
+        file is removed (or left alone with move=False).
+
+        Files that are not readable images (an HTML error page or a
+        truncated body saved as .jpg) are not stored: None is returned and
+        the file is left where it is for the caller to keep or delete.
+        """
+        digest = sha256_file(path)
+        info = None if self.has_image(digest) else image_info(path)
+
+        with self._lock:
+            image_id = digest
+            known = self._db.execute("SELECT 1 FROM images WHERE id = ?", (digest,)).fetchone()
+
+            if not known:
+                if info is None:
+                    return None
+                phash = info["phash"]
+                rel = shard_path(digest, os.path.splitext(path)[1].lower() or ".jpg")
+                target = self.root / rel
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if move:
+                    shutil.move(path, target)
+                else:
+                    shutil.copyfile(path, target)
+
+                self._db.execute(
+                    "INSERT INTO images (id, path, phash, color, size, width, height) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        image_id,
+                        rel,
+                        f"{phash:016x}",
+                        info["color"],
+                        os.path.getsize(target),
+                        info["width"],
+                        info["height"],
+                    ),
+                )
+                self._db.executemany(
+                    "INSERT INTO phash_bands (band, value, image_id) VALUES (?, ?, ?)",
+                    [(band, value, image_id) for band, value in _bands(phash)],
+                )
+                if self.link_near_duplicates:
+                    self._link(image_id, phash, info["color"])
+            elif move:
+                os.remove(path)
+
+            if url:
+                # The URL maps to what it served last, never to other content
+                self._db.execute(
+                    "INSERT OR REPLACE INTO image_urls (url, image_id) VALUES (?, ?)",
+                    (url, image_id),
+                )
+
+        return image_id
+
+    def set_asin_images(self, asin: str, image_ids: list[str]):
+        # Keep order, drop repeats (exact copies of one photo share an ID)
+        image_ids = list(dict.fromkeys(image_ids))
+        with self._lock:
+            self._db.execute("DELETE FROM asin_images WHERE asin = ?", (asin,))
+            self._db.executemany(
+                "INSERT INTO asin_images (asin, position, image_id) VALUES (?, ?, ?)",
+                [(asin, pos, image_id) for pos, image_id in enumerate(image_ids)],
+            )
+
+    def set_variant(
+        self,
+        image_id: str,
+        profile: str,
+        status: str,
+        path: str | None = None,
+        width: int | None = None,
+        height: int | None = None,
+        size: int | None = None,
+    ):
+        """Record a variant; `path` is relative to the store root."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO variants "
+                "(image_id, profile, status, path, width, height, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (image_id, profile, status, path, width, height, size),
+            )
+
+    def save(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        self.save()
+        self._db.close()
@@ -0,0 +1,189 @@
+"""
+image_variants.py
+-----------------
+Marketplace image normalization stage.
+
+Reads images from the image store and produces one variant per
+marketplace profile: flattened onto white, optionally padded to a white
+square, downscaled to the profile's maximum side and recompressed as JPEG
+until it fits the size limit, downscaling further if the lowest quality
+is not enough. Images below the profile's minimum resolution, or that
+only fit the size limit below it ("too_large"), are rejected instead of
+being pushed to the marketplace.
+
+Variants are cached by (source hash, profile key). The profile key
+includes a fingerprint of the profile settings, so editing a profile
+re-renders everything for it, while a normal run only processes images
+added since the last one. Results (path or rejection) are written back to
+the store manifest:
+
+    store.variant_path(image_id, profile_key("worten"))
+
+Work runs in a process pool sized to the machine's core count; only the
+main process writes to the manifest.
+
+Run:
+    python image_variants.py              # all profiles
+    python image_variants.py worten       # selected profiles
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from image_store import ImageStore
+
+# =========================
+# FILES & PATHS
+# =========================
+IMAGE_STORE_DIR = "image_store"
+
+# =========================
+# SETTINGS
+# =========================
+WORKERS = os.cpu_count() or 1
+CHUNKSIZE = 16
+SAVE_EVERY = 500  # variants between manifest commits
+
+PROFILES = {
+    "amazon": {
+        "min_side": 500,
+        "max_side": 2000,
+        "square": True,
+        "max_bytes": 10 * 1024 * 1024,
+    },
+    "worten": {
+        "min_side": 600,
+        "max_side": 2000,
+        "square": True,
+        "max_bytes": 5 * 1024 * 1024,
+    },
+    "miravia": {
+        "min_side": 500,
+        "max_side": 2000,
+        "square": True,
+        "max_bytes": 3 * 1024 * 1024,
+    },
+}
+
+JPEG_QUALITIES = (92, 85, 78, 70, 60)
+DOWNSCALE_STEP = 0.85  # when the lowest quality is still too large
+
+
+def profile_key(name: str) -> str:
+    settings = json.dumps(PROFILES[name], sort_keys=True).encode("utf-8")
+    return f"{name}-{hashlib.sha1(settings).hexdigest()[:8]}"
+
+
+# =========================
+# WORKER
+# =========================
+def _encode_within(im: Image.Image, max_bytes: int) -> io.BytesIO:
+    """JPEG at the highest quality that fits, or at the lowest one."""
+    for quality in JPEG_QUALITIES:
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+        if buf.tell() <= max_bytes:
+            break
+    return buf
+
+
+def render_variant(task: tuple) -> tuple:
+    """
+    Runs in a worker process. Returns
+    (image_id, status, rel_path, width, height, size); status is "ok",
+    "too_small", "too_large" (over max_bytes even at the lowest quality
+    and min_side) or "unreadable".
+    """
+    image_id, src_path, root, key, profile = task
+
+    try:
+        with Image.open(src_path) as im:
+            im = ImageOps.exif_transpose(im)
+            if min(im.size) < profile["min_side"]:
+                return image_id, "too_small", None, *im.size, None
+
+            # Flatten transparency onto white
+            im = im.convert("RGBA")
+            canvas = Image.new("RGB", im.size, (255, 255, 255))
+            canvas.paste(im, mask=im.getchannel("A"))
+            im = canvas
+    except Exception:
+        return image_id, "unreadable", None, None, None, None
+
+    if max(im.size) > profile["max_side"]:
+        im.thumbnail((profile["max_side"], profile["max_side"]), Image.LANCZOS)
+
+    if profile["square"] and im.width != im.height:
+        side = max(im.size)
+        canvas = Image.new("RGB", (side, side), (255, 255, 255))
+        canvas.paste(im, ((side - im.width) // 2, (side - im.height) // 2))
+        im = canvas
+
+    # Step the quality down until the file fits; then downscale, but not
+    # below the profile's minimum resolution
+    while True:
+        buf = _encode_within(im, profile["max_bytes"])
+        if buf.tell() <= profile["max_bytes"]:
+            break
+        width, height = int(im.width * DOWNSCALE_STEP), int(im.height * DOWNSCALE_STEP)
+        if min(width, height) < profile["min_side"]:
+            return image_id, "too_large", None, im.width, im.height, buf.tell()
+        im = im.resize((width, height), Image.LANCZOS)
+
+    rel = os.path.join("variants", key, image_id[:2], image_id + ".jpg")
+    target = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + ".tmp", "wb") as f:
+        f.write(buf.getvalue())
+    os.replace(target + ".tmp", target)
+
+    return image_id, "ok", rel, im.width, im.height, buf.tell()
+
+
+# =========================
+# MAIN
+# =========================
+def normalize(store: ImageStore, names: list[str]):
+    tasks = []
+    for name in names:
+        key = profile_key(name)
+        pending = store.images_without_variant(key)
+        print(f"🖼️ {name}: {len(pending)} images to process")
+        tasks.extend(
+            (image_id, path, str(store.root), key, PROFILES[name])
+            for image_id, path in pending
+        )
+
+    if not tasks:
+        return
+
+    counts = {}
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        results = pool.map(render_variant, tasks, chunksize=CHUNKSIZE)
+        for done, (task, result) in enumerate(zip(tasks, results), start=1):
+            image_id, status, rel, width, height, size = result
+            store.set_variant(image_id, task[3], status, rel, width, height, size)
+            counts[status] = counts.get(status, 0) + 1
+            if done % SAVE_EVERY == 0:
+                store.save()
+                print(f"📦 {done}/{len(tasks)} variants")
+
+    store.save()
+    print("✅ Variants: " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(PROFILES)
+    unknown = [n for n in names if n not in PROFILES]
+    if unknown:
+        sys.exit(f"Unknown profile(s): {', '.join(unknown)}")
+
+    store = ImageStore(IMAGE_STORE_DIR)
+    normalize(store, names)
+    store.close()
@@ -0,0 +1,123 @@
+"""
+migrate_image_dir.py
+--------------------
+Move existing images into the sharded image store.
+
+Handles the two layouts earlier runs left behind:
+
+1. Flat `downloaded_images/{asin}_image{i}.jpg` files from the original
+   scraper. The ASIN and position come from the file name; the source URL
+   is recovered from the image{i} columns of the listings stage when present.
+2. Flat `downloaded_images/<sha1(url)>.jpg` files left in the download
+   staging area. The URL is recovered by hashing the listings' image URLs.
+
+Files are moved, not copied, and duplicates are deleted as they are
+ingested. Safe to re-run: anything already migrated is gone from the
+source directory. Files that are not readable images stay there and are
+reported at the end.
+"""
+
+import os
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from image_downloads import url_filename
+from image_store import ImageStore
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import read_stage, stage_exists
+
+# =========================
+# FILES & PATHS
+# =========================
+IMAGE_DIR = "downloaded_images"
+IMAGE_STORE_DIR = "image_store"
+LISTINGS_STAGE = "all_listings_with_images"  # output/<stage>.parquet or .csv
+
+MAX_IMAGES = 12
+PROGRESS_EVERY = 1000
+
+LEGACY_NAME = re.compile(r"^(?P<asin>[A-Z0-9]+)_image(?P<pos>\d+)\.\w+$", re.IGNORECASE)
+
+
+# =========================
+# URL RECOVERY
+# =========================
+def load_listing_urls() -> tuple[dict, dict]:
+    """(asin, position) → url and sha1 file name → url, from the listings stage."""
+    by_position, by_filename = {}, {}
+    if not stage_exists(LISTINGS_STAGE):
+        return by_position, by_filename
+
+    # Only the ASIN and image URL columns are read
+    columns = ["asin1"] + [f"image{i}" for i in range(1, MAX_IMAGES + 1)]
+    listings = read_stage(LISTINGS_STAGE, columns=columns)
+
+    for row in listings.to_dict("records"):
+        asin = row.get("asin1")
+        for i in range(1, MAX_IMAGES + 1):
+            url = row.get(f"image{i}")
+            if not isinstance(url, str):
+                continue
+            by_filename[url_filename(url)] = url
+            if isinstance(asin, str):
+                by_position[(asin, i)] = url
+
+    return by_position, by_filename
+
+
+# =========================
+# MIGRATIONS
+# =========================
+def migrate_flat_dir(store: ImageStore, by_position: dict, by_filename: dict):
+    if not os.path.isdir(IMAGE_DIR):
+        return
+
+    asin_images: dict[str, dict[int, str]] = defaultdict(dict)
+    migrated = skipped = 0
+
+    with os.scandir(IMAGE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name.endswith(".part"):
+                continue
+
+            match = LEGACY_NAME.match(entry.name)
+            if match:
+                asin, pos = match["asin"], int(match["pos"])
+                image_id = store.add_file(entry.path, by_position.get((asin, pos)))
+            else:
+                image_id = store.add_file(entry.path, by_filename.get(entry.name))
+
+            if image_id is None:
+                # Not a readable image: left in IMAGE_DIR, never referenced
+                skipped += 1
+                continue
+            if match:
+                asin_images[asin][pos] = image_id
+
+            migrated += 1
+            if migrated % PROGRESS_EVERY == 0:
+                store.save()
+                print(f"📦 {migrated} files migrated")
+
+    for asin, images in asin_images.items():
+        # Keep any images the store already knew for this ASIN
+        if not store.has_asin(asin):
+            store.set_asin_images(asin, [images[pos] for pos in sorted(images)])
+
+    store.save()
+    print(f"✅ {migrated} files from {IMAGE_DIR} migrated, {len(asin_images)} ASINs indexed")
+    if skipped:
+        print(f"⚠️ {skipped} unreadable files left in {IMAGE_DIR}")
+
+
+# =========================
+# RUN
+# =========================
+if __name__ == "__main__":
+    store = ImageStore(IMAGE_STORE_DIR)
+    by_position, by_filename = load_listing_urls()
+    migrate_flat_dir(store, by_position, by_filename)
+    store.close()
@@ -0,0 +1,215 @@
+"""
+page_outcome.py
+---------------
+Shared page classifier and per-host circuit breaker for the scrapers.
+
+A scraped page ends up in exactly one of these outcomes:
+
+    OK             — product page loaded and is sellable
+    MISSING        — soft/hard 404, the product no longer exists
+    OUT_OF_STOCK   — product exists but is unavailable / not shippable
+    BLOCKED        — captcha, robot check or throttling response
+    NETWORK_ERROR  — no response at all, timeout or 5xx
+
+Only OK, MISSING and OUT_OF_STOCK are final. BLOCKED and NETWORK_ERROR
+rows must be requeued and never written to outputs or checkpoints,
+otherwise a temporary block silently marks good ASINs as removed.
+
+The CircuitBreaker watches the last `window` outcomes per host and pauses
+all work against that host for `cooldown` seconds once the blocked ratio
+crosses `threshold`.
+"""
+
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from urllib.parse import urlparse
+
+from extractors import extract_product
+from politeness import THROTTLE_STATUSES, is_captcha
+
+
+class Outcome(str, Enum):
+    OK = "ok"
+    MISSING = "missing"
+    OUT_OF_STOCK = "out_of_stock"
+    BLOCKED = "blocked"
+    NETWORK_ERROR = "network_error"
+
+    @property
+    def is_final(self) -> bool:
+        return self not in (Outcome.BLOCKED, Outcome.NETWORK_ERROR)
+
+
+# =========================
+# AMAZON
+# =========================
+AMAZON_BLOCK_SIGNALS = (
+    "to discuss automated access to amazon data",
+    "api-services-support@amazon.com",
+    "sorry, we just need to make sure you're not a robot",
+)
+
+AMAZON_MISSING_SIGNALS = (
+    "sorry! we couldn't find that page",
+    "looking for something?",
+    "dogs of amazon",
+    "lo sentimos. la dirección web que has especificado no es una página activa de nuestro sitio.",
+    "page not found",
+)
+
+AMAZON_OUT_OF_STOCK_SIGNALS = (
+    "currently unavailable",
+    "no disponible por el momento",
+    "no disponible",
+    "this item cannot be shipped to your selected delivery location",
+    "no puede enviarse este producto al punto de entrega seleccionado",
+)
+
+
+def classify_amazon(status: int | None, text: str | None) -> Outcome:
+    """
+    Classify an Amazon product page from its HTTP status and page text
+    (full HTML or the #ppd block text).
+    """
+    if status is None:
+        return Outcome.NETWORK_ERROR
+    if status in THROTTLE_STATUSES or status == 403:
+        return Outcome.BLOCKED
+
+    t = (text or "").lower()
+    if is_captcha(t) or any(s in t for s in AMAZON_BLOCK_SIGNALS):
+        return Outcome.BLOCKED
+    if status == 404 or any(s in t for s in AMAZON_MISSING_SIGNALS):
+        return Outcome.MISSING
+    if status >= 500:
+        return Outcome.NETWORK_ERROR
+    if any(s in t for s in AMAZON_OUT_OF_STOCK_SIGNALS):
+        return Outcome.OUT_OF_STOCK
+    return Outcome.OK
+
+
+def classify_amazon_record(status: int | None, record: dict | None) -> Outcome:
+    """Classify a page from its extractors.extract_product record."""
+    if status is None or record is None:
+        return Outcome.NETWORK_ERROR
+    if record.get("captcha"):
+        return Outcome.BLOCKED
+
+    if record.get("ppd") is not None:
+        return classify_amazon(status, record["ppd"])
+
+    # Every live product page has #ppd; without it the page is a 404 or
+    # an interstitial, so only the block/network outcomes can override.
+    outcome = classify_amazon(status, record.get("body"))
+    return Outcome.MISSING if outcome is Outcome.OK else outcome
+
+
+# =========================
+# WALLAPOP
+# =========================
+# Wallapop sits behind DataDome; its tag script is on every page, so only
+# the challenge iframe / interstitial text count as a block.
+WALLAPOP_BLOCK_SIGNALS = (
+    "geo.captcha-delivery.com",
+    "ct.captcha-delivery.com",
+    "please enable js and disable any ad blocker",
+)
+
+
+def classify_wallapop(status: int | None, text: str | None) -> Outcome:
+    if status is None:
+        return Outcome.NETWORK_ERROR
+    if status in THROTTLE_STATUSES or status == 403:
+        return Outcome.BLOCKED
+
+    t = (text or "").lower()
+    if any(s in t for s in WALLAPOP_BLOCK_SIGNALS):
+        return Outcome.BLOCKED
+    if status == 404:
+        return Outcome.MISSING
+    if status >= 500:
+        return Outcome.NETWORK_ERROR
+    return Outcome.OK
+
+
+# =========================
+# CIRCUIT BREAKER
+# =========================
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = 20,
+        threshold: float = 0.3,
+        min_samples: int = 5,
+        cooldown: float = 300.0,
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self._recent: dict[str, deque] = {}
+        self._open_until: dict[str, float] = {}
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def record(self, url: str, outcome: Outcome) -> None:
+        host = self._host(url)
+        recent = self._recent.setdefault(host, deque(maxlen=self.window))
+        recent.append(outcome is Outcome.BLOCKED)
+
+        if len(recent) < self.min_samples:
+            return
+
+        ratio = sum(recent) / len(recent)
+        if ratio >= self.threshold and not self.is_open(url):
+            self._open_until[host] = time.monotonic() + self.cooldown
+            # Start the half-open period with a clean slate
+            recent.clear()
+            print(f"⛔ Circuit open for {host}: {ratio:.0%} blocked, pausing {self.cooldown:.0f}s")
+
+    def is_open(self, url: str) -> bool:
+        return self._open_until.get(self._host(url), 0.0) > time.monotonic()
+
+    def remaining(self, url: str) -> float:
+        return max(0.0, self._open_until.get(self._host(url), 0.0) - time.monotonic())
+
+    async def wait(self, url: str) -> None:
+        """Sleep until the host's circuit is closed again."""
+        while (delay := self.remaining(url)) > 0:
+            await asyncio.sleep(delay)
+
+    def wait_sync(self, url: str) -> None:
+        while (delay := self.remaining(url)) > 0:
+            time.sleep(delay)
+
+
+async def visit_amazon(
+    page, url: str, scheduler, breaker: CircuitBreaker, **goto_kwargs
+) -> tuple[Outcome, dict | None]:
+    """
+    Navigate `page` to `url` through the host's politeness budget and
+    circuit breaker. Returns the classified outcome together with the
+    page record, so callers rarely need a second round-trip.
+    """
+    await breaker.wait(url)
+
+    async with scheduler.slot(url):
+        record = None
+        try:
+            response = await page.goto(url, **goto_kwargs)
+            if response is not None:
+                record = await extract_product(page)
+        except Exception as e:
+            print(f"Network error for {url}: {e}")
+            response = None
+
+        status = response.status if response else None
+        outcome = classify_amazon_record(status, record)
+        scheduler.record(url, status, blocked=outcome is Outcome.BLOCKED)
+
+    breaker.record(url, outcome)
+    return outcome, record
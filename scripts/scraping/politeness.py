@@ -0,0 +1,154 @@
+"""
+politeness.py
+-------------
+Per-host request scheduler shared by the Amazon scrapers.
+
+Instead of sleeping a fixed random interval around every page load, each
+host gets a request budget (minimum spacing between request starts and a
+concurrency window) that is tuned with an AIMD controller:
+
+    success    → delay shrinks by DELAY_STEP (additive), and after
+                 RECOVERY_STREAK successes in a row the window grows by 1
+    throttled  → delay doubles and the window halves (multiplicative)
+
+"Throttled" means a 429/503 response or a captcha page. The delay never
+leaves [min_delay, max_delay] and the window never leaves
+[1, max_concurrency], so the scraper stays polite while not idling when
+the site responds fine.
+
+Usage:
+    scheduler = HostScheduler()
+
+    async with scheduler.slot(url):
+        response = await page.goto(url)
+        scheduler.record(url, response.status if response else None,
+                         blocked=await page_is_captcha(page))
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+THROTTLE_STATUSES = {429, 503}
+
+CAPTCHA_MARKERS = (
+    "enter the characters you see below",
+    "introduce los caracteres que ves a continuación",
+    "/errors/validatecaptcha",
+)
+
+
+def is_captcha(text: str | None) -> bool:
+    if not text:
+        return False
+    t = text.lower()
+    return any(marker in t for marker in CAPTCHA_MARKERS)
+
+
+async def page_is_captcha(page) -> bool:
+    """Cheap captcha check for a Playwright page (one round-trip)."""
+    try:
+        return await page.locator("form[action*='validateCaptcha']").count() > 0
+    except Exception:
+        return False
+
+
+@dataclass
+class _HostState:
+    delay: float
+    window: int
+    in_flight: int = 0
+    next_start: float = 0.0
+    streak: int = 0
+    cond: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+class HostScheduler:
+    def __init__(
+        self,
+        min_delay: float = 1.0,
+        max_delay: float = 60.0,
+        initial_delay: float = 3.0,
+        max_concurrency: int = 3,
+        initial_concurrency: int = 1,
+        delay_step: float = 0.25,
+        recovery_streak: int = 10,
+        jitter: float = 0.3,
+    ):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.delay_step = delay_step
+        self.recovery_streak = recovery_streak
+        self.jitter = jitter
+        self._hosts: dict[str, _HostState] = {}
+
+    def _state(self, url: str) -> _HostState:
+        host = urlparse(url).netloc or url
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(
+                delay=self.initial_delay,
+                window=min(self.initial_concurrency, self.max_concurrency),
+            )
+            self._hosts[host] = state
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Wait until the host has a free concurrency slot and its spacing
+        budget allows a new request, then hold the slot for the block.
+        """
+        state = self._state(url)
+
+        async with state.cond:
+            await state.cond.wait_for(lambda: state.in_flight < state.window)
+            state.in_flight += 1
+
+            # Reserve the next start time while holding the lock so that
+            # concurrent waiters are spaced out instead of bursting.
+            now = time.monotonic()
+            start = max(now, state.next_start)
+            spacing = state.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            state.next_start = start + spacing
+
+        try:
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+        finally:
+            async with state.cond:
+                state.in_flight -= 1
+                state.cond.notify_all()
+
+    def record(self, url: str, status: int | None = None, blocked: bool = False) -> None:
+        """Feed the outcome of a request back into the host's AIMD controller."""
+        state = self._state(url)
+
+        if blocked or status in THROTTLE_STATUSES:
+            state.delay = min(self.max_delay, state.delay * 2)
+            state.window = max(1, state.window // 2)
+            state.streak = 0
+            # Push the next start out so queued requests also back off
+            state.next_start = max(state.next_start, time.monotonic() + state.delay)
+            print(f"🐢 Throttled by {urlparse(url).netloc}: delay={state.delay:.1f}s window={state.window}")
+            return
+
+        if status is None:
+            # Network error: no signal about the host's load either way
+            return
+
+        state.delay = max(self.min_delay, state.delay - self.delay_step)
+        state.streak += 1
+        if state.streak >= self.recovery_streak and state.window < self.max_concurrency:
+            state.window += 1
+            state.streak = 0
+
+    def stats(self) -> dict[str, tuple[float, int]]:
+        return {host: (s.delay, s.window) for host, s in self._hosts.items()}
@@ -0,0 +1,210 @@
+"""
+recheck_schedule.py
+-------------------
+Staleness-driven re-check schedule for per-ASIN scrapes.
+
+Instead of a binary checkpoint (processed forever / never), every ASIN
+has a row with when it was last checked, the outcome and the result
+(e.g. the price). Each run asks for its budget of ASINs, ordered by
+
+    priority = staleness × (1 + business value)
+
+where staleness is the age of the last check divided by a TTL that
+depends on the last outcome (an out-of-stock listing may come back soon,
+a missing one rarely does) and shrinks for ASINs whose result keeps
+changing. ASINs never checked always come first.
+
+    schedule = RecheckSchedule("checkpoints/recheck.sqlite", job="price")
+    schedule.register((asin, business_value(row)) for row in rows)
+    for asin in schedule.due(budget=500):
+        ...
+        schedule.record(asin, outcome, result=price)
+
+Business value is read from whichever of the usual report columns the
+input has (sales rank, price, stock); rows without any count as 0.
+"""
+
+import heapq
+import math
+import os
+import sqlite3
+import time
+from typing import Iterable
+
+DAY = 24 * 3600
+
+# Seconds a result stays fresh, by last outcome
+OUTCOME_TTL = {
+    "ok": 7 * DAY,
+    "out_of_stock": 2 * DAY,
+    "missing": 30 * DAY,
+}
+DEFAULT_TTL = 7 * DAY
+
+RANK_COLUMNS = ["Sales Rank", "sales_rank", "salesrank", "BSR"]
+PRICE_COLUMNS = ["price", "Price", "buybox_price", "PVP FINAL"]
+STOCK_COLUMNS = ["quantity", "Quantity", "stock", "Stock"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    job          TEXT NOT NULL,
+    asin         TEXT NOT NULL,
+    value        REAL NOT NULL DEFAULT 0,
+    last_checked REAL,
+    last_outcome TEXT,
+    last_result  TEXT,
+    checks       INTEGER NOT NULL DEFAULT 0,
+    changes      INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job, asin)
+);
+"""
+
+
+def _number(row: dict, columns: list[str]) -> float | None:
+    for col in columns:
+        raw = row.get(col)
+        if raw is None or raw != raw:  # None / NaN
+            continue
+        try:
+            return float(str(raw).replace("€", "").replace(",", ".").strip())
+        except ValueError:
+            continue
+    return None
+
+
+def business_value(row: dict) -> float:
+    """
+    Rough value of keeping an ASIN fresh, >= 0: higher for better sales
+    rank, higher price and stock on hand.
+    """
+    value = 0.0
+
+    rank = _number(row, RANK_COLUMNS)
+    if rank and rank > 0:
+        value += 1 / math.log10(rank + 10)
+
+    price = _number(row, PRICE_COLUMNS)
+    if price and price > 0:
+        value += math.log1p(price) / 5
+
+    stock = _number(row, STOCK_COLUMNS)
+    if stock is not None:
+        value *= 1.5 if stock > 0 else 0.5
+
+    return value
+
+
+class RecheckSchedule:
+    def __init__(self, path: str, job: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.job = job
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def register(self, entries: Iterable[tuple[str, float]], drop_missing: bool = True):
+        """
+        Add ASINs (or refresh their value); check history is kept. With
+        drop_missing, `entries` is the whole input: ASINs of the job that
+        are not in it any more are dropped, so due() doesn't pick them.
+        """
+        rows = [(self.job, asin, value) for asin, value in entries]
+        self._db.executemany(
+            "INSERT INTO schedule (job, asin, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (job, asin) DO UPDATE SET value = excluded.value",
+            rows,
+        )
+        if drop_missing:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS registered (asin TEXT PRIMARY KEY)")
+            self._db.execute("DELETE FROM registered")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO registered (asin) VALUES (?)", ((asin,) for _, asin, _ in rows)
+            )
+            dropped = self._db.execute(
+                "DELETE FROM schedule WHERE job = ? AND asin NOT IN (SELECT asin FROM registered)",
+                (self.job,),
+            ).rowcount
+            if dropped:
+                print(f"🗑️ {dropped} ASINs no longer in the input dropped from the schedule")
+        self._db.commit()
+
+    def import_checked(self, results: dict[str, tuple[str, str | None]], checked_at: float):
+        """
+        Seed from an old binary checkpoint: asin → (outcome, result), all
+        treated as checked at `checked_at`. Rows already checked are kept.
+        """
+        self._db.executemany(
+            "INSERT INTO schedule (job, asin, last_checked, last_outcome, last_result, checks) "
+            "VALUES (?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT (job, asin) DO UPDATE SET "
+            "last_checked = excluded.last_checked, last_outcome = excluded.last_outcome, "
+            "last_result = excluded.last_result, checks = 1 "
+            "WHERE schedule.last_checked IS NULL",
+            (
+                (self.job, asin, checked_at, outcome, result)
+                for asin, (outcome, result) in results.items()
+            ),
+        )
+        self._db.commit()
+
+    def is_empty(self) -> bool:
+        return self._db.execute(
+            "SELECT 1 FROM schedule WHERE job = ? LIMIT 1", (self.job,)
+        ).fetchone() is None
+
+    def due(self, budget: int, min_staleness: float = 1.0, now: float | None = None) -> list[str]:
+        """
+        Up to `budget` ASINs, most urgent first. ASINs checked more recently
+        than `min_staleness` × their TTL are not due.
+        """
+        now = now or time.time()
+        heap: list[tuple[float, str]] = []
+
+        rows = self._db.execute(
+            "SELECT asin, value, last_checked, last_outcome, checks, changes "
+            "FROM schedule WHERE job = ?",
+            (self.job,),
+        )
+        for asin, value, last_checked, last_outcome, checks, changes in rows:
+            if last_checked is None:
+                priority = math.inf
+            else:
+                ttl = OUTCOME_TTL.get(last_outcome, DEFAULT_TTL)
+                # Results that keep changing go stale faster
+                ttl /= 1 + changes / max(checks, 1)
+                staleness = (now - last_checked) / ttl
+                if staleness < min_staleness:
+                    continue
+                priority = staleness * (1 + value)
+
+            if len(heap) < budget:
+                heapq.heappush(heap, (priority, asin))
+            elif priority > heap[0][0]:
+                heapq.heapreplace(heap, (priority, asin))
+
+        return [asin for _, asin in sorted(heap, reverse=True)]
+
+    def record(self, asin: str, outcome: str, result: str | None = None):
+        """Store a final check; counts a change when the result differs."""
+        self._db.execute(
+            "INSERT INTO schedule (job, asin, last_checked, last_outcome, last_result, checks) "
+            "VALUES (?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT (job, asin) DO UPDATE SET "
+            "changes = changes + (last_checked IS NOT NULL AND "
+            "(last_outcome IS NOT excluded.last_outcome OR last_result IS NOT excluded.last_result)), "
+            "checks = checks + 1, last_checked = excluded.last_checked, "
+            "last_outcome = excluded.last_outcome, last_result = excluded.last_result",
+            (self.job, asin, time.time(), outcome, result),
+        )
+        self._db.commit()
+
+    def results(self) -> dict[str, tuple[str, str | None, float]]:
+        """asin → (last outcome, last result, last checked) for checked ASINs."""
+        rows = self._db.execute(
+            "SELECT asin, last_outcome, last_result, last_checked FROM schedule "
+            "WHERE job = ? AND last_checked IS NOT NULL",
+            (self.job,),
+        )
+        return {asin: (outcome, result, checked) for asin, outcome, result, checked in rows}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,367 @@
+"""
+replay_bench.py
+---------------
+Offline fixture-replay harness and benchmark for the scraper extractors.
+
+Recorded pages are served from a local HTTP server with production-like
+latency, then run through both extraction paths:
+
+    playwright — page.goto + the single page.evaluate record (extractors.py)
+    http       — aiohttp GET + BeautifulSoup (extract_product_html)
+
+Each page is reduced to the fields the scrapers store: the outcome
+(search_products), price (scrape_price), byline (get_provider) and image URLs
+(extract_all_images); Wallapop search responses to their parsed listings.
+The report shows pages/sec, fetch and extraction latency per path, and
+field-level diffs against golden outputs.
+
+Fixtures (not committed, record your own):
+    fixtures/scraping/amazon/<name>.html     product page HTML
+    fixtures/scraping/amazon/<name>.status   optional HTTP status (default 200)
+    fixtures/scraping/wallapop/<name>.json   search API response
+    fixtures/scraping/golden/<site>/<name>.json
+
+Run:
+    python replay_bench.py capture amazon B000123456 https://www.amazon.es/dp/B000123456
+    python replay_bench.py --record           # write golden from the playwright path
+    python replay_bench.py --concurrency 8 --latency-ms 300 --repeat 3
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+from playwright.async_api import async_playwright
+
+from extractors import byline, extract_product, extract_product_html, image_urls, price
+from page_outcome import classify_amazon_record
+from browser_context import Router
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "wallapop"))
+from search_api import parse_listing, search_items
+
+# =========================
+# FILES & PATHS
+# =========================
+FIXTURE_DIR = Path("fixtures/scraping")
+GOLDEN_DIR = FIXTURE_DIR / "golden"
+
+# =========================
+# SETTINGS
+# =========================
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY_MS = 400     # median simulated server latency
+LATENCY_SIGMA = 0.5  # lognormal spread, gives a production-like long tail
+CONCURRENCY = 4
+
+SITES = ("amazon", "wallapop")
+
+
+# =========================
+# FIXTURES
+# =========================
+def load_fixtures() -> list[tuple[str, str]]:
+    fixtures = []
+    for site, pattern in (("amazon", "*.html"), ("wallapop", "*.json")):
+        for path in sorted((FIXTURE_DIR / site).glob(pattern)):
+            fixtures.append((site, path.stem))
+    return fixtures
+
+
+def fixture_status(name: str) -> int:
+    status_file = FIXTURE_DIR / "amazon" / f"{name}.status"
+    return int(status_file.read_text().strip()) if status_file.exists() else 200
+
+
+def golden_path(site: str, name: str) -> Path:
+    return GOLDEN_DIR / site / f"{name}.json"
+
+
+# =========================
+# FIELDS
+# =========================
+def amazon_fields(status: int, record: dict) -> dict:
+    return {
+        "outcome": classify_amazon_record(status, record).value,
+        "price": price(record),
+        "byline": byline(record),
+        "images": image_urls(record),
+    }
+
+
+def wallapop_fields(payload: dict) -> dict:
+    listings = [l for l in map(parse_listing, search_items(payload)) if l]
+    return {"count": len(listings), "listings": listings}
+
+
+def diff_fields(got: dict, want: dict) -> list[str]:
+    return sorted(k for k in set(got) | set(want) if got.get(k) != want.get(k))
+
+
+def error_row(site: str, name: str, start: float, e: Exception) -> dict:
+    """A page whose fetch or extraction raised; reported, never golden."""
+    error = f"{type(e).__name__}: {e}"
+    return {
+        "site": site, "name": name, "fields": {"error": error}, "error": error,
+        "fetch": time.perf_counter() - start, "extract": 0.0,
+    }
+
+
+# =========================
+# SERVER
+# =========================
+def _latency() -> float:
+    return random.lognormvariate(0, LATENCY_SIGMA) * LATENCY_MS / 1000
+
+
+async def serve_amazon(request: web.Request) -> web.Response:
+    name = request.match_info["name"]
+    await asyncio.sleep(_latency())
+    html = (FIXTURE_DIR / "amazon" / f"{name}.html").read_text(encoding="utf-8")
+    return web.Response(text=html, status=fixture_status(name), content_type="text/html")
+
+
+async def serve_wallapop(request: web.Request) -> web.Response:
+    name = request.match_info["name"]
+    await asyncio.sleep(_latency())
+    body = (FIXTURE_DIR / "wallapop" / f"{name}.json").read_text(encoding="utf-8")
+    return web.Response(text=body, content_type="application/json")
+
+
+async def start_server() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/amazon/{name}", serve_amazon)
+    app.router.add_get("/wallapop/{name}", serve_wallapop)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    return runner
+
+
+# =========================
+# PATHS
+# =========================
+async def run_http(jobs: list[tuple[str, str]], concurrency: int) -> list[dict]:
+    results = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def one(site, name):
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    async with session.get(f"http://{HOST}:{PORT}/{site}/{name}") as resp:
+                        body = await resp.text()
+                        status = resp.status
+                    fetched = time.perf_counter()
+
+                    if site == "amazon":
+                        fields = amazon_fields(status, extract_product_html(body))
+                    else:
+                        fields = wallapop_fields(json.loads(body))
+                    done = time.perf_counter()
+                except Exception as e:
+                    results.append(error_row(site, name, start, e))
+                    return
+
+                results.append({
+                    "site": site, "name": name, "fields": fields,
+                    "fetch": fetched - start, "extract": done - fetched,
+                })
+
+        await asyncio.gather(*(one(site, name) for site, name in jobs))
+    return results
+
+
+async def run_playwright(jobs: list[tuple[str, str]], concurrency: int) -> list[dict]:
+    results = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        # Same routing as production, so recorded pages don't pull live assets
+        context = await Router("amazon_dom").new_context(browser)
+
+        async def worker(page):
+            while not queue.empty():
+                site, name = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await page.goto(
+                        f"http://{HOST}:{PORT}/{site}/{name}", wait_until="domcontentloaded"
+                    )
+                    if response is None:
+                        raise RuntimeError("no response")
+                    fetched = time.perf_counter()
+
+                    if site == "amazon":
+                        fields = amazon_fields(response.status, await extract_product(page))
+                    else:
+                        fields = wallapop_fields(await response.json())
+                    done = time.perf_counter()
+                except Exception as e:
+                    # One bad page is a result, not the end of the benchmark
+                    results.append(error_row(site, name, start, e))
+                    continue
+
+                results.append({
+                    "site": site, "name": name, "fields": fields,
+                    "fetch": fetched - start, "extract": done - fetched,
+                })
+
+        pages = [await context.new_page() for _ in range(concurrency)]
+        await asyncio.gather(*(worker(page) for page in pages))
+        await browser.close()
+    return results
+
+
+PATHS = {"playwright": run_playwright, "http": run_http}
+
+
+# =========================
+# REPORT
+# =========================
+def _ms(values: list[float], q: float) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    return f"{values[min(len(values) - 1, int(q * len(values)))] * 1000:.1f}ms"
+
+
+def report(path: str, results: list[dict], elapsed: float) -> int:
+    errors = [r for r in results if r.get("error")]
+    ok = [r for r in results if not r.get("error")]
+    fetch = [r["fetch"] for r in ok]
+    extract = [r["extract"] for r in ok]
+    print(f"\n=== {path} ===")
+    print(f"Pages: {len(results)} in {elapsed:.2f}s → {len(results) / elapsed:.1f} pages/sec")
+    print(f"Fetch    p50 {_ms(fetch, 0.5)}  p95 {_ms(fetch, 0.95)}")
+    print(f"Extract  p50 {_ms(extract, 0.5)}  p95 {_ms(extract, 0.95)}"
+          f"  mean {statistics.fmean(extract) * 1000:.2f}ms" if extract else "")
+
+    field_diffs: dict[str, int] = {}
+    mismatched = set()
+    missing_golden = 0
+    for r in errors:
+        mismatched.add(f"{r['site']}/{r['name']}")
+    for r in ok:
+        golden = golden_path(r["site"], r["name"])
+        if not golden.exists():
+            missing_golden += 1
+            continue
+        want = json.loads(golden.read_text(encoding="utf-8"))
+        for field in diff_fields(r["fields"], want):
+            field_diffs[field] = field_diffs.get(field, 0) + 1
+            mismatched.add(f"{r['site']}/{r['name']}")
+
+    if field_diffs:
+        print("❌ Field diffs vs golden: " + ", ".join(f"{f}: {n}" for f, n in sorted(field_diffs.items())))
+        for page in sorted(mismatched)[:10]:
+            print(f"   {page}")
+    else:
+        print("✅ All fields match golden")
+    if missing_golden:
+        print(f"⚠️ {missing_golden} pages have no golden output (run with --record)")
+    if errors:
+        print(f"❌ {len(errors)} pages failed to load or extract")
+        for r in errors[:10]:
+            print(f"   {r['site']}/{r['name']}: {r['error']}")
+
+    return len(mismatched)
+
+
+def record_golden(results: list[dict]):
+    results = [r for r in results if not r.get("error")]
+    for r in results:
+        path = golden_path(r["site"], r["name"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(r["fields"], indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"📝 Golden outputs written for {len(results)} pages to {GOLDEN_DIR}")
+
+
+# =========================
+# CAPTURE
+# =========================
+async def capture(site: str, name: str, url: str):
+    """Record a live page (Amazon HTML or Wallapop search JSON) as a fixture."""
+    target = FIXTURE_DIR / site
+    target.mkdir(parents=True, exist_ok=True)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        context = await Router("full").new_context(browser)
+        page = await context.new_page()
+        response = await page.goto(url, wait_until="domcontentloaded")
+
+        if site == "amazon":
+            (target / f"{name}.html").write_text(await page.content(), encoding="utf-8")
+            if response and response.status != 200:
+                (target / f"{name}.status").write_text(str(response.status))
+        else:
+            payload = await response.json()
+            (target / f"{name}.json").write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+        await browser.close()
+    print(f"Captured {url} → {target / name}")
+
+
+# =========================
+# MAIN
+# =========================
+async def main(args):
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"No fixtures found in {FIXTURE_DIR}; record some with `capture` first.")
+        return 1
+
+    jobs = fixtures * args.repeat
+    runner = await start_server()
+    failures = 0
+    try:
+        for path in args.paths:
+            start = time.perf_counter()
+            results = await PATHS[path](jobs, args.concurrency)
+            elapsed = time.perf_counter() - start
+
+            if args.record and path == "playwright":
+                record_golden(results)
+            failures += report(path, results, elapsed)
+    finally:
+        await runner.cleanup()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command")
+
+    cap = sub.add_parser("capture", help="record a live page as a fixture")
+    cap.add_argument("site", choices=SITES)
+    cap.add_argument("name")
+    cap.add_argument("url")
+
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--repeat", type=int, default=1, help="serve every fixture N times")
+    parser.add_argument("--record", action="store_true", help="write golden outputs from the playwright path")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        asyncio.run(capture(args.site, args.name, args.url))
+    else:
+        LATENCY_MS = args.latency_ms
+        if args.record and "playwright" not in args.paths:
+            args.paths.insert(0, "playwright")
+        sys.exit(asyncio.run(main(args)))
@@ -1,16 +1,24 @@
 import pandas as pd
-import random
 import asyncio
 import os
+import time
 from playwright.async_api import async_playwright, Page
+from politeness import HostScheduler
+from page_outcome import CircuitBreaker, Outcome, visit_amazon
+from worker_pool import iter_csv_records, run_pool
+from recheck_schedule import RecheckSchedule, business_value
+from browser_context import Router
 
 input_catalog = "output/catalog_ready.csv"
 output_catalog = "output/filtered_catalog.csv"
-checkpoint_file = "input/filter_checkpoint.csv"
+checkpoint_file = "input/filter_checkpoint.csv"  # old binary checkpoint, imported once
+schedule_file = "checkpoints/recheck_schedule.sqlite"
+availability_file = "output/availability_matrix.csv"
 
-df = pd.read_csv(input_catalog)
-df["FECHA"] = pd.to_datetime(df["FECHA"])
-df = df.drop_duplicates(subset="ASIN", keep="last")
+MAX_REQUEUES = 3
+WORKERS = 3
+RECHECK_BUDGET = 2000  # page checks per run, most stale / valuable first
+EXPORT_CHUNK = 10_000
 
 
 USER_AGENTS = [
@@ -19,118 +27,228 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
 ]
 
-LANG_HEADERS = [
-    {"Accept-Language": "es-ES,es;q=0.9,en;q=0.8"},
-    {"Accept-Language": "en-US,en;q=0.9"},
-    {"Accept-Language": "es-ES,es;q=0.9,en;q=0.8"},
+# Probed concurrently, each in its own browser context. The first entry is
+# the home market: its outcome is reported when no market has the ASIN.
+MARKETPLACES = [
+    {"code": "ES", "domain": "www.amazon.es", "locale": "es-ES", "accept_language": "es-ES,es;q=0.9,en;q=0.8"},
+    {"code": "US", "domain": "www.amazon.com", "locale": "en-US", "accept_language": "en-US,en;q=0.9"},
+    # {"code": "DE", "domain": "www.amazon.de", "locale": "de-DE", "accept_language": "de-DE,de;q=0.9,en;q=0.8"},
+    # {"code": "FR", "domain": "www.amazon.fr", "locale": "fr-FR", "accept_language": "fr-FR,fr;q=0.9,en;q=0.8"},
+    # {"code": "IT", "domain": "www.amazon.it", "locale": "it-IT", "accept_language": "it-IT,it;q=0.9,en;q=0.8"},
 ]
 
+# Stop probing the other markets once one has the ASIN available. Set to
+# False to always fill the whole availability matrix.
+SHORT_CIRCUIT = True
 
-async def check_page(page: Page, asin: str, retries: int = 3) -> bool:
-    for attempt in range(retries):
-        try:
-            await page.goto(f"https://www.amazon.es/dp/{asin}")
-            ppd_div = page.locator("#ppd")
-
-            if await ppd_div.count() > 0:
-                check = True
-                inner = (await ppd_div.inner_text()).lower()
-
-                if "lo sentimos. la dirección web que has especificado no es una página activa de nuestro sitio." in inner:
-                    check = False
-                elif "no disponible por el momento" in inner:
-                    check = False
-                elif "no disponible" in inner:
-                    check = False
-
-                if not check:
-                    await asyncio.sleep(random.randrange(3, 7))
-                    await page.goto(f"https://www.amazon.com/dp/{asin}")
-                    ppd_div = page.locator("#ppd")
-
-                    if await ppd_div.count() > 0:
-                        inner = (await ppd_div.inner_text()).lower()
-                        if "currently unavailable" in inner:
-                            check = False
-                        elif "this item cannot be shipped to your selected delivery location. please choose a different delivery location" in inner:
-                            check = False
-                        elif "no puede enviarse este producto al punto de entrega seleccionado. selecciona un punto de entrega diferente" in inner:
-                            check = False
 
-                return check
+async def probe_market(
+    page: Page,
+    market: dict,
+    asin: str,
+    scheduler: HostScheduler,
+    breaker: CircuitBreaker,
+    retries: int = 3,
+) -> Outcome:
+    url = f"https://{market['domain']}/dp/{asin}"
+    outcome = Outcome.NETWORK_ERROR
 
-            return False
-
-        except Exception as e:
-            print(f"Retry {attempt + 1}/{retries} for ASIN {asin} due to error: {e}")
-            await asyncio.sleep(random.randrange(2, 5))
-
-    return False
+    for attempt in range(retries):
+        outcome, _ = await visit_amazon(page, url, scheduler, breaker)
+        if outcome is not Outcome.NETWORK_ERROR:
+            return outcome
+        print(f"Retry {attempt + 1}/{retries} for ASIN {asin} on {market['code']}")
+
+    return outcome
+
+
+def decide(matrix: dict[str, Outcome | None]) -> Outcome | None:
+    """
+    Importable if any market has the ASIN available. None while the
+    answer still depends on markets that have not answered yet.
+    """
+    outcomes = list(matrix.values())
+    if Outcome.OK in outcomes:
+        return Outcome.OK
+    if None in outcomes:
+        return None
+
+    # Nobody has it: a block anywhere means we don't actually know
+    for outcome in outcomes:
+        if not outcome.is_final:
+            return outcome
+    return outcomes[0]
+
+
+async def probe_asin(
+    pages: dict[str, Page],
+    asin: str,
+    scheduler: HostScheduler,
+    breaker: CircuitBreaker,
+) -> tuple[Outcome, dict[str, Outcome | None]]:
+    """Probe every marketplace at once; returns the decision and the matrix."""
+    tasks = {
+        asyncio.create_task(
+            probe_market(pages[m["code"]], m, asin, scheduler, breaker)
+        ): m["code"]
+        for m in MARKETPLACES
+    }
+    matrix: dict[str, Outcome | None] = {m["code"]: None for m in MARKETPLACES}
+    decision = None
+
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                matrix[tasks[task]] = task.result()
+            decision = decide(matrix)
+            if decision is not None and SHORT_CIRCUIT:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return decision, matrix
+
+
+def append_matrix(asin: str, matrix: dict[str, Outcome | None], decision: Outcome):
+    row = {"ASIN": asin}
+    row.update({code: outcome.value if outcome else "" for code, outcome in matrix.items()})
+    row["decision"] = decision.value
+    row["checked_at"] = pd.Timestamp(time.time(), unit="s").isoformat()
+
+    pd.DataFrame([row]).to_csv(
+        availability_file,
+        mode="a",
+        header=not os.path.exists(availability_file),
+        index=False
+    )
 
 
 async def main():
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=False)
-        context = await browser.new_context()
-
-        # 🔹 CREATE 3 PAGES WITH UNIQUE HEADERS
-        pages = []
-        for i in range(3):
-            page = await context.new_page()
-            await page.set_extra_http_headers({
-                **LANG_HEADERS[i],
-                "User-Agent": USER_AGENTS[i]
-            })
-            pages.append(page)
-
-        semaphore = asyncio.Semaphore(3)
-
-        processed_asins = []
-        if os.path.exists(checkpoint_file):
-            processed_asins = pd.read_csv(checkpoint_file)["ASIN"].to_list()
-
-        saved_asins = set()
-        if os.path.exists(output_catalog):
-            saved_asins = set(pd.read_csv(output_catalog)["ASIN"].to_list())
-
-        asins = df["ASIN"].tolist()
-
-        async def process_asin(page: Page, asin: str, index: int):
-            async with semaphore:
-                if asin in processed_asins:
-                    return
-
-                print(f"Processing ASIN #{index}: {asin}")
-                await asyncio.sleep(random.randrange(3, 7))
-
-                passed = await check_page(page, asin)
-                print(f"ASIN {'passed' if passed else 'did not pass'}")
-
-                pd.DataFrame([{"ASIN": asin}]).to_csv(
-                    checkpoint_file,
-                    mode="a",
-                    header=not os.path.exists(checkpoint_file),
-                    index=False
-                )
-                processed_asins.append(asin)
-
-                if passed and asin not in saved_asins:
-                    row_df = df.loc[df["ASIN"] == asin]
-                    row_df.to_csv(
-                        output_catalog,
-                        mode="a",
-                        header=not os.path.exists(output_catalog),
-                        index=False
-                    )
-                    saved_asins.add(asin)
-
-        tasks = []
-        for i, asin in enumerate(asins):
-            page = pages[i % 3]
-            tasks.append(process_asin(page, asin, i))
-
-        await asyncio.gather(*tasks)
-        await browser.close()
 
+        # One context per marketplace; each worker gets one page in each
+        router = Router("amazon_dom")
+        contexts = {
+            m["code"]: await router.new_context(
+                browser,
+                locale=m["locale"],
+                extra_http_headers={"Accept-Language": m["accept_language"]},
+            )
+            for m in MARKETPLACES
+        }
+        workers = []
+        for i in range(WORKERS):
+            pages = {}
+            for code, context in contexts.items():
+                page = await context.new_page()
+                await page.set_extra_http_headers({"User-Agent": USER_AGENTS[i % len(USER_AGENTS)]})
+                pages[code] = page
+            workers.append(pages)
+
+        # Limits are per host, so every marketplace gets its own budget
+        scheduler = HostScheduler(max_concurrency=WORKERS)
+        breaker = CircuitBreaker()
+
+        schedule = RecheckSchedule(schedule_file, job="availability")
+        if schedule.is_empty() and os.path.exists(checkpoint_file):
+            import_checkpoint(schedule)
+
+        # Register every catalog ASIN with its business value, then pick
+        # this run's budget from the schedule
+        schedule.register(
+            (row["ASIN"], business_value(row))
+            for row in iter_csv_records(input_catalog, dedupe_key="ASIN", dtype=str)
+        )
+        due = schedule.due(RECHECK_BUDGET)
+        print(f"{len(due)} ASINs due for a check (budget {RECHECK_BUDGET})")
+
+        index = 0
+
+        async def process_asin(pages: dict[str, Page], asin: str) -> bool:
+            nonlocal index
+            index += 1
+            print(f"Processing ASIN #{index}: {asin}")
+
+            outcome, matrix = await probe_asin(pages, asin, scheduler, breaker)
+
+            # Blocked / unreachable pages say nothing about the ASIN:
+            # leave its schedule entry alone and try again later
+            if not outcome.is_final:
+                print(f"ASIN {asin} {outcome.value}, requeued")
+                return False
+
+            passed = outcome is Outcome.OK
+            markets = ", ".join(f"{code}={o.value if o else '-'}" for code, o in matrix.items())
+            print(f"ASIN {'passed' if passed else 'did not pass'} ({markets})")
+
+            append_matrix(asin, matrix, outcome)
+            schedule.record(asin, outcome.value)
+            return True
+
+        leftover = await run_pool(due, workers, process_asin, max_requeues=MAX_REQUEUES)
+
+        if leftover:
+            print(f"⚠️ {len(leftover)} ASINs not processed, left for the next run")
+
+        router.print_stats()
+        await browser.close()
 
-asyncio.run(main())
+    export_filtered_catalog(schedule)
+    schedule.close()
+
+
+def import_checkpoint(schedule: RecheckSchedule):
+    """Carry the old checkpoint over, so those ASINs are not all re-checked at once."""
+    processed = set(pd.read_csv(checkpoint_file, dtype=str)["ASIN"])
+    passed = set()
+    if os.path.exists(output_catalog):
+        passed = set(pd.read_csv(output_catalog, usecols=["ASIN"], dtype=str)["ASIN"])
+
+    schedule.import_checked(
+        {
+            asin: (Outcome.OK.value if asin in passed else Outcome.MISSING.value, None)
+            for asin in processed
+        },
+        checked_at=os.path.getmtime(checkpoint_file),
+    )
+    print(f"Imported {len(processed)} ASINs from {checkpoint_file}")
+
+
+def export_filtered_catalog(schedule: RecheckSchedule):
+    """Rewrite the filtered catalog from the latest outcome of every ASIN."""
+    outcomes = schedule.results()
+    temp_file = output_catalog + ".tmp"
+    written = 0
+
+    buffer = []
+
+    def flush():
+        nonlocal written
+        pd.DataFrame(buffer).to_csv(temp_file, mode="a" if written else "w", header=not written, index=False)
+        written += len(buffer)
+        buffer.clear()
+
+    for row in iter_csv_records(input_catalog, dedupe_key="ASIN", dtype=str):
+        if outcomes.get(row["ASIN"], (None,))[0] == Outcome.OK.value:
+            buffer.append(row)
+            if len(buffer) >= EXPORT_CHUNK:
+                flush()
+    if buffer:
+        flush()
+
+    # Always replaced: with nothing available, downstream stages must see
+    # an empty catalog, not the previous one
+    if not written:
+        columns = pd.read_csv(input_catalog, nrows=0, dtype=str).columns
+        pd.DataFrame(columns=columns).to_csv(temp_file, index=False)
+    os.replace(temp_file, output_catalog)
+    print(f"✅ {written} available ASINs written to {output_catalog}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,11 @@ import os
 import json
 from pathlib import Path
 from playwright.async_api import async_playwright, Page
+from politeness import HostScheduler
+from page_outcome import CircuitBreaker, Outcome, visit_amazon
+from extractors import PRICE_SELECTOR, extract_product, price as extracted_price
+from recheck_schedule import RecheckSchedule, business_value
+from browser_context import Router
 
 input_file = "output/matched_asin1.csv"
 output_file = "output/asin_prices_es.csv"
@@ -20,61 +25,58 @@ USER_AGENTS = [
 ]
 
 CONCURRENT_PAGES = 2  # Reduced concurrency for safer scraping
+MAX_REQUEUES = 3  # Blocked attempts per ASIN before leaving it for the next run
 
 CHECKPOINT_DIR = Path("checkpoints")
-CHECKPOINT_FILE = CHECKPOINT_DIR / "asin_progress.json"
+CHECKPOINT_FILE = CHECKPOINT_DIR / "asin_progress.json"  # old binary checkpoint, imported once
+SCHEDULE_FILE = CHECKPOINT_DIR / "recheck_schedule.sqlite"
+RECHECK_BUDGET = 1000  # price checks per run, most stale / valuable first
 
 
 # -----------------------------
 # Price Scraper (No Offers)
 # -----------------------------
-async def scrape_price(page: Page, asin: str):
+async def scrape_price(
+    page: Page,
+    asin: str,
+    scheduler: HostScheduler,
+    breaker: CircuitBreaker,
+) -> tuple[Outcome, str | None]:
     try:
         url = f"https://amazon.es/dp/{asin}"
 
-        # Pre-navigation delay (human-like thinking time)
-        await asyncio.sleep(random.uniform(3, 6))
-
+        # Per-host spacing and backoff replace the fixed human-like delays
         print(f"[{asin}] Opening product page")
-        await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-
-        # Post-load delay
-        await asyncio.sleep(random.uniform(4, 8))
-
-        selector = (
-            "span.a-price.aok-align-center.reinventPricePriceToPayMargin.priceToPay"
+        outcome, record = await visit_amazon(
+            page, url, scheduler, breaker,
+            wait_until="domcontentloaded", timeout=60000,
         )
 
-        try:
-            await page.wait_for_selector(selector, timeout=15000)
-        except:
-            print(f"[{asin}] Price container not found")
-            return None
-
-        whole = await page.locator(
-            f"{selector} span.a-price-whole"
-        ).first.text_content()
-
-        fraction = await page.locator(
-            f"{selector} span.a-price-fraction"
-        ).first.text_content()
-
-        if not whole:
+        if outcome is not Outcome.OK:
+            print(f"[{asin}] {outcome.value}")
+            return outcome, None
+
+        # The price block may render after DOMContentLoaded
+        if not record.get("price_whole"):
+            try:
+                await page.wait_for_selector(PRICE_SELECTOR, timeout=15000)
+            except:
+                print(f"[{asin}] Price container not found")
+                return outcome, None
+            record = await extract_product(page)
+
+        price = extracted_price(record)
+        if not price:
             print(f"[{asin}] Whole price missing")
-            return None
-
-        whole = whole.replace(".", "").replace(",", "").strip()
-        fraction = fraction.strip() if fraction else "00"
-
-        price = f"{whole},{fraction}"
+            return outcome, None
 
         print(f"[{asin}] Price: {price}")
 
-        return price
+        return outcome, price
 
     except Exception as e:
         print(f"[{asin}] Error: {e}")
-        return None
+        return Outcome.NETWORK_ERROR, None
 
 
 # -----------------------------
@@ -83,51 +85,25 @@ async def scrape_price(page: Page, asin: str):
 async def main():
     CHECKPOINT_DIR.mkdir(exist_ok=True)
 
-    processed_asins = set()
-    if CHECKPOINT_FILE.exists():
-        with open(CHECKPOINT_FILE, "r") as f:
-            processed_asins = set(json.load(f))
-        print(f"Loaded checkpoint with {len(processed_asins)} processed ASINs")
+    schedule = RecheckSchedule(str(SCHEDULE_FILE), job="price")
+    if schedule.is_empty() and CHECKPOINT_FILE.exists():
+        import_checkpoint(schedule)
 
-    remaining_asins = [
-        (row["asin1"], row["seller-sku"])
-        for _, row in df.iterrows()
-        if row["asin1"] not in processed_asins
-    ]
+    schedule.register(
+        (row["asin1"], business_value(row)) for row in df.to_dict("records")
+    )
+    due = schedule.due(RECHECK_BUDGET)
+    skus = dict(zip(df["asin1"], df["seller-sku"]))
 
-    print(f"Remaining ASINs to process: {len(remaining_asins)}")
+    print(f"ASINs due for a price check: {len(due)} (budget {RECHECK_BUDGET})")
 
     queue = asyncio.Queue()
-    for asin, sku in remaining_asins:
-        await queue.put((asin, sku))
-
-    write_lock = asyncio.Lock()
-
-    async def atomic_append(result_row):
-        async with write_lock:
-            file_exists = os.path.exists(output_file)
-            temp_file = output_file + ".tmp"
-
-            if file_exists:
-                existing_df = pd.read_csv(output_file)
+    for asin in due:
+        await queue.put((asin, skus[asin]))
 
-                for col in result_row.keys():
-                    if col not in existing_df.columns:
-                        existing_df[col] = None
-
-                updated_df = pd.concat(
-                    [existing_df, pd.DataFrame([result_row])],
-                    ignore_index=True
-                )
-            else:
-                updated_df = pd.DataFrame([result_row])
-
-            updated_df.to_csv(temp_file, index=False)
-            os.replace(temp_file, output_file)
-
-            processed_asins.add(result_row["asin1"])
-            with open(CHECKPOINT_FILE, "w") as f:
-                json.dump(list(processed_asins), f)
+    scheduler = HostScheduler(max_concurrency=CONCURRENT_PAGES)
+    breaker = CircuitBreaker()
+    requeues: dict[str, int] = {}
 
     async def worker(name: int, page: Page):
         while True:
@@ -139,39 +115,33 @@ async def main():
             asin, sku = item
             print(f"[Worker {name}] Processing {asin}")
 
-            price = await scrape_price(page, asin)
+            outcome, price = await scrape_price(page, asin, scheduler, breaker)
 
-            row = {
-                "asin1": asin,
-                "sku": sku,
-                "buybox_price": price
-            }
-
-            await atomic_append(row)
+            # Blocked rows are never committed; put them back for later
+            if not outcome.is_final:
+                requeues[asin] = requeues.get(asin, 0) + 1
+                if requeues[asin] <= MAX_REQUEUES:
+                    await queue.put(item)
+                else:
+                    print(f"[{asin}] Still {outcome.value}, left for the next run")
+                queue.task_done()
+                continue
 
-            # Inter-request cooldown (critical for bot protection)
-            await asyncio.sleep(random.uniform(5, 10))
+            schedule.record(asin, outcome.value, price)
 
             queue.task_done()
 
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=False)
 
-        context = await browser.new_context(
+        # Block heavy assets and trackers, serve static bundles from disk
+        router = Router("amazon_dom")
+        context = await router.new_context(
+            browser,
             user_agent=random.choice(USER_AGENTS),
             locale="es-ES"
         )
 
-        # Block heavy assets to reduce bandwidth fingerprinting
-        await context.route(
-            "**/*",
-            lambda route: asyncio.create_task(
-                route.abort()
-                if route.request.resource_type in ["image", "font", "media"]
-                else route.continue_()
-            ),
-        )
-
         pages = [await context.new_page() for _ in range(CONCURRENT_PAGES)]
 
         workers = [
@@ -185,9 +155,47 @@ async def main():
             await queue.put(None)
 
         await asyncio.gather(*workers)
+        router.print_stats()
         await browser.close()
 
+    export_prices(schedule, skus)
+    schedule.close()
     print("\nScraping completed.")
 
 
+def import_checkpoint(schedule: RecheckSchedule):
+    """Carry the old checkpoint and its prices over to the schedule."""
+    with open(CHECKPOINT_FILE, "r") as f:
+        processed_asins = set(json.load(f))
+
+    prices = {}
+    if os.path.exists(output_file):
+        old = pd.read_csv(output_file, dtype=str)
+        prices = dict(zip(old["asin1"], old["buybox_price"].where(old["buybox_price"].notna(), None)))
+
+    schedule.import_checked(
+        {asin: (Outcome.OK.value, prices.get(asin)) for asin in processed_asins},
+        checked_at=CHECKPOINT_FILE.stat().st_mtime,
+    )
+    print(f"Imported {len(processed_asins)} ASINs from {CHECKPOINT_FILE}")
+
+
+def export_prices(schedule: RecheckSchedule, skus: dict):
+    """Rewrite the price file from the latest check of every ASIN."""
+    rows = [
+        {
+            "asin1": asin,
+            "sku": skus.get(asin),
+            "buybox_price": result,
+            "checked_at": pd.Timestamp(checked, unit="s").isoformat(),
+        }
+        for asin, (_, result, checked) in schedule.results().items()
+    ]
+
+    temp_file = output_file + ".tmp"
+    pd.DataFrame(rows, columns=["asin1", "sku", "buybox_price", "checked_at"]).to_csv(temp_file, index=False)
+    os.replace(temp_file, output_file)
+    print(f"Prices for {len(rows)} ASINs written to {output_file}")
+
+
 asyncio.run(main())
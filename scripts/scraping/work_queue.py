@@ -0,0 +1,336 @@
+"""
+work_queue.py
+-------------
+Lease-based shared work queue, so one scrape or enrichment job can be
+split across several processes or machines without cutting CSVs.
+
+    queue = open_queue("sqlite:///checkpoints/work_queue.sqlite", job="providers")
+    queue.add((row["ASIN"], row) for row in rows)   # idempotent, any worker may do it
+
+    async with queue.keep_alive():                  # heartbeats held leases
+        for key, payload in queue.iter_claims():
+            ...
+            queue.complete(key, result)             # first result wins
+            # or queue.release(key) to hand it back
+
+A claimed item is leased to the worker for `lease_seconds`. Workers
+extend their leases with heartbeats while they hold them; if a worker dies
+its leases expire and the items go back to the queue for anyone to claim.
+Completing an item twice (e.g. after a lease expired mid-item) keeps the
+first result, so writes are idempotent.
+
+Backends:
+    sqlite:///path/to/file.sqlite   shared file (local disk or a share with
+                                    working file locks)
+    redis://host:6379/0             Redis, needs the `redis` package
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Iterable, Iterator
+
+DEFAULT_LEASE = 300.0
+
+
+# =========================
+# SQLITE BACKEND
+# =========================
+class SQLiteBackend:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS items (
+        job         TEXT NOT NULL,
+        key         TEXT NOT NULL,
+        payload     TEXT,
+        status      TEXT NOT NULL DEFAULT 'pending',
+        owner       TEXT,
+        lease_until REAL,
+        attempts    INTEGER NOT NULL DEFAULT 0,
+        result      TEXT,
+        PRIMARY KEY (job, key)
+    );
+    CREATE INDEX IF NOT EXISTS items_claimable ON items (job, status, lease_until);
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode; claims take an explicit write lock
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.executescript(self.SCHEMA)
+
+    def add(self, job: str, items: list[tuple[str, str]]) -> int:
+        before = self._db.total_changes
+        self._db.execute("BEGIN IMMEDIATE")
+        self._db.executemany(
+            "INSERT OR IGNORE INTO items (job, key, payload) VALUES (?, ?, ?)",
+            ((job, key, payload) for key, payload in items),
+        )
+        self._db.execute("COMMIT")
+        return self._db.total_changes - before
+
+    def claim(self, job: str, worker: str, n: int, lease: float) -> list[tuple[str, str]]:
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._db.execute(
+                "SELECT key, payload FROM items WHERE job = ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                "ORDER BY rowid LIMIT ?",
+                (job, now, n),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE items SET status = 'leased', owner = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE job = ? AND key = ?",
+                ((worker, now + lease, job, key) for key, _ in rows),
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def heartbeat(self, job: str, worker: str, keys: list[str], lease: float):
+        self._db.executemany(
+            "UPDATE items SET lease_until = ? WHERE job = ? AND key = ? "
+            "AND owner = ? AND status = 'leased'",
+            ((time.time() + lease, job, key, worker) for key in keys),
+        )
+
+    def complete(self, job: str, worker: str, key: str, result: str):
+        self._db.execute(
+            "UPDATE items SET status = 'done', result = ?, owner = NULL, lease_until = NULL "
+            "WHERE job = ? AND key = ? AND status != 'done'",
+            (result, job, key),
+        )
+
+    def release(self, job: str, worker: str, key: str):
+        self._db.execute(
+            "UPDATE items SET status = 'pending', owner = NULL, lease_until = NULL "
+            "WHERE job = ? AND key = ? AND owner = ? AND status = 'leased'",
+            (job, key, worker),
+        )
+
+    def results(self, job: str) -> Iterator[tuple[str, str]]:
+        yield from self._db.execute(
+            "SELECT key, result FROM items WHERE job = ? AND status = 'done' ORDER BY rowid",
+            (job,),
+        )
+
+    def counts(self, job: str) -> dict[str, int]:
+        rows = self._db.execute(
+            "SELECT status, COUNT(*) FROM items WHERE job = ? GROUP BY status", (job,)
+        )
+        return dict(rows)
+
+
+# =========================
+# REDIS BACKEND
+# =========================
+_REDIS_CLAIM = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, k in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], k)
+    redis.call('HDEL', KEYS[3], k)
+    redis.call('RPUSH', KEYS[1], k)
+end
+local claimed = {}
+while #claimed < tonumber(ARGV[4]) do
+    local k = redis.call('LPOP', KEYS[1])
+    if not k then break end
+    if redis.call('HEXISTS', KEYS[4], k) == 0 then
+        redis.call('ZADD', KEYS[2], ARGV[2], k)
+        redis.call('HSET', KEYS[3], k, ARGV[3])
+        table.insert(claimed, k)
+    end
+end
+return claimed
+"""
+
+_REDIS_HEARTBEAT = """
+for i, k in ipairs(KEYS) do
+    if i > 2 and redis.call('HGET', KEYS[2], k) == ARGV[1] then
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[2], k)
+    end
+end
+"""
+
+# Ownership check and requeue in one step: a lease that expires and is
+# reclaimed in between must not put the key back on the queue
+_REDIS_RELEASE = """
+if redis.call('HGET', KEYS[2], ARGV[2]) == ARGV[1] then
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('HDEL', KEYS[2], ARGV[2])
+    redis.call('RPUSH', KEYS[3], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("redis:// work queues need the `redis` package") from e
+
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._claim = self._r.register_script(_REDIS_CLAIM)
+        self._heartbeat = self._r.register_script(_REDIS_HEARTBEAT)
+        self._release = self._r.register_script(_REDIS_RELEASE)
+
+    @staticmethod
+    def _keys(job: str) -> dict[str, str]:
+        prefix = f"work_queue:{job}"
+        return {
+            name: f"{prefix}:{name}"
+            for name in ("pending", "leases", "owners", "results", "payloads")
+        }
+
+    def add(self, job: str, items: list[tuple[str, str]]) -> int:
+        k = self._keys(job)
+        pipe = self._r.pipeline()
+        for key, payload in items:
+            pipe.hsetnx(k["payloads"], key, payload)
+        created = pipe.execute()
+
+        pipe = self._r.pipeline()
+        for (key, _), new in zip(items, created):
+            if new:
+                pipe.rpush(k["pending"], key)
+        pipe.execute()
+        return sum(created)
+
+    def claim(self, job: str, worker: str, n: int, lease: float) -> list[tuple[str, str]]:
+        k = self._keys(job)
+        now = time.time()
+        keys = self._claim(
+            keys=[k["pending"], k["leases"], k["owners"], k["results"]],
+            args=[now, now + lease, worker, n],
+        )
+        if not keys:
+            return []
+        return list(zip(keys, self._r.hmget(k["payloads"], keys)))
+
+    def heartbeat(self, job: str, worker: str, keys: list[str], lease: float):
+        if keys:
+            k = self._keys(job)
+            self._heartbeat(keys=[k["leases"], k["owners"], *keys], args=[worker, time.time() + lease])
+
+    def complete(self, job: str, worker: str, key: str, result: str):
+        k = self._keys(job)
+        pipe = self._r.pipeline()
+        pipe.hsetnx(k["results"], key, result)
+        pipe.zrem(k["leases"], key)
+        pipe.hdel(k["owners"], key)
+        pipe.execute()
+
+    def release(self, job: str, worker: str, key: str):
+        k = self._keys(job)
+        self._release(keys=[k["leases"], k["owners"], k["pending"]], args=[worker, key])
+
+    def results(self, job: str) -> Iterator[tuple[str, str]]:
+        yield from self._r.hscan_iter(self._keys(job)["results"])
+
+    def counts(self, job: str) -> dict[str, int]:
+        k = self._keys(job)
+        return {
+            "pending": self._r.llen(k["pending"]),
+            "leased": self._r.zcard(k["leases"]),
+            "done": self._r.hlen(k["results"]),
+        }
+
+
+# =========================
+# QUEUE
+# =========================
+class WorkQueue:
+    def __init__(
+        self,
+        backend,
+        job: str,
+        worker_id: str | None = None,
+        lease_seconds: float = DEFAULT_LEASE,
+    ):
+        self.backend = backend
+        self.job = job
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.held: set[str] = set()
+
+    def add(self, items: Iterable[tuple[str, Any]], batch: int = 5000) -> int:
+        """Enqueue (key, payload) pairs; keys already known are ignored."""
+        added, chunk = 0, []
+        for key, payload in items:
+            chunk.append((key, json.dumps(payload, default=str)))
+            if len(chunk) >= batch:
+                added += self.backend.add(self.job, chunk)
+                chunk = []
+        if chunk:
+            added += self.backend.add(self.job, chunk)
+        return added
+
+    def claim(self, n: int = 1) -> list[tuple[str, Any]]:
+        rows = self.backend.claim(self.job, self.worker_id, n, self.lease_seconds)
+        self.held.update(key for key, _ in rows)
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def iter_claims(self, batch: int = 10) -> Iterator[tuple[str, Any]]:
+        """
+        Claim and yield items until nothing is claimable. Items leased by
+        live workers elsewhere are left to them.
+        """
+        while True:
+            claimed = self.claim(batch)
+            if not claimed:
+                return
+            yield from claimed
+
+    def heartbeat(self):
+        self.backend.heartbeat(self.job, self.worker_id, list(self.held), self.lease_seconds)
+
+    @asynccontextmanager
+    async def keep_alive(self, interval: float | None = None):
+        """Extend held leases in the background while the block runs."""
+        interval = interval or self.lease_seconds / 3
+
+        async def beat():
+            while True:
+                await asyncio.sleep(interval)
+                self.heartbeat()
+
+        task = asyncio.create_task(beat())
+        try:
+            yield self
+        finally:
+            task.cancel()
+
+    def complete(self, key: str, result: Any):
+        self.backend.complete(self.job, self.worker_id, key, json.dumps(result, default=str))
+        self.held.discard(key)
+
+    def release(self, key: str):
+        self.backend.release(self.job, self.worker_id, key)
+        self.held.discard(key)
+
+    def results(self) -> Iterator[tuple[str, Any]]:
+        for key, result in self.backend.results(self.job):
+            yield key, json.loads(result)
+
+    def counts(self) -> dict[str, int]:
+        return self.backend.counts(self.job)
+
+
+def open_queue(url: str, job: str, **kwargs) -> WorkQueue:
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        backend = RedisBackend(url)
+    elif url.startswith("sqlite:///"):
+        backend = SQLiteBackend(url[len("sqlite:///"):])
+    else:
+        raise ValueError(f"Unsupported work queue URL: {url}")
+    return WorkQueue(backend, job, **kwargs)
@@ -0,0 +1,140 @@
+"""
+worker_pool.py
+--------------
+Bounded worker pool for the Playwright scrapers.
+
+Each worker owns exactly one page for its whole life, so two coroutines
+can never drive the same page at once. Items are pulled from a streaming
+iterator into a bounded queue: the producer blocks when the workers fall
+behind, which keeps memory flat no matter how large the input is.
+
+    async def handle(page, row) -> bool:
+        ...               # True = done, False = requeue (e.g. blocked)
+
+    await run_pool(iter_csv_records("input.csv"), pages, handle)
+
+Ctrl+C stops feeding new items; workers finish the item they hold and the
+pool returns normally so callers can close the browser. A second Ctrl+C
+interrupts immediately.
+"""
+
+import asyncio
+import signal
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+import pandas as pd
+
+_DONE = object()
+
+
+def iter_csv_records(
+    path: str,
+    chunksize: int = 10_000,
+    dedupe_key: str | None = None,
+    keep: str = "last",
+    **read_kwargs,
+) -> Iterator[dict]:
+    """
+    Stream a CSV as row dicts, one chunk in memory at a time.
+
+    With `dedupe_key`, only one row per key is yielded (the first or the
+    last occurrence, like DataFrame.drop_duplicates). This needs one extra
+    pass that reads just the key column.
+    """
+    wanted = None
+    if dedupe_key:
+        keys = pd.read_csv(path, usecols=[dedupe_key], **read_kwargs)[dedupe_key]
+        wanted = set(keys.index[~keys.duplicated(keep=keep)])
+        del keys
+
+    offset = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_kwargs):
+        chunk.index = range(offset, offset + len(chunk))
+        offset += len(chunk)
+        if wanted is not None:
+            chunk = chunk[chunk.index.isin(wanted)]
+        yield from chunk.to_dict("records")
+
+
+async def run_pool(
+    items: Iterable[Any],
+    pages: list,
+    handler: Callable[[Any, Any], Awaitable[bool | None]],
+    queue_size: int | None = None,
+    max_requeues: int = 3,
+) -> list[Any]:
+    """
+    Process `items` with one worker per page. Returns the items that were
+    still being requeued when they ran out of attempts (or when the pool
+    was stopped), so callers can report them.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or 2 * len(pages))
+    retries: deque = deque()
+    leftover: list[Any] = []
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+
+    def request_stop(*_):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print("\n🛑 Ctrl+C detected. Finishing in-flight pages...")
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, request_stop)
+        restore = lambda: loop.remove_signal_handler(signal.SIGINT)
+    except (NotImplementedError, RuntimeError):
+        # Windows event loops have no add_signal_handler
+        previous = signal.signal(signal.SIGINT, request_stop)
+        restore = lambda: signal.signal(signal.SIGINT, previous)
+
+    async def producer():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                await queue.put((item, 0))
+        finally:
+            for _ in pages:
+                await queue.put(_DONE)
+
+    async def worker(page):
+        exhausted = False
+        while True:
+            if retries:
+                entry = retries.popleft()
+            elif exhausted:
+                return
+            else:
+                entry = await queue.get()
+                if entry is _DONE:
+                    # Keep draining requeues from workers still in flight
+                    exhausted = True
+                    continue
+
+            item, attempts = entry
+            if stop.is_set():
+                leftover.append(item)
+                continue
+
+            try:
+                done = await handler(page, item)
+            except Exception as e:
+                print(f"Worker error: {e}")
+                done = False
+
+            if done is False:
+                if attempts + 1 < max_requeues:
+                    retries.append((item, attempts + 1))
+                else:
+                    leftover.append(item)
+
+    try:
+        await asyncio.gather(producer(), *(worker(page) for page in pages))
+    finally:
+        restore()
+
+    leftover.extend(item for item, _ in retries)
+    return leftover
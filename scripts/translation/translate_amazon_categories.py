@@ -1,19 +1,23 @@
-import pandas as pd
 import os
 import json
 import re
 import signal
+import sys
 from dotenv import load_dotenv
 from mistralai import Mistral
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import read_stage, stage_path, write_stage
 
 # =========================
 # CONFIG
 # =========================
 load_dotenv()
 
-INPUT_CSV = "output/all_listings_with_images_and_category.csv"
-OUTPUT_CSV = "output/all_listings_with_images_and_category_translated.csv"
-TMP_OUTPUT_FILE = "output/.all_listings_with_images_and_category_translated.tmp"
+# Pipeline stages (output/<stage>.parquet, see pipeline_io)
+INPUT_STAGE = "all_listings_with_images_and_category"
+OUTPUT_STAGE = "all_listings_with_images_and_category_translated"
 CHECKPOINT_FILE = "checkpoints/translate_product_type_checkpoint.txt"
 
 BATCH_SIZE = 15
@@ -62,9 +66,9 @@ def handle_sigint(signum, frame):
 signal.signal(signal.SIGINT, handle_sigint)
 
 # =========================
-# LOAD MAIN CSV
+# LOAD LISTINGS
 # =========================
-df = pd.read_csv(INPUT_CSV, dtype=str)
+df = read_stage(INPUT_STAGE)
 df["amazon_product_type_es"] = df.get("amazon_product_type_es", "")
 
 # =========================
@@ -97,8 +101,7 @@ with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
             df.at[df_idx, "amazon_product_type_es"] = translation
 
         # Atomic write
-        df.to_csv(TMP_OUTPUT_FILE, index=False)
-        os.replace(TMP_OUTPUT_FILE, OUTPUT_CSV)
+        write_stage(df, OUTPUT_STAGE)
 
         # Save checkpoint
         with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
@@ -110,8 +113,11 @@ with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
             print("💾 Progress safely saved. Exiting.")
             exit(0)
 
+# Also written when nothing needed translating
+write_stage(df, OUTPUT_STAGE)
+
 # Cleanup
 if os.path.exists(CHECKPOINT_FILE):
     os.remove(CHECKPOINT_FILE)
 
-print(f"🎉 Completed. Final output: {OUTPUT_CSV}")
+print(f"🎉 Completed. Final output: {stage_path(OUTPUT_STAGE)}")
@@ -1,20 +1,23 @@
 import os
-import csv
 import re
 import json
 import signal
-import os
-from dotenv import load_dotenv
-from mistralai import Mistral
+import sys
+from pathlib import Path
+
+import pandas as pd
 from dotenv import load_dotenv
 from mistralai import Mistral
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "formatting"))
+from pipeline_io import read_stage, stage_exists, stage_path, write_stage
+
 load_dotenv()
 
-INPUT_FILE = "output/asin_results.csv"
-OUTPUT_FILE = "output/translated_catalog.csv"
+# Pipeline stages (output/<stage>.parquet, see pipeline_io)
+INPUT_STAGE = "asin_results"
+OUTPUT_STAGE = "translated_catalog"
 CHECKPOINT_FILE = "checkpoints/translate_checkpoint.txt"
-TMP_OUTPUT_FILE = "output/.translated_catalog.tmp"
 
 BATCH_SIZE = 20
 
@@ -56,13 +59,13 @@ Product names:
 
 
 def load_rows():
-    if os.path.exists(OUTPUT_FILE):
+    if stage_exists(OUTPUT_STAGE):
         print("🔁 Loading partial output file...")
-        with open(OUTPUT_FILE, newline="", encoding="utf-8") as f:
-            return list(csv.DictReader(f))
+        df = read_stage(OUTPUT_STAGE)
     else:
-        with open(INPUT_FILE, newline="", encoding="utf-8") as f:
-            return list(csv.DictReader(f))
+        df = read_stage(INPUT_STAGE)
+    # Empty cells as "" (like csv.DictReader)
+    return df.astype(object).where(df.notna(), "").to_dict("records")
 
 
 # Graceful Ctrl+C handler
@@ -107,12 +110,7 @@ with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
             row["NOMBRE_ES"] = es_name
 
         # Atomic write
-        with open(TMP_OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
-
-        os.replace(TMP_OUTPUT_FILE, OUTPUT_FILE)
+        write_stage(pd.DataFrame(rows), OUTPUT_STAGE)
 
         # Save checkpoint
         with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
@@ -127,4 +125,4 @@ with Mistral(api_key=os.getenv("MISTRAL_API_TOKEN", "")) as mistral:
 
 # Cleanup on full completion
 os.remove(CHECKPOINT_FILE)
-print(f"🎉 Translation complete. Saved to {OUTPUT_FILE}")
+print(f"🎉 Translation complete. Saved to {stage_path(OUTPUT_STAGE)}")
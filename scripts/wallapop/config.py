@@ -2,7 +2,18 @@
 
 BASE_URL = "https://es.wallapop.com"
 
-CONCURRENT_PAGES = 1
+# ---------------------------------------------------------------------------
+# Scraping — each context is an isolated headless browser session with its
+# own persisted cookies/consent (STATE_DIR/context_<n>.json).
+# ---------------------------------------------------------------------------
+CONCURRENT_CONTEXTS = 4
+HEADLESS = True
+STATE_DIR = "output/wallapop_state"
+
+# Results per seed: keep loading more ("Cargar más" / infinite scroll) until
+# this many listing titles are collected or MAX_LOAD_MORE rounds add nothing.
+MAX_ITEMS_PER_SEED = 200
+MAX_LOAD_MORE = 10
 
 # ---------------------------------------------------------------------------
 # Cluster weights — editorial priority for your shop's niche.
@@ -1,8 +1,26 @@
 import json
+import statistics
 from collections import defaultdict
 from pathlib import Path
 
-INPUT_FILE = Path("output/wallapop_keywords.json")
+INPUT_FILE = Path("output/wallapop_keywords.jsonl")
+LEGACY_INPUT_FILE = Path("output/wallapop_keywords.json")
+
+
+def _load_entries() -> list[dict]:
+    """Seed entries from the JSONL output, or the older single JSON file."""
+    if not INPUT_FILE.exists() and LEGACY_INPUT_FILE.exists():
+        with LEGACY_INPUT_FILE.open(encoding="utf-8") as f:
+            return json.load(f)
+
+    entries = []
+    with INPUT_FILE.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted scrape
+    return entries
 
 
 def load_demand() -> dict[str, list[str]]:
@@ -16,8 +34,7 @@ def load_demand() -> dict[str, list[str]]:
             "boots":     ["botas militares", "botas trekking", ...],
         }
     """
-    with INPUT_FILE.open(encoding="utf-8") as f:
-        data = json.load(f)
+    data = _load_entries()
 
     cluster_map: dict[str, set] = defaultdict(set)
 
@@ -35,3 +52,31 @@ def load_demand() -> dict[str, list[str]]:
 
     # Convert sets back to sorted lists for deterministic behaviour
     return {cluster: sorted(kws) for cluster, kws in cluster_map.items()}
+
+
+def load_market_prices() -> dict[str, float]:
+    """
+    Returns a dict mapping cluster -> median asking price (EUR) of the
+    Wallapop listings scraped for it. Clusters without priced listings
+    are left out; older scrapes without listings yield an empty dict.
+    """
+    cluster_prices: dict[str, dict] = defaultdict(dict)
+
+    for entry in _load_entries():
+        cluster = entry.get("cluster", "").strip()
+        if not cluster:
+            continue
+
+        for listing in entry.get("listings", []):
+            price = listing.get("price")
+            if price is None or listing.get("currency") not in (None, "EUR"):
+                continue
+            # Keyed by id: the same listing often matches several seeds
+            key = listing.get("id") or listing.get("title")
+            cluster_prices[cluster][key] = price
+
+    return {
+        cluster: statistics.median(prices.values())
+        for cluster, prices in cluster_prices.items()
+        if prices
+    }
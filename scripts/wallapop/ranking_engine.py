@@ -5,13 +5,17 @@ Ranks every SKU in the catalog individually against the Wallapop demand
 keywords scraped for each cluster.
 
 Score formula (all factors in [0, 1] range, final score in [0, 1]):
-    score = keyword_match × cluster_weight × price_factor
+    score = keyword_match × cluster_weight × price_factor × market_factor
 
 keyword_match  — cosine similarity between the SKU's text (category + type)
                  and the closest demand keyword for its cluster.
 cluster_weight — editorial priority from config.CLUSTER_WEIGHTS.
 price_factor   — Wallapop sellability by price band (see PRICE_BANDS below).
                  If your catalog CSV has no "Price" column this defaults to 1.0.
+market_factor  — how the SKU's price compares to the median asking price of
+                 the Wallapop listings scraped for its cluster: 1.0 at or
+                 below the median, falling as median / price above it.
+                 Defaults to 1.0 without a price or scraped listing prices.
 """
 
 import csv
@@ -23,7 +27,7 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 from config import CLUSTER_WEIGHTS
-from demand_aggregator import load_demand
+from demand_aggregator import load_demand, load_market_prices
 
 warnings.filterwarnings("ignore", category=UserWarning)  # sklearn sparse warnings
 
@@ -53,6 +57,16 @@ def price_factor(price: float | None) -> float:
     return 0.35
 
 
+# Floor for market_factor, so an overpriced SKU is demoted, not zeroed
+MIN_MARKET_FACTOR = 0.35
+
+
+def market_factor(price: float | None, market_median: float | None) -> float:
+    if price is None or not market_median or price <= market_median:
+        return 1.0
+    return max(MIN_MARKET_FACTOR, market_median / price)
+
+
 # ---------------------------------------------------------------------------
 # Cluster assignment — same rule set as before, kept here so ranking_engine
 # is self-contained. clusterize_shopify runs first and writes its own output;
@@ -136,7 +150,7 @@ def main() -> None:
     demand_map = load_demand()
 
     if not demand_map:
-        print("⚠  No demand data found in output/wallapop_keywords.json")
+        print("⚠  No demand data found in output/wallapop_keywords.jsonl")
         print("   Run scrape_suggestions.py first, then re-run this script.")
         return
 
@@ -144,7 +158,11 @@ def main() -> None:
 
     keyword_index = _build_keyword_index(demand_map)
 
-    rows: list[tuple[str, str, float, float, float, float]] = []
+    market_prices = load_market_prices()
+    if market_prices:
+        print(f"Loaded Wallapop median prices for clusters: {sorted(market_prices.keys())}")
+
+    rows: list[tuple[str, str, float, float, float, float, float]] = []
     skipped = 0
 
     with INPUT_FILE.open(encoding="utf-8") as f:
@@ -187,11 +205,12 @@ def main() -> None:
             except ValueError:
                 price = None
         pf = price_factor(price)
+        mf = market_factor(price, market_prices.get(cluster))
 
-        final_score = kw_score * weight * pf
+        final_score = kw_score * weight * pf * mf
 
         rows.append((sku, cluster, round(final_score, 6),
-                     round(kw_score, 4), round(weight, 4), round(pf, 4)))
+                     round(kw_score, 4), round(weight, 4), round(pf, 4), round(mf, 4)))
 
     if not rows:
         print("⚠  No rows were scored. Check that category_type_pairs.csv is populated.")
@@ -205,7 +224,7 @@ def main() -> None:
         writer = csv.writer(f)
         writer.writerow([
             "SKU", "Cluster", "Score",
-            "KeywordMatch", "ClusterWeight", "PriceFactor",
+            "KeywordMatch", "ClusterWeight", "PriceFactor", "MarketFactor",
         ])
         writer.writerows(rows[:200])
 
@@ -213,7 +232,7 @@ def main() -> None:
     print(f"\nTop 5 preview:")
     for r in top:
         print(f"  {r[0]:30s}  cluster={r[1]:12s}  score={r[2]:.4f}"
-              f"  (kw={r[3]:.3f}, w={r[4]:.2f}, price={r[5]:.2f})")
+              f"  (kw={r[3]:.3f}, w={r[4]:.2f}, price={r[5]:.2f}, market={r[6]:.2f})")
 
     print(f"\nSkipped (no cluster match): {skipped}")
     print(f"Scored: {len(rows)}  →  Top 200 saved to {OUTPUT_FILE}")
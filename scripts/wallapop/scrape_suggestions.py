@@ -1,44 +1,147 @@
 import asyncio
 import random
 import json
+import sys
 from pathlib import Path
 from playwright.async_api import async_playwright
-from config import BASE_URL, SEED_MAP, CONCURRENT_PAGES
-
-OUTPUT_FILE = Path("output/wallapop_keywords.json")
+from config import (
+    BASE_URL,
+    SEED_MAP,
+    CONCURRENT_CONTEXTS,
+    HEADLESS,
+    STATE_DIR,
+    MAX_ITEMS_PER_SEED,
+    MAX_LOAD_MORE,
+)
+from search_api import SEARCH_API, parse_listing, search_items
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "scraping"))
+from page_outcome import CircuitBreaker, Outcome, classify_wallapop
+from worker_pool import run_pool
+from browser_context import Router
+
+# One JSON object per seed, appended as soon as the seed is done
+OUTPUT_FILE = Path("output/wallapop_keywords.jsonl")
+MAX_REQUEUES = 3
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_4_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
 ]
 
-_COOKIE_DISMISSED = False
+LOAD_MORE_SELECTOR = "button:has-text('Cargar más'), walla-button:has-text('Cargar más')"
+
+FIRST_RESULTS_TIMEOUT = 12
+MORE_RESULTS_TIMEOUT = 8
+
+
+def load_done_seeds() -> set[tuple[str, str]]:
+    """(cluster, seed) pairs already written by earlier runs."""
+    done = set()
+    if not OUTPUT_FILE.exists():
+        return done
+    with OUTPUT_FILE.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            done.add((entry["cluster"], entry["seed"]))
+    return done
 
 
-def save_output(data):
+def append_output(entry):
     OUTPUT_FILE.parent.mkdir(exist_ok=True)
-    OUTPUT_FILE.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    with OUTPUT_FILE.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
 
-async def _dismiss_cookie_banner(page):
-    """Dismiss the cookie/consent banner once per session."""
-    global _COOKIE_DISMISSED
-    if _COOKIE_DISMISSED:
-        return
+class Session:
+    """
+    One isolated browser context. Consent state lives with the context and
+    is persisted to its storage_state file, so the banner is handled once
+    per context, not once per run.
+
+    Search API responses seen by the page are parsed into `listings`
+    (keyed by listing id) as they arrive.
+    """
+
+    def __init__(self, context, page, state_file: Path):
+        self.context = context
+        self.page = page
+        self.state_file = state_file
+        self.consented = state_file.exists()
+
+        self.listings: dict[str, dict] = {}
+        self.updated = asyncio.Event()
+        self._reads: set[asyncio.Task] = set()
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if response.status == 200 and SEARCH_API.search(response.url):
+            task = asyncio.create_task(self._read(response))
+            self._reads.add(task)
+            task.add_done_callback(self._reads.discard)
+
+    async def _read(self, response):
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        for item in search_items(payload):
+            listing = parse_listing(item)
+            if listing:
+                self.listings[listing["id"] or listing["title"]] = listing
+        self.updated.set()
+
+    def start_capture(self):
+        self.listings = {}
+        self.updated.clear()
+
+    async def wait_for_results(self, timeout: float) -> bool:
+        """True if a search response arrived within `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.updated.clear()
+        return True
+
+    async def drain(self):
+        if self._reads:
+            await asyncio.gather(*self._reads, return_exceptions=True)
+
+    async def dismiss_cookie_banner(self):
+        if self.consented:
+            return
+        try:
+            await self.page.wait_for_selector("span#cmpbntnotxt", timeout=5000)
+            reject_btn = self.page.locator("span#cmpbntnotxt").locator("xpath=ancestor::a")
+            await reject_btn.click()
+            await asyncio.sleep(1)
+            self.consented = True
+            await self.context.storage_state(path=str(self.state_file))
+        except Exception:
+            pass
+
+
+async def _load_more(page) -> None:
+    """Click "Cargar más" if shown, otherwise scroll to trigger infinite loading."""
+    button = page.locator(LOAD_MORE_SELECTOR).first
     try:
-        await page.wait_for_selector("span#cmpbntnotxt", timeout=5000)
-        reject_btn = page.locator("span#cmpbntnotxt").locator("xpath=ancestor::a")
-        await reject_btn.click()
-        await asyncio.sleep(1)
-        _COOKIE_DISMISSED = True
+        if await button.is_visible():
+            await button.click()
+        else:
+            await page.mouse.wheel(0, 20000)
     except Exception:
-        pass
+        await page.mouse.wheel(0, 20000)
 
 
-async def scrape_suggestions(page, seed):
+async def scrape_suggestions(session: Session, seed, breaker):
     """
-    Navigate to Wallapop search results for `seed` and return all listing
-    titles from the first results page (~40 items).
+    Navigate to Wallapop search results for `seed` and return the listings
+    from the search API responses, loading more results until
+    MAX_ITEMS_PER_SEED are collected or no further page arrives.
 
     Listing titles are real buyer-facing descriptions like:
       "mochila helikon tex 25l verde oliva nueva"
@@ -46,120 +149,115 @@ async def scrape_suggestions(page, seed):
     This vocabulary is far more specific than autocomplete suggestions and
     allows the TF-IDF scorer to genuinely discriminate between individual SKUs.
     """
+    page = session.page
     search_url = (
         f"{BASE_URL}/search?keywords={seed.replace(' ', '%20')}"
         "&filters_source=search_box"
     )
 
-    await page.goto(search_url, wait_until="domcontentloaded")
-    await asyncio.sleep(random.uniform(2.5, 4.0))
+    await breaker.wait(search_url)
+    session.start_capture()
 
-    await _dismiss_cookie_banner(page)
-
-    # Wait for listing cards to render
     try:
-        await page.wait_for_selector(
-            "[class*='ItemCard'], [class*='item-card'], a[href*='/item/']",
-            timeout=12000,
-        )
-    except Exception:
-        print(f"  No results found for seed: '{seed}'")
-        return []
-
-    await asyncio.sleep(random.uniform(0.5, 1.5))
-
-    titles = []
-
-    # Try selectors from most to least specific — Wallapop's class names
-    # are stable but obfuscated; we try several patterns.
-    for selector in [
-        "[class*='ItemCard__title']",
-        "[class*='item-card__title']",
-        "[class*='ItemCard'] p",
-        "a[href*='/item/'] p",
-        "a[href*='/item/'] span",
-    ]:
-        els = page.locator(selector)
-        count = await els.count()
-        if count >= 3:
-            titles = await els.all_text_contents()
+        response = await page.goto(search_url, wait_until="domcontentloaded")
+    except Exception as e:
+        print(f"  Network error for seed '{seed}': {e}")
+        breaker.record(search_url, Outcome.NETWORK_ERROR)
+        return Outcome.NETWORK_ERROR, []
+
+    await session.dismiss_cookie_banner()
+
+    outcome = classify_wallapop(response.status if response else None, await page.content())
+    breaker.record(search_url, outcome)
+    if not outcome.is_final:
+        print(f"  Seed '{seed}' {outcome.value}")
+        return outcome, []
+
+    if not await session.wait_for_results(FIRST_RESULTS_TIMEOUT):
+        print(f"  No search results captured for seed: '{seed}'")
+        return outcome, []
+
+    for _ in range(MAX_LOAD_MORE):
+        if len(session.listings) >= MAX_ITEMS_PER_SEED:
             break
-
-    # Last-resort fallback
-    if not titles:
-        titles = await page.locator("main p").all_text_contents()
-
-    cleaned = list(set([
-        t.strip().lower()
-        for t in titles
-        if t and 4 < len(t.strip()) < 120
-    ]))
-
-    print(f"  '{seed}' -> {len(cleaned)} listing titles")
-    return cleaned
-
-
-async def worker(queue, page, results):
-    while True:
-        item = await queue.get()
-        if item is None:
+        await asyncio.sleep(random.uniform(1.0, 2.0))
+        await _load_more(page)
+        if not await session.wait_for_results(MORE_RESULTS_TIMEOUT):
             break
 
-        cluster = item["cluster"]
-        seed = item["seed"]
-
-        titles = await scrape_suggestions(page, seed)
-
-        results.append({
-            "cluster": cluster,
-            "seed": seed,
-            "suggestions": titles,
-        })
-
-        queue.task_done()
+    await session.drain()
+    listings = list(session.listings.values())[:MAX_ITEMS_PER_SEED]
+    print(f"  '{seed}' -> {len(listings)} listings")
+    return outcome, listings
 
 
 async def main():
-    global _COOKIE_DISMISSED
-    _COOKIE_DISMISSED = False
+    breaker = CircuitBreaker(min_samples=3)
 
-    queue = asyncio.Queue()
-    results = []
+    done = load_done_seeds()
+    items = [
+        {"cluster": cluster, "seed": seed}
+        for cluster, seeds in SEED_MAP.items()
+        for seed in seeds
+        if (cluster, seed) not in done
+    ]
 
     total = sum(len(seeds) for seeds in SEED_MAP.values())
-    print(f"Scraping {total} seeds across {len(SEED_MAP)} clusters...")
-
-    for cluster, seeds in SEED_MAP.items():
-        for seed in seeds:
-            await queue.put({"cluster": cluster, "seed": seed})
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-
-        context = await browser.new_context(
-            user_agent=random.choice(USER_AGENTS),
-            locale="es-ES",
-        )
+    print(f"Scraping {len(items)} of {total} seeds across {len(SEED_MAP)} clusters "
+          f"({len(done)} already in {OUTPUT_FILE})...")
+    if not items:
+        return
 
-        pages = [await context.new_page() for _ in range(CONCURRENT_PAGES)]
+    state_dir = Path(STATE_DIR)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    saved_listings = 0
 
-        workers = [
-            asyncio.create_task(worker(queue, pages[i], results))
-            for i in range(CONCURRENT_PAGES)
-        ]
+    async def handle(session: Session, item) -> bool:
+        nonlocal saved_listings
+        outcome, listings = await scrape_suggestions(session, item["seed"], breaker)
 
-        await queue.join()
+        # A blocked search page is not "no demand": requeue the seed
+        if not outcome.is_final:
+            return False
 
-        for _ in range(CONCURRENT_PAGES):
-            await queue.put(None)
+        append_output({
+            "cluster": item["cluster"],
+            "seed": item["seed"],
+            "suggestions": sorted({l["title"].lower() for l in listings}),
+            "listings": listings,
+        })
+        saved_listings += len(listings)
+        return True
 
-        await asyncio.gather(*workers)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=HEADLESS)
+        router = Router("wallapop_search")
+
+        sessions = []
+        for i in range(min(CONCURRENT_CONTEXTS, len(items))):
+            state_file = state_dir / f"context_{i}.json"
+            context = await router.new_context(
+                browser,
+                user_agent=USER_AGENTS[i % len(USER_AGENTS)],
+                locale="es-ES",
+                storage_state=str(state_file) if state_file.exists() else None,
+            )
+            sessions.append(Session(context, await context.new_page(), state_file))
+
+        leftover = await run_pool(items, sessions, handle, max_requeues=MAX_REQUEUES)
+
+        # Refresh saved cookies; contexts that never saw the banner are not
+        # saved, so the next run still checks for it
+        for session in sessions:
+            if session.consented:
+                await session.context.storage_state(path=str(session.state_file))
+        router.print_stats()
         await browser.close()
 
-    save_output(results)
+    for item in leftover:
+        print(f"  Seed '{item['seed']}' not scraped, left for the next run")
 
-    total_titles = sum(len(r["suggestions"]) for r in results)
-    print(f"\nDone. {total_titles} listing titles saved -> {OUTPUT_FILE}")
+    print(f"\nDone. {saved_listings} listings saved -> {OUTPUT_FILE}")
 
 
 asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+search_api.py
+-------------
+Parsing of Wallapop search API responses.
+
+The search results grid is filled from these JSON responses; reading them
+gives structured listings (title, price, location, timestamp) instead of
+guessing titles from obfuscated CSS classes. Used by scrape_suggestions.py
+and by the scraping replay benchmark.
+"""
+
+import re
+from datetime import datetime, timezone
+
+SEARCH_API = re.compile(r"api\.wallapop\.com/api/v3/(general/)?search")
+
+
+def search_items(payload: dict) -> list[dict]:
+    """Listing objects from either search API response shape."""
+    section = (payload.get("data") or {}).get("section") or {}
+    items = (section.get("payload") or {}).get("items")
+    if items is None:
+        items = payload.get("search_objects") or payload.get("items") or []
+    return items
+
+
+def _timestamp(value) -> str | None:
+    if isinstance(value, (int, float)):
+        # Epoch milliseconds
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat()
+    return value
+
+
+def parse_listing(item: dict) -> dict | None:
+    title = (item.get("title") or "").strip()
+    if not title:
+        return None
+
+    price = item.get("price")
+    if isinstance(price, dict):
+        amount, currency = price.get("amount"), price.get("currency")
+    else:
+        amount, currency = price, item.get("currency")
+
+    location = item.get("location") or {}
+    return {
+        "id": item.get("id"),
+        "title": title,
+        "price": float(amount) if amount is not None else None,
+        "currency": currency,
+        "city": location.get("city"),
+        "postal_code": location.get("postal_code"),
+        "timestamp": _timestamp(item.get("modified_at") or item.get("created_at")),
+    }
@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("mistralai")
+
+import amazon_to_worten
+from amazon_to_worten import plan_exports
+
+
+def test_plan_exports_groups_listings_by_workbook(tmp_path, monkeypatch, capsys):
+    for name in ["ropa_y_calzado_deportivo", "moda", "salud_bienestar_y_cuidados_para_bebe", "not_mapped"]:
+        (tmp_path / f"{name}.xlsx").touch()
+    monkeypatch.setattr(amazon_to_worten, "XLSX_DIR", str(tmp_path))
+
+    df = pd.DataFrame({
+        "seller-sku": ["1", "2", "3", "4", "5"],
+        "amazon_product_type": ["SHOES", "COAT", "UNKNOWN", "WATCH", "HAT"],
+    })
+    tasks = plan_exports(df)
+
+    # Largest workbook first; types without a workbook are not exported
+    assert [(os.path.basename(path), group["seller-sku"].tolist()) for path, group in tasks] == [
+        ("moda.xlsx", ["2", "4", "5"]),
+        ("ropa_y_calzado_deportivo.xlsx", ["1"]),
+    ]
+    out = capsys.readouterr().out
+    assert "Skipping not_mapped.xlsx" in out
+    assert "No matches for salud_bienestar_y_cuidados_para_bebe.xlsx" in out
+
+    # Each task owns its rows
+    tasks[0][1].loc[:, "seller-sku"] = "x"
+    assert df["seller-sku"].tolist() == ["1", "2", "3", "4", "5"]
@@ -0,0 +1,50 @@
+import codecs
+
+import pandas as pd
+import pytest
+
+from convert import convert, detect_delimiter, detect_encoding, detect_format
+
+
+@pytest.mark.parametrize("sample, encoding", [
+    (codecs.BOM_UTF8 + "EAN;Modelo\n".encode(), "utf-8-sig"),
+    ("EAN\tModelo\n".encode("utf-16"), "utf-16"),
+    ("Modelo\nPrismático 10×50\n".encode(), "utf-8"),
+    ("Modelo\nPrismático\n".encode()[:-3], "utf-8"),  # 'á' cut in half by the sample
+    ("Modelo;Precio\nPrismático;99 €\n".encode("cp1252"), "cp1252"),
+    (b"Modelo\nPrism\x81tico\n", "latin-1"),  # 0x81 is undefined in cp1252
+])
+def test_detect_encoding(sample, encoding):
+    assert detect_encoding(sample) == encoding
+
+
+@pytest.mark.parametrize("text, sep", [
+    ("EAN;Modelo;Precio\n0840000000017;Konus 10x50;99,90\n0840000000024;Konus 8x42;79,90\n", ";"),
+    ("sku\tprice\tquantity\nA1\t12.50\t3\nA2\t9.00\t1\n", "\t"),
+    ("sku,price\nA1,12.50\nA2,9.00\nA3,1", ","),  # last line cut by the sample
+])
+def test_detect_delimiter(text, sep):
+    assert detect_delimiter(text.encode(), "utf-8") == sep
+
+
+def test_detect_delimiter_falls_back_to_the_default():
+    assert detect_delimiter(b"sku\nA1\nA2\n", "utf-8", default="\t") == "\t"
+
+
+def test_detect_format():
+    assert detect_format("input/Konus.XLSM") == "xlsx"
+    assert detect_format("report.txt") == "txt"
+    with pytest.raises(ValueError):
+        detect_format("catalog.ods")
+
+
+def test_convert_keeps_text_as_is(tmp_path):
+    src = tmp_path / "konus.csv"
+    src.write_bytes("EAN;Modelo;Stock\n0840000000017;Prismático 10×50;NA\n0840000000024;;3\n".encode("cp1252"))
+    dst = tmp_path / "konus.tsv"
+
+    assert convert(str(src), str(dst), usecols=["Modelo", "EAN"], chunksize=1) == 2
+    out = pd.read_csv(dst, sep="\t", dtype=str, keep_default_na=False)
+    assert list(out.columns) == ["Modelo", "EAN"]
+    assert out["EAN"].tolist() == ["0840000000017", "0840000000024"]
+    assert out["Modelo"].tolist() == ["Prismático 10×50", ""]
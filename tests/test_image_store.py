@@ -0,0 +1,98 @@
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+from image_store import ImageStore
+
+
+def photo(path, size=64, color=(255, 0, 0), quality=95):
+    """A colored disc on white, like a supplier product shot."""
+    im = Image.new("RGB", (size, size), "white")
+    ImageDraw.Draw(im).ellipse((size // 8, size // 4, size * 5 // 8, size * 7 // 8), fill=color)
+    im.save(path, quality=quality)
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path / "store"))
+    yield store
+    store.close()
+
+
+def test_exact_copies_share_one_object(tmp_path, store):
+    first = photo(tmp_path / "a.jpg")
+    copy = tmp_path / "b.jpg"
+    copy.write_bytes(open(first, "rb").read())
+
+    image_id = store.add_file(first, "https://img/a.jpg")
+    assert store.add_file(str(copy), "https://img/b.jpg") == image_id
+    assert not os.path.exists(first) and not copy.exists()
+    assert os.path.exists(store.path(image_id))
+    assert store.id_for_url("https://img/a.jpg") == store.id_for_url("https://img/b.jpg") == image_id
+
+
+def test_asin_images_keep_order_and_drop_repeats(tmp_path, store):
+    ids = [store.add_file(photo(tmp_path / f"{i}.jpg", color=c), f"https://img/{i}.jpg")
+           for i, c in enumerate([(255, 0, 0), (0, 0, 255)])]
+    store.set_asin_images("B000000001", [ids[1], ids[0], ids[1]])
+    assert store.asin_images("B000000001") == [ids[1], ids[0]]
+    assert store.asin_urls("B000000001") == ["https://img/1.jpg", "https://img/0.jpg"]
+    assert store.has_asin("B000000001") and not store.has_asin("B000000002")
+
+
+def test_near_duplicates_are_only_linked_on_request(tmp_path):
+    for link in (False, True):
+        store = ImageStore(str(tmp_path / f"store_{link}"), link_near_duplicates=link)
+        small = store.add_file(photo(tmp_path / "small.jpg", size=64, quality=70))
+        large = store.add_file(photo(tmp_path / "large.jpg", size=256))
+        assert small != large and store.has_image(small) and store.has_image(large)
+        # The lower-resolution copy points at the higher-resolution one
+        assert store.best_copy(small) == (large if link else small)
+        assert store.best_copy(large) == large
+        store.close()
+
+
+def test_color_variants_are_not_linked(tmp_path):
+    store = ImageStore(str(tmp_path / "store"), link_near_duplicates=True)
+    # Same gray level, so the dHash alone can't tell them apart
+    red = store.add_file(photo(tmp_path / "red.jpg", color=(255, 0, 0)))
+    green = store.add_file(photo(tmp_path / "green.jpg", size=128, color=(0, 130, 0)))
+    assert store.best_copy(red) == red
+    assert store.best_copy(green) == green
+    store.close()
+
+
+@pytest.mark.parametrize("body", ["html", "truncated"])
+def test_unreadable_files_are_rejected(tmp_path, store, body):
+    path = tmp_path / "bad.jpg"
+    if body == "html":
+        path.write_bytes(b"<html><body>503 Service Unavailable</body></html>")
+    else:
+        full = open(photo(tmp_path / "full.jpg", size=256), "rb").read()
+        path.write_bytes(full[: len(full) // 2])
+
+    assert store.add_file(str(path), "https://img/bad.jpg") is None
+    assert path.exists()  # left for the caller to keep or delete
+    assert store.id_for_url("https://img/bad.jpg") is None
+    assert store.images_without_variant("worten") == []
+
+
+def test_unreadable_images_from_older_stores_are_not_handed_out(tmp_path, store):
+    good = store.add_file(photo(tmp_path / "good.jpg"), "https://img/good.jpg")
+    # Rows stored before unreadable files were rejected have no phash
+    store._db.execute("INSERT INTO images (id, path) VALUES ('bad', 'objects/ba/d0/bad.jpg')")
+    store._db.execute("INSERT INTO image_urls (url, image_id) VALUES ('https://img/bad.jpg', 'bad')")
+    store.set_asin_images("B000000001", ["bad", good])
+
+    assert store.asin_images("B000000001") == [good]
+    assert store.asin_urls("B000000001") == ["https://img/good.jpg"]
+
+
+def test_objects_are_sharded_by_hash_prefix(tmp_path, store):
+    image_id = store.add_file(photo(tmp_path / "a.JPG"))
+    rel = os.path.relpath(store.path(image_id), store.root)
+    assert rel == os.path.join("objects", image_id[:2], image_id[2:4], image_id + ".jpg")
+    assert ImageStore.exists(str(store.root))
+    assert not ImageStore.exists(str(tmp_path / "elsewhere"))
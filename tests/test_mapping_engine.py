@@ -0,0 +1,325 @@
+import re
+
+import pandas as pd
+import pytest
+
+from mapping_engine import compile_spec, sheet_rows
+from mapping_specs import KONUS_AMAZON
+
+
+# =========================
+# REFERENCE: amazon_konus.direct_map before the mapping specs
+# =========================
+def clean_price(price_str):
+    if not price_str:
+        return None
+    return re.sub(r"[^\d.]", "", str(price_str))
+
+
+def direct_map(csv_row, enrichment):
+    weight = csv_row.get("PesoNeto")
+    if isinstance(weight, str) and weight.strip():
+        weight = weight.lower()
+        is_kg = "kg" in weight
+        weight = (
+            weight.replace("kg.", "").replace("kg", "").replace("gr.", "")
+            .replace("gr", "").replace("r", "").replace(",", ".").strip()
+        )
+        weight = float(weight)
+        if is_kg:
+            weight *= 1000
+
+    medidas_raw = csv_row.get("Medidas")
+    medidas = None
+    if isinstance(medidas_raw, str):
+        medidas_clean = medidas_raw.lower().replace("cm", "").replace(" ", "")
+        medidas = "; ".join(medidas_clean.split("x"))
+
+    dims = enrichment.get("dimensions", {})
+    product_type = enrichment.get("product_type")
+    browse_node = {
+        "RANGEFINDER": "Telémetros láser (3053092031)",
+        "CAMERA_TRIPOD": "Trípodes y monopies (930892031)",
+        "MICROSCOPES": "Microscopios monoculares (1443222031)",
+        "AIMING_SCOPE_SIGHT": "Dispositivos de visión nocturna \xa0 (930881031)",
+        "MAGNIFIER": "Lupas para lectura (4352920031)",
+        "TELESCOPE": "Monoculares (930884031)",
+        "BINOCULAR": "Prismáticos (930885031)",
+        "FLASHLIGHT": "Linternas (3053011031)",
+        "NAVIGATION_COMPASS": "Brújulas (2928776031)",
+    }.get(product_type)
+    size = "pequeño" if product_type == "FLASHLIGHT" else None
+
+    min_fd = dims.get("min_focal_distance")
+    min_fd_v = None
+    if isinstance(min_fd, dict) and min_fd.get("value") is not None and min_fd.get("unit") is not None:
+        min_fd_v = min_fd["value"]
+
+    cm = "Centímetros"
+    no_warning = "Ninguna advertencia aplicable"
+    entry = {
+        "SKU": csv_row.get("EAN"),
+        "SKU principal": csv_row.get("EAN"),
+        "ID del producto": csv_row.get("EAN"),
+        "Marca": "Konus Italia Group S.R.L",
+        "Fabricante": "Konus Italia Group S.R.L",
+        "Nombre Modelo": csv_row.get("Modelo"),
+        "Numero de modelo": enrichment.get("model_number"),
+        "Nombre del producto": csv_row.get("Título_producto"),
+        "Palabra clave genérica": csv_row.get("Descripción_corta"),
+        "Descripción del producto": csv_row.get("Descripción_larga"),
+        "Viñeta": enrichment.get("bullet"),
+        "Nodos recomendados de búsqueda": browse_node,
+        "Tamaño": size,
+        "Tipo de producto": product_type,
+        "Precio de venta recomendado (PVPR)": clean_price(csv_row.get("PVP FINAL")),
+        "Tu precio EUR (Vender en Amazon, ES)": clean_price(csv_row.get("PVP FINAL")),
+        "Precio de venta. EUR (Vender en Amazon, ES)": clean_price(csv_row.get("PVP FINAL")),
+        "Estado del producto": "Nuevo",
+        "Tipo de identificador del producto": "EAN",
+        "Grupo de la marina mercante (ES)": "Nueva plantilla Envios",
+        "Cumplimiento de código de canal (ES)": "DEFAULT",
+        "Cantidad (ES)": "1",
+        "Número de Artículos": "1",
+        "Número de cajas": "1",
+        "Componentes Incluidos": "1 artículo",
+        "Numero de pieza": enrichment.get("part_number"),
+        "Longitud Paquete": "1",
+        "Ancho Paquete": "1",
+        "Altura Paquete": "1",
+        "Unidad de anchura del paquete": cm,
+        "Unidad de longitud del paquete": cm,
+        "Peso Artículo": weight or "1",
+        "Unidad de peso del artículo": "Gramos",
+        "Tamaño del anillo": medidas,
+        "Aumento máximo": dims.get("max_magnification"),
+        "Distancia focal mínima": min_fd_v,
+        "Unidad de altura del paquete": cm,
+        "Peso del paquete": "1",
+        "Unidad del peso del paquete": "Kilogramos",
+        "Garantía de Producto": "2",
+        "¿Se necesitan baterías?": "No",
+        "Normativas sobre mercancías peligrosas": "No aplicable",
+        "Riesgo del GDPR": "No hay información electrónica almacenada.",
+        "URL de la imagen principal": csv_row.get("Imagen_grande"),
+        "País de origen": "Italia",
+        "Color": "negro",
+        "Mapa de color": "negro",
+        "Grosor del artículo desde la parte delantera hasta la trasera": "0",
+        "Altura del artículo desde la base hasta la parte superior": "0",
+        "Ancho del artículo de lado a lado": "0",
+        "Fecha de comienzo de la venta. (Vender en Amazon, ES)": "2026-01-20",
+        "Fecha de finalización de la venta. (Vender en Amazon, ES)": "2027-01-01",
+    }
+    match product_type:
+        case "FLASHLIGHT":
+            entry.update({
+                "Fuente Alimentación": "Batería",
+                "Etiquetado Eficiencia Energética UE": "A to G",
+                "Eficiencia": "A",
+                "Conteo de unidades": "1",
+                "Tipo de conteo de unidades": "unidad",
+                "¿Es frágil?": "No",
+                "Unidad de la altura": cm,
+                "Unidad de la longitud": cm,
+                "Unidad del ancho": cm,
+                "Unidad de altura del artículo": cm,
+                "Unidad de grosor del artículo": cm,
+                "Unidad del ancho del artículo": cm,
+                "Altura desde la base hasta la parte superior": "1",
+                "Longitud del borde horizontal más largo": "1",
+                "Ancho del borde horizontal más corto": "1",
+            })
+        case "MAGNIFIER":
+            entry.update({"¿Es frágil?": "No", "Tamaño": "pequeño"})
+        case "CAMERA_TRIPOD":
+            entry.update({
+                "Material": "Plástico",
+                "Unidad de grosor del artículo": cm,
+                "Unidad de altura del artículo": cm,
+                "Unidad del ancho del artículo": cm,
+            })
+        case "NAVIGATION_COMPASS":
+            entry.update({
+                "Material": "Plástico",
+                "Seguridad Juguetes Edad EU Advertencia": no_warning,
+                "Advertencia No Requisito Edad EU DSJ": no_warning,
+            })
+        case "RANGEFINDER":
+            entry.update({
+                "Material": "Plástico",
+                "Tamaño": "pequeño",
+                "Seguridad Juguetes Edad EU Advertencia": no_warning,
+                "Advertencia No Requisito Edad EU DSJ": no_warning,
+            })
+        case "AIMING_SCOPE_SIGHT":
+            entry["Material"] = "Plástico"
+            entry["Tamaño"] = "pequeño"
+            if entry.get("Peso Artículo"):
+                entry["Peso Artículo"] = round(entry["Peso Artículo"] / 453.6, 2)
+                entry["Unidad de peso del artículo"] = "Libras"
+            entry.update({
+                "Peso Artículo Unidad": "Libras",
+                "Seguridad Juguetes Edad EU Advertencia": no_warning,
+                "Nombre del departamento": "Adultos unisex",
+                "Advertencia No Requisito Edad EU DSJ": no_warning,
+            })
+        case "TELESCOPE":
+            entry.update({
+                "Unidad de grosor del artículo": cm,
+                "Unidad de altura del artículo": cm,
+                "Unidad del ancho del artículo": cm,
+            })
+            entry["Aumento máximo"] = entry["Aumento máximo"] or "0"
+            entry["Distancia focal mínima"] = entry["Distancia focal mínima"] or "0"
+        case "BINOCULAR":
+            entry.update({
+                "Unidad de longitud del artículo": cm,
+                "Unidad del ancho del artículo": cm,
+                "Longitud del artículo desde el borde más largo": "1",
+                "Ancho del artículo desde el borde más corto": "1",
+            })
+        case "MICROSCOPES":
+            entry["Unidad de longitud del artículo"] = cm
+    return entry
+
+
+# =========================
+# FIXTURES
+# =========================
+def catalog_row(i, weight, product_type, **dims):
+    source = {
+        "EAN": 8018180000000 + i,
+        "Modelo": f"MOD-{i}",
+        "Título_producto": f"Producto {i}",
+        "Descripción_corta": f"Corta {i}",
+        "Descripción_larga": f"Larga {i}",
+        "PVP FINAL": "1.299,00 €" if i % 2 else "49,90",
+        "PesoNeto": weight,
+        "Medidas": "10 x 5 x 3 cm" if i % 3 else None,
+        "Imagen_grande": f"https://example.com/{i}.jpg",
+    }
+    enrichment = {
+        "product_type": product_type,
+        "bullet": f"Bullet {i}",
+        "model_number": f"M{i}",
+        "part_number": f"P{i}",
+        "dimensions": dims,
+    }
+    return source, enrichment
+
+
+ROWS = [
+    catalog_row(1, "350 gr.", "FLASHLIGHT"),
+    catalog_row(2, "1,2 kg", "BINOCULAR", max_magnification=10),
+    catalog_row(3, "80gr", "TELESCOPE"),
+    catalog_row(4, "250", "TELESCOPE", max_magnification=8,
+                min_focal_distance={"value": 150, "unit": "cm"}),
+    catalog_row(5, "454 gr", "AIMING_SCOPE_SIGHT"),
+    catalog_row(6, None, "MAGNIFIER", min_focal_distance={"value": 5, "unit": None}),
+    catalog_row(7, "0,5kg", "CAMERA_TRIPOD"),
+    catalog_row(8, "120 gr", "NAVIGATION_COMPASS"),
+    catalog_row(9, "300gr.", "RANGEFINDER"),
+    catalog_row(10, "900 gr", "MICROSCOPES"),
+    catalog_row(11, None, None),
+    # Zeros fall back to the default, like the old `x or default`
+    catalog_row(12, "0 gr", "FLASHLIGHT"),
+    catalog_row(13, "0", "TELESCOPE", max_magnification=0,
+                min_focal_distance={"value": 0, "unit": "cm"}),
+]
+
+
+def flat(source, enrichment):
+    """Catalog row + enrichment as amazon_konus.enrichment_columns flattens it."""
+    dims = enrichment["dimensions"]
+    fd = dims.get("min_focal_distance")
+    complete = isinstance(fd, dict) and fd.get("value") is not None and fd.get("unit") is not None
+    return {
+        **source,
+        "product_type": enrichment["product_type"],
+        "bullet": enrichment["bullet"],
+        "model_number": enrichment["model_number"],
+        "part_number": enrichment["part_number"],
+        "max_magnification": dims.get("max_magnification"),
+        "min_focal_distance": fd["value"] if complete else None,
+    }
+
+
+def non_null(entry):
+    return {k: v for k, v in entry.items() if v is not None}
+
+
+# =========================
+# TESTS
+# =========================
+@pytest.fixture(scope="module")
+def mapped():
+    df = pd.DataFrame([flat(s, e) for s, e in ROWS])
+    return compile_spec(KONUS_AMAZON).apply(df)
+
+
+@pytest.mark.parametrize("i", range(len(ROWS)), ids=[str(e["product_type"]) for _, e in ROWS])
+def test_konus_spec_matches_direct_map(mapped, i):
+    source, enrichment = ROWS[i]
+    row = mapped.iloc[i].astype(object)
+    assert non_null(row.where(row.notna(), None).to_dict()) == non_null(direct_map(source, enrichment))
+
+
+def test_sheet_rows_follow_template_columns(mapped):
+    headers = {1: "SKU", 3: "Tamaño", 7: "Peso Artículo", 9: "Not in the spec"}
+    rows = list(sheet_rows(mapped, headers))
+    assert rows[0] == {1: 8018180000001, 3: "pequeño", 7: 350.0}
+    assert rows[1] == {1: 8018180000002, 7: 1200.0}  # nulls are dropped
+    assert len(rows) == len(ROWS)
+
+
+def test_transforms_run_once_per_distinct_value():
+    calls = []
+
+    def spy(s):
+        calls.append(len(s))
+        return s.str.upper()
+
+    from mapping_engine import TRANSFORMS
+    TRANSFORMS["spy"] = spy
+    try:
+        mapping = compile_spec({"fields": [
+            {"target": "A", "source": "x", "transforms": ["spy"]},
+            {"target": "B", "source": "x", "transforms": ["spy"]},
+        ]})
+        out = mapping.apply(pd.DataFrame({"x": ["a", "b", "a", None, "b"]}))
+    finally:
+        del TRANSFORMS["spy"]
+
+    assert calls == [2]  # two distinct values, shared by both fields
+    assert out["A"].tolist() == ["A", "B", "A", None, "B"]
+
+
+def test_params_and_defaults():
+    mapping = compile_spec({"fields": [
+        {"target": "Categoría", "param": "category"},
+        {"target": "Peso", "source": "missing_column", "default": "1"},
+        {"target": "Marca", "source": "brand", "default": ""},
+    ]})
+    out = mapping.apply(pd.DataFrame({"brand": ["Konus", None]}), params={"category": "Hogar"})
+    assert out.to_dict("list") == {"Categoría": ["Hogar", "Hogar"], "Peso": ["1", "1"], "Marca": ["Konus", ""]}
+
+
+@pytest.mark.parametrize(
+    "spec, message",
+    [
+        ({"fields": [{"source": "x"}]}, "without target"),
+        ({"fields": [{"target": "A", "source": "x", "value": 1}]}, "exactly one"),
+        ({"fields": [{"target": "A", "source": "x", "transforms": ["nope"]}]}, "unknown transform"),
+        ({"fields": [], "overrides": {"X": []}}, "no type_column"),
+    ],
+)
+def test_invalid_specs(spec, message):
+    with pytest.raises(ValueError, match=message):
+        compile_spec(spec)
+
+
+def test_missing_source_without_default():
+    mapping = compile_spec({"fields": [{"target": "A", "source": "x"}]})
+    with pytest.raises(KeyError):
+        mapping.apply(pd.DataFrame({"y": [1]}))
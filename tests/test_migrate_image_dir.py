@@ -0,0 +1,29 @@
+from PIL import Image
+
+import migrate_image_dir
+from image_downloads import url_filename
+from image_store import ImageStore
+
+
+def test_flat_dir_is_moved_into_the_store(tmp_path, monkeypatch):
+    flat = tmp_path / "downloaded_images"
+    flat.mkdir()
+    monkeypatch.setattr(migrate_image_dir, "IMAGE_DIR", str(flat))
+    for name, color in [("B0001_image1.jpg", "red"), ("B0001_image2.jpg", "blue"), ("B0002_image1.jpg", "red")]:
+        Image.new("RGB", (32, 32), color).save(flat / name)
+    url = "https://m.media-amazon.com/images/I/green.jpg"
+    Image.new("RGB", (32, 32), "green").save(flat / url_filename(url))
+    (flat / "B0002_image2.jpg").write_bytes(b"<html>captcha</html>")
+    (flat / "partial.jpg.part").write_bytes(b"\xff\xd8")
+
+    store = ImageStore(str(tmp_path / "store"))
+    by_position = {("B0001", 2): "https://m.media-amazon.com/images/I/blue.jpg"}
+    migrate_image_dir.migrate_flat_dir(store, by_position, {url_filename(url): url})
+
+    red, blue = store.asin_images("B0001")
+    assert store.asin_images("B0002") == [red]  # the same photo is stored once
+    assert store.asin_urls("B0001") == ["https://m.media-amazon.com/images/I/blue.jpg"]
+    assert store.has_image(store.id_for_url(url))
+    # Unreadable files and partial downloads stay behind
+    assert sorted(p.name for p in flat.iterdir()) == ["B0002_image2.jpg", "partial.jpg.part"]
+    store.close()
@@ -0,0 +1,120 @@
+import pytest
+
+import page_outcome
+from page_outcome import CircuitBreaker, Outcome, classify_amazon, classify_amazon_record
+
+URL = "https://www.amazon.es/dp/B000000001"
+
+
+@pytest.mark.parametrize(
+    "status, text, expected",
+    [
+        (None, None, Outcome.NETWORK_ERROR),
+        (429, "", Outcome.BLOCKED),
+        (503, "", Outcome.BLOCKED),
+        (403, "", Outcome.BLOCKED),
+        (200, "Enter the characters you see below", Outcome.BLOCKED),
+        (200, "Sorry, we just need to make sure you're not a robot.", Outcome.BLOCKED),
+        (404, "", Outcome.MISSING),
+        (200, "Looking for something? We're sorry.", Outcome.MISSING),
+        (500, "", Outcome.NETWORK_ERROR),
+        (502, None, Outcome.NETWORK_ERROR),
+        (200, "Currently unavailable.", Outcome.OUT_OF_STOCK),
+        (200, "No disponible por el momento.", Outcome.OUT_OF_STOCK),
+        (200, "In stock. Añadir a la cesta", Outcome.OK),
+        (200, None, Outcome.OK),
+    ],
+)
+def test_classify_amazon(status, text, expected):
+    assert classify_amazon(status, text) is expected
+
+
+def test_block_signals_win_over_missing_and_out_of_stock():
+    # A captcha page can mention anything; it must never count as final
+    text = "Enter the characters you see below. Page not found. Currently unavailable."
+    assert classify_amazon(200, text) is Outcome.BLOCKED
+    assert classify_amazon(404, text) is Outcome.BLOCKED
+
+
+def test_only_blocked_and_network_error_are_not_final():
+    assert {o for o in Outcome if not o.is_final} == {Outcome.BLOCKED, Outcome.NETWORK_ERROR}
+
+
+def test_classify_record_without_ppd_is_missing_unless_blocked():
+    assert classify_amazon_record(200, {"ppd": None, "body": "Hello"}) is Outcome.MISSING
+    assert classify_amazon_record(200, {"ppd": "Currently unavailable"}) is Outcome.OUT_OF_STOCK
+    assert classify_amazon_record(200, {"captcha": True, "ppd": "In stock"}) is Outcome.BLOCKED
+    assert classify_amazon_record(503, {"ppd": None, "body": ""}) is Outcome.BLOCKED
+    assert classify_amazon_record(200, None) is Outcome.NETWORK_ERROR
+
+
+# =========================
+# CIRCUIT BREAKER
+# =========================
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(page_outcome.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_waits_for_min_samples(clock):
+    breaker = CircuitBreaker(window=10, threshold=0.3, min_samples=5, cooldown=60)
+    for _ in range(4):
+        breaker.record(URL, Outcome.BLOCKED)
+    assert not breaker.is_open(URL)
+
+    breaker.record(URL, Outcome.BLOCKED)
+    assert breaker.is_open(URL)
+    assert breaker.remaining(URL) == 60
+
+
+def test_breaker_opens_at_threshold_and_closes_after_cooldown(clock):
+    breaker = CircuitBreaker(window=10, threshold=0.3, min_samples=5, cooldown=60)
+    for outcome in [Outcome.OK] * 7 + [Outcome.BLOCKED] * 2:
+        breaker.record(URL, outcome)
+    assert not breaker.is_open(URL)  # 2/9 blocked
+
+    breaker.record(URL, Outcome.BLOCKED)  # 3/10
+    assert breaker.is_open(URL)
+
+    clock[0] += 59
+    assert breaker.is_open(URL)
+    clock[0] += 1
+    assert not breaker.is_open(URL)
+    assert breaker.remaining(URL) == 0
+
+
+def test_breaker_window_forgets_old_blocks(clock):
+    breaker = CircuitBreaker(window=5, threshold=0.5, min_samples=5, cooldown=60)
+    for outcome in [Outcome.BLOCKED] * 2 + [Outcome.OK] * 5 + [Outcome.BLOCKED] * 2:
+        breaker.record(URL, outcome)
+    assert not breaker.is_open(URL)  # only the last 5: 2/5 blocked
+
+
+def test_breaker_starts_half_open_period_with_clean_slate(clock):
+    breaker = CircuitBreaker(window=10, threshold=0.5, min_samples=2, cooldown=60)
+    breaker.record(URL, Outcome.BLOCKED)
+    breaker.record(URL, Outcome.BLOCKED)
+    assert breaker.is_open(URL)
+
+    clock[0] += 60
+    # The blocks that opened the circuit don't reopen it on the first sample
+    breaker.record(URL, Outcome.OK)
+    breaker.record(URL, Outcome.OK)
+    assert not breaker.is_open(URL)
+
+
+def test_breaker_is_per_host(clock):
+    breaker = CircuitBreaker(window=5, threshold=0.5, min_samples=2, cooldown=60)
+    breaker.record(URL, Outcome.BLOCKED)
+    breaker.record("https://www.amazon.es/dp/B000000002", Outcome.BLOCKED)
+    assert breaker.is_open(URL)
+    assert not breaker.is_open("https://www.amazon.com/dp/B000000001")
+
+
+def test_network_errors_do_not_count_as_blocks(clock):
+    breaker = CircuitBreaker(window=5, threshold=0.5, min_samples=2, cooldown=60)
+    for _ in range(5):
+        breaker.record(URL, Outcome.NETWORK_ERROR)
+    assert not breaker.is_open(URL)
@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import pytest
+
+import pipeline_io
+from pipeline_io import read_stage, stage_columns, stage_exists, stage_path, write_stage
+
+STAGE = "all_listings_ready"
+
+BACKENDS = [
+    pytest.param("parquet", marks=pytest.mark.skipif(pipeline_io.pq is None, reason="needs pyarrow")),
+    "csv",
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_io, "PIPELINE_DIR", str(tmp_path))
+    if request.param == "csv":
+        monkeypatch.setattr(pipeline_io, "pq", None)
+    return request.param
+
+
+def listings():
+    # As read from a CSV without dtype=str: identifiers inferred as numbers
+    return pd.DataFrame({
+        "seller-sku": [8_400_000_000_001.0, 8_400_000_000_002.0, None],
+        "asin1": ["B000000001", "0000000002", None],
+        "item-name": ["Sartén", None, "Olla"],
+        "price": ["12.5", 9, None],
+        "quantity": ["3", 2.0, None],
+        "manufacturer": ["Konus", "Bra", None],
+        "extra": [1, 2, 3],  # not in the schema
+    })
+
+
+def test_round_trip_types(backend):
+    path = write_stage(listings(), STAGE)
+    assert path.suffix == (".parquet" if backend == "parquet" else ".csv")
+
+    df = read_stage(STAGE)
+    # Identifiers are text and keep their digits, even after float inference
+    assert df["seller-sku"].tolist()[:2] == ["8400000000001", "8400000000002"]
+    assert df["asin1"].tolist()[:2] == ["B000000001", "0000000002"]
+    assert df["price"].dtype == "float64"
+    assert df["price"].tolist()[:2] == [12.5, 9.0]
+    assert str(df["quantity"].dtype) == "Int64"
+    assert df["quantity"].tolist()[:2] == [3, 2]
+    assert pd.isna(df["quantity"][2]) and pd.isna(df["price"][2]) and pd.isna(df["seller-sku"][2])
+    assert df["extra"].tolist() == ["1", "2", "3"]
+
+
+def test_read_selected_columns(backend):
+    write_stage(listings(), STAGE)
+    df = read_stage(STAGE, columns=["quantity", "seller-sku", "not-there"])
+    assert list(df.columns) == ["quantity", "seller-sku"]
+    assert str(df["quantity"].dtype) == "Int64"
+    assert stage_columns(STAGE) == list(listings().columns)
+
+
+def test_export_csv_keeps_identifiers(backend):
+    write_stage(listings(), STAGE, export_csv=True)
+    csv = pd.read_csv(stage_path(STAGE, ".csv"), dtype=str)
+    assert csv["asin1"].tolist()[:2] == ["B000000001", "0000000002"]
+    assert csv["seller-sku"][0] == "8400000000001"
+
+
+@pytest.mark.skipif(pipeline_io.pq is None, reason="needs pyarrow")
+def test_parquet_is_read_before_a_newer_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_io, "PIPELINE_DIR", str(tmp_path))
+    write_stage(pd.DataFrame({"seller-sku": ["001", "002"]}), STAGE)
+    partial = stage_path(STAGE, ".csv")
+    partial.write_text("seller-sku\n009\n")
+    later = os.stat(stage_path(STAGE)).st_mtime + 60
+    os.utime(partial, (later, later))
+
+    assert read_stage(STAGE)["seller-sku"].tolist() == ["001", "002"]
+
+    os.remove(stage_path(STAGE))
+    assert read_stage(STAGE)["seller-sku"].tolist() == ["009"]
+
+
+def test_missing_and_unknown_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_io, "PIPELINE_DIR", str(tmp_path))
+    assert not stage_exists(STAGE)
+    with pytest.raises(FileNotFoundError):
+        read_stage(STAGE)
+    with pytest.raises(KeyError):
+        write_stage(listings(), "no_such_stage")
+
+
+def test_fractional_int_in_a_csv_stage_is_rounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_io, "PIPELINE_DIR", str(tmp_path))
+    stage_path(STAGE, ".csv").write_text("seller-sku,quantity\n001,2.5\n002,3.7\n003,\n")
+    df = read_stage(STAGE)
+    assert str(df["quantity"].dtype) == "Int64"
+    assert df["quantity"].tolist()[:2] == [2, 4]
+    # Reads and writes cast the same way
+    write_stage(df, STAGE)
+    assert read_stage(STAGE)["quantity"].tolist()[:2] == [2, 4]
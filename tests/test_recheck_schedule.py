@@ -0,0 +1,122 @@
+import pytest
+
+from recheck_schedule import DAY, OUTCOME_TTL, RecheckSchedule, business_value
+
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture
+def schedule(tmp_path):
+    schedule = RecheckSchedule(str(tmp_path / "recheck.sqlite"), job="price")
+    yield schedule
+    schedule.close()
+
+
+def checked(schedule, asin, outcome, age, checks=1, changes=0, result=None):
+    schedule._db.execute(
+        "UPDATE schedule SET last_checked = ?, last_outcome = ?, last_result = ?, "
+        "checks = ?, changes = ? WHERE job = ? AND asin = ?",
+        (NOW - age, outcome, result, checks, changes, schedule.job, asin),
+    )
+
+
+def test_never_checked_come_first(schedule):
+    schedule.register([("OLD", 0.0), ("NEW", 0.0)])
+    checked(schedule, "OLD", "ok", age=100 * DAY)
+    assert schedule.due(budget=1, now=NOW) == ["NEW"]
+
+
+@pytest.mark.parametrize("outcome", ["ok", "out_of_stock", "missing"])
+def test_due_once_the_outcome_ttl_has_passed(schedule, outcome):
+    schedule.register([("A", 0.0)])
+    ttl = OUTCOME_TTL[outcome]
+
+    checked(schedule, "A", outcome, age=ttl - 60)
+    assert schedule.due(budget=10, now=NOW) == []
+
+    checked(schedule, "A", outcome, age=ttl)
+    assert schedule.due(budget=10, now=NOW) == ["A"]
+
+
+def test_ttls_order_outcomes():
+    assert OUTCOME_TTL["out_of_stock"] < OUTCOME_TTL["ok"] < OUTCOME_TTL["missing"]
+
+
+def test_unknown_outcome_uses_default_ttl(schedule):
+    schedule.register([("A", 0.0)])
+    checked(schedule, "A", "something_else", age=7 * DAY - 60)
+    assert schedule.due(budget=10, now=NOW) == []
+    checked(schedule, "A", "something_else", age=7 * DAY)
+    assert schedule.due(budget=10, now=NOW) == ["A"]
+
+
+def test_changing_results_go_stale_faster(schedule):
+    schedule.register([("STABLE", 0.0), ("FLAKY", 0.0)])
+    # Half the checks changed the result: the TTL is divided by 1.5
+    checked(schedule, "STABLE", "ok", age=5 * DAY, checks=4, changes=0)
+    checked(schedule, "FLAKY", "ok", age=5 * DAY, checks=4, changes=2)
+    assert schedule.due(budget=10, now=NOW) == ["FLAKY"]
+
+
+def test_priority_is_staleness_times_value(schedule):
+    schedule.register([("LOW", 0.0), ("HIGH", 1.0), ("STALEST", 0.0)])
+    checked(schedule, "LOW", "ok", age=14 * DAY)       # 2 × 1
+    checked(schedule, "HIGH", "ok", age=14 * DAY)      # 2 × 2
+    checked(schedule, "STALEST", "ok", age=21 * DAY)   # 3 × 1
+    assert schedule.due(budget=10, now=NOW) == ["HIGH", "STALEST", "LOW"]
+    assert schedule.due(budget=2, now=NOW) == ["HIGH", "STALEST"]
+
+
+def test_min_staleness(schedule):
+    schedule.register([("A", 0.0)])
+    checked(schedule, "A", "ok", age=4 * DAY)
+    assert schedule.due(budget=10, now=NOW) == []
+    assert schedule.due(budget=10, min_staleness=0.5, now=NOW) == ["A"]
+
+
+def test_record_counts_changes(schedule):
+    schedule.register([("A", 0.0)])
+    schedule.record("A", "ok", result="10.00")
+    schedule.record("A", "ok", result="10.00")
+    schedule.record("A", "ok", result="12.00")
+    schedule.record("A", "out_of_stock")
+    checks, changes = schedule._db.execute(
+        "SELECT checks, changes FROM schedule WHERE asin = 'A'"
+    ).fetchone()
+    assert (checks, changes) == (4, 2)
+    assert schedule.results()["A"][:2] == ("out_of_stock", None)
+
+
+def test_register_drops_asins_no_longer_in_the_input(tmp_path):
+    path = str(tmp_path / "recheck.sqlite")
+    price, other = RecheckSchedule(path, job="price"), RecheckSchedule(path, job="other")
+    price.register([("A", 0.0), ("B", 0.0)])
+    other.register([("A", 0.0)])
+
+    price.register([("B", 0.0)])
+    assert price.due(budget=10, now=NOW) == ["B"]
+    assert other.due(budget=10, now=NOW) == ["A"]  # other jobs are untouched
+
+    price.register([("C", 0.0)], drop_missing=False)
+    assert sorted(price.due(budget=10, now=NOW)) == ["B", "C"]
+    price.close()
+    other.close()
+
+
+def test_import_checked_keeps_newer_checks(schedule):
+    schedule.register([("A", 0.0), ("B", 0.0)])
+    schedule.record("A", "ok", result="9.99")
+    schedule.import_checked({"A": ("missing", None), "B": ("missing", None)}, checked_at=NOW - DAY)
+    results = schedule.results()
+    assert results["A"][:2] == ("ok", "9.99")
+    assert results["B"] == ("missing", None, NOW - DAY)
+
+
+def test_business_value():
+    assert business_value({}) == 0
+    assert business_value({"Sales Rank": "nan"}) == 0
+    ranked = business_value({"Sales Rank": 10})
+    assert business_value({"Sales Rank": 10_000}) < ranked
+    assert business_value({"Sales Rank": 10, "price": "19,99 €"}) > ranked
+    assert business_value({"Sales Rank": 10, "quantity": 0}) == ranked * 0.5
+    assert business_value({"Sales Rank": 10, "quantity": 3}) == ranked * 1.5
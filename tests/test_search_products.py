@@ -0,0 +1,29 @@
+from page_outcome import Outcome
+from search_products import decide
+
+OK, MISSING, OOS = Outcome.OK, Outcome.MISSING, Outcome.OUT_OF_STOCK
+BLOCKED, NETWORK = Outcome.BLOCKED, Outcome.NETWORK_ERROR
+
+
+def test_any_market_ok_decides_at_once():
+    assert decide({"ES": None, "US": OK}) is OK
+    assert decide({"ES": BLOCKED, "US": OK}) is OK
+    assert decide({"ES": MISSING, "US": OK}) is OK
+
+
+def test_undecided_while_markets_are_pending():
+    assert decide({"ES": None, "US": None}) is None
+    assert decide({"ES": MISSING, "US": None}) is None
+    assert decide({"ES": None, "US": BLOCKED}) is None
+
+
+def test_non_final_outcome_wins_when_nobody_has_it():
+    # A block anywhere means the ASIN's availability is unknown
+    assert decide({"ES": MISSING, "US": BLOCKED}) is BLOCKED
+    assert decide({"ES": OOS, "US": NETWORK}) is NETWORK
+    assert decide({"ES": BLOCKED, "US": NETWORK}) is BLOCKED
+
+
+def test_home_market_outcome_reported_when_all_final():
+    assert decide({"ES": OOS, "US": MISSING}) is OOS
+    assert decide({"ES": MISSING, "US": OOS}) is MISSING
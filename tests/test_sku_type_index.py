@@ -0,0 +1,98 @@
+import json
+import os
+
+import openpyxl
+import pytest
+
+import sku_type_index
+from sku_type_index import load_index
+
+
+def template(path, rows):
+    """An Amazon template: header on row 4, then 3 example rows, then the listings."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Plantilla"
+    for _ in range(3):
+        ws.append(["Amazon instructions"])
+    ws.append(["SKU", "Nombre", "Tipo de producto"])
+    for i in range(3):
+        ws.append([f"EXAMPLE{i}", "Ejemplo", "EXAMPLE_TYPE"])
+    for sku, tipo in rows:
+        ws.append([sku, "Producto", tipo])
+    wb.save(path)
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Paths parsed by each load_index call."""
+    calls = []
+    real = sku_type_index._parse_stale
+
+    def parse_stale(paths, workers):
+        calls.append(sorted(os.path.basename(p) for p in paths))
+        return real(paths, workers)
+
+    monkeypatch.setattr(sku_type_index, "_parse_stale", parse_stale)
+    return calls
+
+
+def test_only_changed_templates_are_parsed_again(tmp_path, parsed):
+    cache = str(tmp_path / "cache" / "index.json")
+    template(tmp_path / "a.xlsm", [("001", "TELESCOPE"), ("002", "BINOCULAR")])
+    template(tmp_path / "b.xlsm", [("002", "FLASHLIGHT"), (None, "RIFLE_SCOPE")])
+
+    first = load_index(str(tmp_path), cache, workers=1)
+    # First file wins for a repeated SKU; types of rows without a SKU count
+    assert first == (
+        {"001": "TELESCOPE", "002": "BINOCULAR"},
+        ["BINOCULAR", "FLASHLIGHT", "RIFLE_SCOPE", "TELESCOPE"],
+    )
+    assert parsed == [["a.xlsm", "b.xlsm"]]
+
+    assert load_index(str(tmp_path), cache, workers=1) == first
+    assert parsed == [["a.xlsm", "b.xlsm"]]  # everything from the cache
+
+    template(tmp_path / "b.xlsm", [("003", "FLASHLIGHT")])
+    st = os.stat(tmp_path / "b.xlsm")
+    os.utime(tmp_path / "b.xlsm", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert load_index(str(tmp_path), cache, workers=1)[0] == {
+        "001": "TELESCOPE", "002": "BINOCULAR", "003": "FLASHLIGHT"
+    }
+    assert parsed[-1] == ["b.xlsm"]
+
+
+def test_removed_templates_leave_the_cache(tmp_path, parsed):
+    cache = str(tmp_path / "index.json")
+    template(tmp_path / "a.xlsm", [("001", "TELESCOPE")])
+    template(tmp_path / "b.xlsm", [("002", "FLASHLIGHT")])
+    load_index(str(tmp_path), cache, workers=1)
+
+    os.remove(tmp_path / "b.xlsm")
+    assert load_index(str(tmp_path), cache, workers=1) == ({"001": "TELESCOPE"}, ["TELESCOPE"])
+    assert len(parsed) == 1
+    with open(cache, encoding="utf-8") as f:
+        assert list(json.load(f)["files"]) == [str(tmp_path / "a.xlsm")]
+
+
+def test_other_cache_versions_are_ignored(tmp_path, parsed):
+    cache = tmp_path / "index.json"
+    template(tmp_path / "a.xlsm", [("001", "TELESCOPE")])
+    load_index(str(tmp_path), str(cache), workers=1)
+
+    data = json.loads(cache.read_text(encoding="utf-8"))
+    data["version"] = sku_type_index.CACHE_VERSION + 1
+    cache.write_text(json.dumps(data), encoding="utf-8")
+    load_index(str(tmp_path), str(cache), workers=1)
+    assert parsed == [["a.xlsm"], ["a.xlsm"]]
+
+
+def test_unreadable_templates_are_skipped(tmp_path, parsed):
+    template(tmp_path / "a.xlsm", [("001", "TELESCOPE")])
+    wb = openpyxl.Workbook()
+    wb.active.title = "Plantilla"
+    wb.active.append(["no", "headers", "here"])
+    wb.save(tmp_path / "b.xlsm")
+    assert load_index(str(tmp_path), str(tmp_path / "index.json"), workers=1) == (
+        {"001": "TELESCOPE"}, ["TELESCOPE"]
+    )
@@ -0,0 +1,143 @@
+import pytest
+
+import work_queue
+from work_queue import open_queue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(work_queue.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def url(tmp_path):
+    return f"sqlite:///{tmp_path / 'queue.sqlite'}"
+
+
+def worker(url, name, lease=60.0):
+    return open_queue(url, job="providers", worker_id=name, lease_seconds=lease)
+
+
+def test_add_is_idempotent(url):
+    queue = worker(url, "a")
+    assert queue.add([("k1", {"n": 1}), ("k2", {"n": 2})]) == 2
+    assert queue.add([("k1", {"n": 99}), ("k3", {"n": 3})]) == 1
+    assert queue.claim(10) == [("k1", {"n": 1}), ("k2", {"n": 2}), ("k3", {"n": 3})]
+
+
+def test_leased_items_are_not_claimed_twice(url, clock):
+    a, b = worker(url, "a"), worker(url, "b")
+    a.add([("k1", 1), ("k2", 2)])
+    assert [k for k, _ in a.claim(1)] == ["k1"]
+    assert [k for k, _ in b.claim(10)] == ["k2"]
+    assert a.claim(10) == []
+    assert a.counts() == {"leased": 2}
+
+
+def test_expired_lease_goes_back_to_the_queue(url, clock):
+    a, b = worker(url, "a"), worker(url, "b")
+    a.add([("k1", 1)])
+    a.claim(1)
+
+    clock[0] += 59
+    assert b.claim(1) == []
+    clock[0] += 2
+    assert b.claim(1) == [("k1", 1)]
+
+    attempts = b.backend._db.execute("SELECT attempts FROM items WHERE key = 'k1'").fetchone()[0]
+    assert attempts == 2
+
+
+def test_heartbeat_extends_only_own_leases(url, clock):
+    a, b = worker(url, "a"), worker(url, "b")
+    a.add([("k1", 1), ("k2", 2)])
+    a.claim(1)
+    b.claim(1)
+
+    clock[0] += 50
+    a.heartbeat()
+    clock[0] += 20
+    # k1's lease was renewed at +50, k2's ran out at +60
+    assert [k for k, _ in worker(url, "c").claim(10)] == ["k2"]
+
+
+def test_first_result_wins(url, clock):
+    a, b = worker(url, "a"), worker(url, "b")
+    a.add([("k1", 1)])
+    a.claim(1)
+    clock[0] += 61
+    b.claim(1)  # a's lease expired mid-item
+
+    b.complete("k1", "from b")
+    a.complete("k1", "from a")
+    assert list(a.results()) == [("k1", "from b")]
+    assert a.counts() == {"done": 1}
+    assert a.claim(1) == []
+
+
+def test_release_hands_the_item_back(url, clock):
+    a, b = worker(url, "a"), worker(url, "b")
+    a.add([("k1", 1)])
+    a.claim(1)
+    b.release("k1")  # not b's lease: ignored
+    assert b.claim(1) == []
+
+    a.release("k1")
+    assert a.held == set()
+    assert b.claim(1) == [("k1", 1)]
+
+
+def test_iter_claims_stops_when_nothing_is_claimable(url):
+    queue = worker(url, "a")
+    queue.add((f"k{i}", i) for i in range(25))
+    seen = []
+    for key, payload in queue.iter_claims(batch=10):
+        seen.append(payload)
+        queue.complete(key, payload * 2)
+    assert seen == list(range(25))
+    assert dict(queue.results())["k7"] == 14
+
+
+def test_unsupported_url():
+    with pytest.raises(ValueError):
+        open_queue("postgres://localhost/db", job="providers")
+
+
+# =========================
+# REDIS
+# =========================
+@pytest.fixture
+def redis_url(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis, "from_url",
+        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs),
+    )
+    return "redis://localhost:6379/0"
+
+
+def test_redis_release_checks_the_owner(redis_url):
+    a, b = worker(redis_url, "a"), worker(redis_url, "b")
+    a.add([("k1", 1)])
+    a.claim(1)
+
+    b.release("k1")  # not b's lease: the key must not be queued again
+    assert a.counts() == {"pending": 0, "leased": 1, "done": 0}
+
+    a.release("k1")
+    assert a.counts() == {"pending": 1, "leased": 0, "done": 0}
+    assert b.claim(10) == [("k1", 1)]
+
+
+def test_redis_first_result_wins(redis_url):
+    a, b = worker(redis_url, "a"), worker(redis_url, "b")
+    a.add([("k1", 1)])
+    a.claim(1)
+    b.complete("k1", "from b")
+    a.complete("k1", "from a")
+    assert list(a.results()) == [("k1", "from b")]
@@ -0,0 +1,72 @@
+import asyncio
+from collections import Counter
+
+from worker_pool import iter_csv_records, run_pool
+
+
+def run(items, pages, handler, **kwargs):
+    return asyncio.run(run_pool(items, pages, handler, **kwargs))
+
+
+def test_every_item_is_handled_once():
+    seen = []
+
+    async def handle(page, item):
+        seen.append(item)
+        await asyncio.sleep(0)
+        return True
+
+    assert run(range(50), ["p1", "p2", "p3"], handle) == []
+    assert sorted(seen) == list(range(50))
+
+
+def test_failed_items_are_requeued_until_they_succeed():
+    calls = Counter()
+
+    async def handle(page, item):
+        calls[item] += 1
+        return item != "flaky" or calls[item] == 3
+
+    assert run(["ok", "flaky"], ["p1", "p2"], handle, max_requeues=3) == []
+    assert calls == {"ok": 1, "flaky": 3}
+
+
+def test_items_out_of_attempts_are_left_over():
+    calls = Counter()
+
+    async def handle(page, item):
+        calls[item] += 1
+        if item == "boom":
+            raise RuntimeError("page crashed")  # counts as a failed attempt
+        return item != "blocked"
+
+    leftover = run(["blocked", "ok", "boom"], ["p1"], handle, max_requeues=2)
+    assert sorted(leftover) == ["blocked", "boom"]
+    assert calls == {"blocked": 2, "ok": 1, "boom": 2}
+
+
+def test_a_page_is_never_driven_twice_at_once():
+    busy, clashes = set(), []
+
+    async def handle(page, item):
+        if page in busy:
+            clashes.append(page)
+        busy.add(page)
+        await asyncio.sleep(0.001)
+        busy.discard(page)
+        return item % 3 != 0 or None  # None counts as done
+
+    assert run(range(30), ["p1", "p2"], handle, queue_size=1) == []
+    assert clashes == []
+
+
+def test_iter_csv_records_streams_and_dedupes(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("asin,price\nA,1\nB,2\nA,3\nC,4\nB,5\n")
+    rows = list(iter_csv_records(str(path), chunksize=2, dtype=str))
+    assert [r["asin"] for r in rows] == ["A", "B", "A", "C", "B"]
+
+    last = list(iter_csv_records(str(path), chunksize=2, dedupe_key="asin", dtype=str))
+    assert [(r["asin"], r["price"]) for r in last] == [("A", "3"), ("C", "4"), ("B", "5")]
+    first = list(iter_csv_records(str(path), chunksize=2, dedupe_key="asin", keep="first", dtype=str))
+    assert [(r["asin"], r["price"]) for r in first] == [("A", "1"), ("B", "2"), ("C", "4")]
@@ -0,0 +1,131 @@
+import shutil
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+from xlsx_patch import (
+    fill_sheet,
+    next_free_row,
+    patch_cells,
+    read_rows,
+    rows_by_key,
+    sheet_headers,
+    sheet_names,
+)
+
+TEMPLATE = Path(__file__).resolve().parents[1] / "templates" / "worten" / "hogar.xlsx"
+SHEET = "Data"
+
+# The Worten templates themselves have no default style
+pytestmark = pytest.mark.filterwarnings("ignore:Workbook contains no default style")
+
+
+@pytest.fixture(scope="module")
+def headers():
+    return sheet_headers(str(TEMPLATE), SHEET, header_row=2)
+
+
+@pytest.fixture
+def rows(headers):
+    return [
+        {
+            headers["mp_category"]: "Hogar/Cocina",
+            headers["product_id"]: f"84{i:011d}",
+            headers["product_name_es_ES"]: f"Sartén <{i}> & tapa \"acero\"",
+            headers["image1"]: f"https://example.com/{i}.jpg",
+        }
+        for i in range(5)
+    ] + [{headers["product_id"]: 1234567890123, headers["product_name_es_ES"]: 12.5}]
+
+
+@pytest.fixture
+def filled(tmp_path, rows):
+    output = str(tmp_path / "hogar.xlsx")
+    assert fill_sheet(str(TEMPLATE), output, SHEET, rows, start_row=3) == len(rows)
+    return output
+
+
+def test_headers(headers):
+    assert headers["mp_category"] == 1
+    assert headers["product_id"] == 2
+
+
+def test_fill_sheet_round_trip(filled, rows, headers):
+    written = read_rows(filled, SHEET, 2 + len(rows))
+    # Header rows are kept verbatim
+    assert {r: written[r] for r in (1, 2)} == read_rows(str(TEMPLATE), SHEET, 2)
+    for i, row in enumerate(rows):
+        assert written[3 + i] == row
+    assert next_free_row(filled, SHEET, headers["product_id"], min_row=3) == 3 + len(rows)
+
+
+def test_fill_sheet_output_opens_in_openpyxl(filled, rows, headers):
+    wb = openpyxl.load_workbook(filled)
+    assert wb.sheetnames == sheet_names(str(TEMPLATE))
+    ws = wb[SHEET]
+    assert ws.cell(3, headers["product_name_es_ES"]).value == 'Sartén <0> & tapa "acero"'
+    assert ws.cell(8, headers["product_id"]).value == 1234567890123
+    assert ws.max_row == 2 + len(rows)
+
+    # The other sheets are copied unchanged
+    template = openpyxl.load_workbook(TEMPLATE)
+    for name in ("ReferenceData", "Columns"):
+        assert [r for r in wb[name].iter_rows(values_only=True)] == [
+            r for r in template[name].iter_rows(values_only=True)
+        ]
+
+
+def test_fill_sheet_in_place_replaces_rows_from_start_row(filled, headers):
+    fill_sheet(filled, filled, SHEET, [{headers["product_id"]: "NEW"}], start_row=4)
+    written = read_rows(filled, SHEET, 20)
+    assert written[3][headers["product_id"]] == "8400000000000"
+    assert written[4] == {headers["product_id"]: "NEW"}
+    assert max(written) == 4
+
+
+def test_rows_by_key(filled, headers):
+    found = rows_by_key(
+        filled, SHEET, headers["product_id"],
+        ["8400000000003", "1234567890123", "missing"], min_row=3,
+    )
+    assert set(found) == {"8400000000003", "1234567890123"}
+    r, cells = found["8400000000003"]
+    assert r == 6
+    assert cells[headers["image1"]] == "https://example.com/3.jpg"
+    assert found["1234567890123"][0] == 8
+
+    # min_row skips the header rows, even when a key matches them
+    assert rows_by_key(filled, SHEET, headers["product_id"], ["product_id"], min_row=3) == {}
+    assert rows_by_key(filled, SHEET, headers["product_id"], ["product_id"])["product_id"][0] == 2
+
+
+def test_patch_cells_round_trip(tmp_path, filled, headers):
+    found = rows_by_key(filled, SHEET, headers["product_id"], ["8400000000001"], min_row=3)
+    r, _ = found["8400000000001"]
+    before = read_rows(filled, SHEET, 8)
+
+    output = str(tmp_path / "patched.xlsx")
+    updates = {
+        r: {headers["mp_category"]: "Hogar/Baño", headers["image1"]: None, headers["image2"]: "x.jpg"},
+        12: {headers["product_id"]: "APPENDED"},
+    }
+    assert patch_cells(filled, output, SHEET, updates) == 4
+
+    after = read_rows(output, SHEET, 12)
+    assert after[r][headers["mp_category"]] == "Hogar/Baño"
+    assert headers["image1"] not in after[r]
+    assert after[r][headers["image2"]] == "x.jpg"
+    assert after[12] == {headers["product_id"]: "APPENDED"}
+    for other in set(before) - {r}:
+        assert after[other] == before[other]
+
+    ws = openpyxl.load_workbook(output)[SHEET]
+    assert ws.cell(r, headers["mp_category"]).value == "Hogar/Baño"
+
+
+def test_patch_cells_in_place(tmp_path, filled, headers):
+    copy = str(tmp_path / "copy.xlsx")
+    shutil.copy(filled, copy)
+    patch_cells(copy, copy, SHEET, {3: {headers["product_id"]: "FIXED"}})
+    assert rows_by_key(copy, SHEET, headers["product_id"], ["FIXED"])["FIXED"][0] == 3
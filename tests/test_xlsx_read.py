@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import xlsx_read
+from xlsx_read import iter_rows, read_frame, xlsx_to_csv
+
+TEMPLATE = Path(__file__).resolve().parents[1] / "templates" / "worten" / "hogar.xlsx"
+
+ENGINES = [
+    "openpyxl",
+    pytest.param(
+        "calamine",
+        marks=pytest.mark.skipif(xlsx_read.CalamineWorkbook is None, reason="needs python-calamine"),
+    ),
+]
+
+pytestmark = pytest.mark.filterwarnings("ignore:Workbook contains no default style")
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    """Amazon-template-like sheet: title rows, header, a help row, data."""
+    path = tmp_path_factory.mktemp("xlsx") / "catalog.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Plantilla"
+    ws.append(["Plantilla de inventario", None, None, None, None])
+    ws.append([None, None, None, None, None])
+    ws.append(["SKU", "Precio", None, "Precio", "Cantidad"])
+    ws.append(["Código del vendedor", "EUR", None, "EUR", "Unidades"])
+    ws.append(["8400000000001", 12.5, "x", 13, 2.0])
+    ws.append([None, None, None, None, None])
+    ws.append(["0840000000002", 9.99, None, None, 3])
+    ws.append(["8400000000003", 1, "z", 1.5, None])
+    wb.create_sheet("Other").append(["a"])
+    wb.save(path)
+    return str(path)
+
+
+def nulls_as_none(df):
+    return df.astype(object).where(df.notna(), None)
+
+
+def expected(path, sheet, header, skiprows, **kwargs):
+    df = pd.read_excel(path, sheet_name=sheet, header=header, **kwargs).iloc[skiprows:]
+    return nulls_as_none(df.dropna(how="all").reset_index(drop=True))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("header, skiprows", [(2, 1), (2, 0), (3, 0), (0, 4)])
+def test_header_and_skiprows_match_read_excel(workbook, engine, header, skiprows):
+    df = read_frame(workbook, "Plantilla", header=header, skiprows=skiprows, dtype=str, engine=engine)
+    pd.testing.assert_frame_equal(
+        nulls_as_none(df), expected(workbook, "Plantilla", header, skiprows, dtype=str)
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_values_match_read_excel(workbook, engine):
+    df = read_frame(workbook, "Plantilla", header=2, skiprows=1, engine=engine)
+    pd.testing.assert_frame_equal(
+        nulls_as_none(df), expected(workbook, "Plantilla", 2, 1), check_dtype=False
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_identifiers_stay_text(workbook, engine):
+    # pd.read_excel parses digit strings into floats and drops leading zeros
+    df = read_frame(workbook, "Plantilla", header=3, engine=engine)
+    assert df["Código del vendedor"].tolist() == ["8400000000001", "0840000000002", "8400000000003"]
+    assert expected(workbook, "Plantilla", 3, 0)["Código del vendedor"].tolist()[1] == 840000000002
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_column_names_match_read_excel(workbook, engine):
+    names, _ = iter_rows(workbook, "Plantilla", header=2, engine=engine)
+    assert names == ["SKU", "Precio", "Unnamed: 2", "Precio.1", "Cantidad"]
+    assert names == list(pd.read_excel(workbook, sheet_name="Plantilla", header=2).columns)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_whole_number_floats_come_back_as_ints(workbook, engine):
+    df = read_frame(workbook, "Plantilla", header=2, skiprows=1, usecols=["Cantidad"], engine=engine)
+    assert df["Cantidad"].tolist()[:2] == [2, 3]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_usecols_and_dtype_str(workbook, engine):
+    df = read_frame(
+        workbook, "Plantilla", header=2, skiprows=1,
+        usecols=["Cantidad", "SKU"], dtype=str, engine=engine,
+    )
+    kwargs = {"header": 2, "usecols": ["Cantidad", "SKU"], "dtype": str}
+    assert list(df.columns) == ["Cantidad", "SKU"]
+    assert df["SKU"].tolist() == expected(workbook, "Plantilla", skiprows=1, **kwargs)["SKU"].tolist()
+    assert df["SKU"].tolist() == ["8400000000001", "0840000000002", "8400000000003"]
+    assert df["Cantidad"].tolist()[:2] == ["2", "3"]
+    assert pd.isna(df["Cantidad"][2])
+
+
+def test_missing_column(workbook):
+    with pytest.raises(KeyError, match="Nope"):
+        iter_rows(workbook, "Plantilla", header=2, usecols=["SKU", "Nope"])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_worten_template_headers(engine):
+    df = read_frame(str(TEMPLATE), "Data", header=1, engine=engine)
+    reference = pd.read_excel(TEMPLATE, sheet_name="Data", header=1)
+    assert list(df.columns) == list(reference.columns)
+    assert df.empty and reference.dropna(how="all").empty
+
+
+def test_xlsx_to_csv(workbook, tmp_path):
+    output = tmp_path / "catalog.csv"
+    assert xlsx_to_csv(workbook, str(output), "Plantilla", header=2, skiprows=1, usecols=["SKU"]) == 3
+    assert pd.read_csv(output, dtype=str)["SKU"].tolist() == [
+        "8400000000001", "0840000000002", "8400000000003"
+    ]
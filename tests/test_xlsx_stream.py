@@ -0,0 +1,93 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+from xlsx_stream import StreamingXlsxWriter, clean_price_columns
+
+
+def sheets(path):
+    wb = openpyxl.load_workbook(path)
+    return {ws.title: [list(r) for r in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+
+def frame(n):
+    return pd.DataFrame({"sku": [f"{i:04d}" for i in range(n)], "qty": list(range(n))})
+
+
+def test_sheet_rollover_repeats_the_header(tmp_path):
+    path = tmp_path / "out.xlsx"
+    # max_rows counts the header: two data rows per sheet
+    with StreamingXlsxWriter(str(path), max_rows=3) as writer:
+        writer.write_frame(frame(3))
+        writer.write_frame(frame(5).iloc[3:])
+
+    assert writer.files == [path]
+    assert writer.rows_written == 5
+    assert sheets(path) == {
+        "Sheet1": [["sku", "qty"], ["0000", 0], ["0001", 1]],
+        "Sheet2": [["sku", "qty"], ["0002", 2], ["0003", 3]],
+        "Sheet3": [["sku", "qty"], ["0004", 4]],
+    }
+
+
+def test_file_rollover(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with StreamingXlsxWriter(str(path), max_rows=3, split="file") as writer:
+        writer.write_frame(frame(5))
+
+    assert [p.name for p in writer.files] == ["out.xlsx", "out_2.xlsx", "out_3.xlsx"]
+    assert sheets(writer.files[1]) == {"Sheet1": [["sku", "qty"], ["0002", 2], ["0003", 3]]}
+    assert sheets(writer.files[2]) == {"Sheet1": [["sku", "qty"], ["0004", 4]]}
+
+
+def test_exactly_full_sheet_opens_no_empty_one(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with StreamingXlsxWriter(str(path), max_rows=3) as writer:
+        writer.write_frame(frame(4))
+    assert list(sheets(path)) == ["Sheet1", "Sheet2"]
+
+
+def test_empty_input_is_a_valid_header_only_file(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with StreamingXlsxWriter(str(path)) as writer:
+        writer.set_header(["sku", "qty"])
+    assert sheets(path) == {"Sheet1": [["sku", "qty"]]}
+
+
+def test_nulls_become_empty_cells(tmp_path):
+    path = tmp_path / "out.xlsx"
+    df = pd.DataFrame({
+        "a": ["x", None],
+        "b": [1.5, float("nan")],
+        "c": pd.array([1, None], dtype="Int64"),
+        "d": ["k1", "k2"],
+    })
+    with StreamingXlsxWriter(str(path)) as writer:
+        writer.write_frame(df)
+    assert sheets(path)["Sheet1"] == [
+        ["a", "b", "c", "d"], ["x", 1.5, 1, "k1"], [None, None, None, "k2"]
+    ]
+
+
+def test_invalid_split(tmp_path):
+    with pytest.raises(ValueError):
+        StreamingXlsxWriter(str(tmp_path / "out.xlsx"), split="zip")
+
+
+def test_clean_price_columns_writes_numbers(tmp_path):
+    chunk = pd.DataFrame({
+        "MSRP": ["12,50 €", "1 299", "a consultar", None],
+        "Standard Price": [12.5, 9.0, None, 3.25],
+        "Other": ["1,5", "2", "3", "4"],
+    })
+    cleaned = clean_price_columns(chunk)
+    assert cleaned["MSRP"].tolist()[:3] == [12.5, 1299, "a consultar"]
+    assert pd.isna(cleaned["MSRP"][3])
+    assert cleaned["Standard Price"].dtype == "float64"  # numeric columns untouched
+    assert cleaned["Other"].tolist() == ["1,5", "2", "3", "4"]
+
+    path = tmp_path / "prices.xlsx"
+    with StreamingXlsxWriter(str(path)) as writer:
+        writer.write_frame(cleaned)
+    rows = sheets(path)["Sheet1"]
+    assert [r[:2] for r in rows[1:]] == [[12.5, 12.5], [1299, 9], ["a consultar", None], [None, 3.25]]